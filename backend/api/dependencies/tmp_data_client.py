@@ -3,13 +3,17 @@ from dotenv import load_dotenv
 
 from communication.ipc_listener import IPCListener
 from communication.ipc_client import IPCClient
+from communication.wire_format import decode_payload
+from communication.realtime_snapshot_file import RealtimeSnapshotReader, RealtimeSnapshotView
 
 from services.transform.src.realtime_transform_worker import RealtimeTransformWorker
 from repositories.timetable_repository.postgresql_timetable_repository import PostgresqlTimetableRepository
 from repositories.delay_repository.postgresql_delay_repository import PostgresqlDelayRepository
 from repositories.realtimes_repository.sqlite_realtime_repository import SqliteRealtimeRepository
+from repositories.archive_repository.columnar_archive_repository import ColumnarArchiveRepository
+from services.transform.src.timetable_snapshot import TimetableSnapshot
 
-from model.pydantic_model import RealtimePosition, RealtimeArrival
+from model.pydantic_model import RealtimePosition, RealtimeArrival, RealtimeSnapshot
 
 load_dotenv()
 tc_address = os.getenv("TRANSFORM_CONTROLLER_ADDRESS")
@@ -17,47 +21,70 @@ ct_address = os.getenv("COLLECT_TRANSFORM_ADDRESS")
 
 metro_db_url = os.getenv("POSTGRESQL_METRO_DB_URL")
 realtime_db_url = os.getenv("SQLITE_REALTIME_DB_URL")
-
-arrival_line = list(map(int, os.getenv("ARRIVAL_LINE").split(",")))
-
-ipc_listener = IPCListener(tc_address)
-ipc_client = IPCClient(ct_address)
-
-postgresql_timetable_repository = PostgresqlTimetableRepository()
-postgresql_delay_repository = PostgresqlDelayRepository()
-sqlite_realtime_repository = SqliteRealtimeRepository()
-
-# ipc_listener.start() # Not using
-
-postgresql_timetable_repository.create_engine(metro_db_url)
-postgresql_delay_repository.create_engine(metro_db_url)
-sqlite_realtime_repository.create_engine(realtime_db_url)
-
-realtime_transform_worker = RealtimeTransformWorker(
-    ipc_listener,
-    ipc_client,
-    postgresql_timetable_repository, 
-    postgresql_delay_repository, 
-    sqlite_realtime_repository,
-    arrival_line
-)
-realtime_transform_worker.start()
-
-def get_position_by_line_id(line_id: int) -> RealtimePosition:
-    position = realtime_transform_worker.realtime_transform.realtime_position
+# Daily archive of realtime data. Empty means no archive.
+archive_dir = os.getenv("REALTIME_ARCHIVE_DIR")
+# Local snapshot of the timetable. Empty means that the timetable is always loaded from the database.
+timetable_snapshot_dir = os.getenv("TIMETABLE_SNAPSHOT_DIR")
+
+# Realtime snapshot file of the transform service (services/transform/main.py)
+# If it is set, the API only reads the file and can run with many worker processes.
+# Otherwise, the transform worker runs in this process.
+snapshot_path = os.getenv("REALTIME_SNAPSHOT_PATH")
+
+if snapshot_path:
+    snapshot_reader = RealtimeSnapshotReader(snapshot_path)
+    realtime_transform_worker = None
+else:
+    snapshot_reader = None
+    arrival_line = list(map(int, os.getenv("ARRIVAL_LINE").split(",")))
+
+    ipc_listener = IPCListener(tc_address)
+    ipc_client = IPCClient(ct_address, decode_payload)
+
+    postgresql_timetable_repository = PostgresqlTimetableRepository()
+    postgresql_delay_repository = PostgresqlDelayRepository()
+    sqlite_realtime_repository = SqliteRealtimeRepository()
+
+    # ipc_listener.start() # Not using
+
+    postgresql_timetable_repository.create_engine(metro_db_url)
+    postgresql_delay_repository.create_engine(metro_db_url)
+    sqlite_realtime_repository.create_engine(realtime_db_url)
+
+    realtime_transform_worker = RealtimeTransformWorker(
+        ipc_listener,
+        ipc_client,
+        postgresql_timetable_repository, 
+        postgresql_delay_repository, 
+        sqlite_realtime_repository,
+        arrival_line,
+        archive_repository = ColumnarArchiveRepository(archive_dir) if archive_dir else None,
+        timetable_snapshot = TimetableSnapshot(timetable_snapshot_dir) if timetable_snapshot_dir else None
+    )
+    realtime_transform_worker.start()
+
+def get_realtime_snapshot() -> RealtimeSnapshot|RealtimeSnapshotView:
+    # The latest snapshot. It isn't changed, so read it once and use it for a whole request.
+    if snapshot_reader is not None:
+        return snapshot_reader.read()
+    return realtime_transform_worker.realtime_transform.snapshot
+
+def get_position_by_line_id(line_id: int, snapshot: RealtimeSnapshot|RealtimeSnapshotView|None = None) -> RealtimePosition:
+    position = (snapshot if snapshot is not None else get_realtime_snapshot()).position
     if line_id in position:
         return position[line_id]
     else:
         return RealtimePosition(**{"place": []})
     
 
-def get_arrival_by_station_id(station_id: int, up: str, down: str) -> RealtimeArrival:
+def get_arrival_by_station_id(station_id: int, up: str, down: str, snapshot: RealtimeSnapshot|RealtimeSnapshotView|None = None) -> RealtimeArrival:
         """Get arrival data by station_id 
 
         Args:
             station_id (int): _description_
             up (str): _description_
             down (str): _description_
+            snapshot (RealtimeSnapshot | RealtimeSnapshotView, optional): The snapshot to read. The latest one if None.
 
         Returns:
             RealtimeArrival: _description_
@@ -66,7 +93,7 @@ def get_arrival_by_station_id(station_id: int, up: str, down: str) -> RealtimeAr
         # Create arrival data
         data = {"left": [], "right": []}
         
-        arrival = realtime_transform_worker.realtime_transform.arrival_hashmap
+        arrival = (snapshot if snapshot is not None else get_realtime_snapshot()).arrival
         # Get data by id
         if station_id in arrival:
             realtime_arrival = arrival[station_id]
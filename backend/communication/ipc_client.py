@@ -8,8 +8,14 @@ from multiprocessing.connection import Client
 logger = logging.getLogger("ipc_client")
 
 class IPCClient:
-    def __init__(self, address):
+    def __init__(self, address, decode = None):
+        """
+        Args:
+            address: address of the listener
+            decode (callable, optional): decode(bytes) -> data. For a listener which sends encoded bytes. (IPCListener encode)
+        """
         self.address = address
+        self.decode = decode
         self.client = None
             
     def connect(self):
@@ -32,6 +38,8 @@ class IPCClient:
             self.client = None
     
     def recv(self):
+        if self.decode is not None:
+            return self.decode(self.client.recv_bytes())
         return self.client.recv()
     
     def close(self):
@@ -9,63 +9,140 @@ from multiprocessing.connection import Listener
 logger = logging.getLogger("ipc_listener")
 
 class IPCListener:
-    def __init__(self, address):
+    """
+        Send the latest data to one client
+        
+        set_data() wakes the sender thread (condition variable) and the data is sent at once.
+        Latest wins: If data isn't sent yet, new data replaces it (overwritten) or is composed onto it by merge (merged).
+        A broken pipe is detected by an error of send(). The data is kept to be sent after reconnecting,
+        and resync is set so that the sender can send the whole data.
+        With encode, data is encoded when it is sent (after merging) and sent as bytes. (e.g. communication/wire_format.py)
+    """
+    def __init__(self, address, merge = None, encode = None):
+        """
+        Args:
+            address: address of the listener
+            merge (callable, optional): merge(unsent, new) -> data. 
+                Compose new data onto the data which isn't sent yet instead of replacing it.
+            encode (callable, optional): encode(data) -> bytes. Send bytes instead of pickled data.
+                The client has to decode them. (IPCClient decode)
+        """
         # Check whether path exists
         if os.path.exists(address):
             os.remove(address)
         
+        self.address = address
         self.listener = Listener(address)
         self.data: list = {}
         self.update = False # Sending data only once.
+        self.merge = merge
+        self.encode = encode
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.resync = False # True after (re)connecting. The sender has to send the whole data.
+        self.closed = False
         self.conn = None
+        self.counters = {"set": 0, "sent": 0, "overwritten": 0, "merged": 0, "failed": 0, "connections": 0}
     
     def open_pipe(self):
         logger.info("Open listener...")
         self.conn = None
         try:
             self.conn = self.listener.accept() # Wait till connecting to client  
+            with self.lock:
+                self.resync = True
+                self.counters["connections"] += 1
             logger.info("Connected to client")
         except Exception:
             logger.error(traceback.format_exc())
     
-    def set_data(self, data: list):
+    def _put(self, data):
+        # Caller holds the lock
+        if self.update:
+            if self.merge is not None:
+                data = self.merge(self.data, data)
+                self.counters["merged"] += 1
+            else:
+                self.counters["overwritten"] += 1
         self.data = data
         self.update = True
+    
+    def set_data(self, data: list):
+        with self.cond:
+            self._put(data)
+            self.counters["set"] += 1
+            self.cond.notify()
         if self.conn is None: logger.debug("Not yet connected...")
     
+    def consume_resync(self) -> bool:
+        """ Whether the whole data has to be sent. The flag is cleared. """
+        with self.lock:
+            resync, self.resync = self.resync, False
+        return resync
+    
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.counters, "pending": self.update}
+    
+    def _take(self):
+        # Wait for new data
+        with self.cond:
+            while not self.update and not self.closed:
+                self.cond.wait()
+            data, self.update = self.data, False
+            return data
+    
+    def _restore(self, data):
+        # Data which failed to be sent is sent after reconnecting, unless newer data is set.
+        with self.cond:
+            self.counters["failed"] += 1
+            newer, update = self.data, self.update
+            self.data, self.update = data, True
+            if update:
+                self._put(newer)
+    
     def listen(self):
         """
             Listener Connection for IPC.
-            Check the pipe connection continuously every second.
-            IF the pipe is broken, reopen pipe connection.
-            
-            Check pipe connection logic:
-            
-                if self.conn.poll(): -> True when either the pipe is broken or the data is sent to client. 
-                                        There are never the case that a client sends data. 
-                                        So, if this is True, the pipe must be broken, exclusively.
-                    self.conn.recv() -> Raise BrokenPipeError
+            Wait for data from set_data() and send it at once.
+            IF sending fails (the pipe is broken), reopen pipe connection.
         """
         
         self.open_pipe()
         
         # Send data
-        while True:
+        while not self.closed:
+            if self.conn is None:
+                # Accept failed
+                time.sleep(0.5)
+                self.open_pipe()
+                continue
+            data = self._take()
+            if self.closed:
+                break
             try:
-                if self.update:
-                    logger.debug("Send data...")
-                    self.conn.send(self.data)
-                    self.update = False
-                
-                # Check pipe break
-                if self.conn.poll():
-                    self.conn.recv()
+                logger.debug("Send data...")
+                if self.encode is not None:
+                    self.conn.send_bytes(self.encode(data))
+                else:
+                    self.conn.send(data)
+                with self.lock:
+                    self.counters["sent"] += 1
             except Exception:
                 logger.error(traceback.format_exc())
+                self._restore(data)
+                try:
+                    self.conn.close()
+                except Exception:
+                    pass
                 self.open_pipe()
-            time.sleep(0.5)
             
     def close(self):
+        # Stop the sender thread
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        
         # Close Connection
         if self.conn:
             try:
@@ -0,0 +1,201 @@
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger("position_delta")
+
+"""
+    Change-only (delta) train snapshots between collect and transform
+
+    PositionDeltaEncoder (collect)
+        Keeps the previous snapshot keyed by (line_id, train_id) and emits
+        {"seq", "base_seq", "full", "added", "moved", "removed"}
+        1. added: trains which aren't in the previous snapshot
+        2. moved: trains whose observation (station, status, received_at, ...) is changed
+        3. removed: keys of trains which aren't in the current snapshot
+        A full snapshot ("full": True, the whole frame in "snapshot") is emitted every full_every cycles,
+        and whenever reset() is called. e.g. the transform process is reconnected.
+        added, moved and removed are filled in a full snapshot too.
+        An empty delta keeps seq (seq == base_seq), so the sender may skip it.
+
+    PositionDeltaDecoder (transform)
+        Applies deltas to its own snapshot and returns the whole frame.
+        A delta whose base_seq isn't the last applied seq is rejected until the next full snapshot.
+
+    merge_payloads
+        The IPC listener keeps only the latest payload. If a payload isn't sent yet,
+        the next payload is composed onto it instead of replacing it, so no delta is lost.
+"""
+
+KEY_COLUMNS = ["line_id", "train_id"]
+# requested_at changes every cycle. It isn't a movement of a train.
+OBSERVATION_COLUMNS = [
+    "station_id", "station_name", "received_at", "up_down",
+    "last_station_id", "last_station_name", "train_status", "express", "is_last_train"
+]
+
+def is_delta(position) -> bool:
+    return isinstance(position, dict) and "seq" in position
+
+class PositionDeltaEncoder:
+    def __init__(self, full_every: int = 30):
+        self.full_every = full_every
+        self.seq = 0
+        self.cycles_since_full = 0
+        self.force_full = True
+        # (line_id, train_id) -> observation tuple
+        self.snapshot: dict[tuple, tuple] = {}
+
+    def reset(self):
+        """ The next delta is a full snapshot """
+        self.force_full = True
+
+    def encode(self, frame: pd.DataFrame) -> dict:
+        """ Delta between the previous snapshot and the frame
+
+        Args:
+            frame (pd.DataFrame): preprocessed realtime position. One row for each (line_id, train_id).
+
+        Returns:
+            dict: delta. See the module docstring.
+        """
+        keys = list(zip(*(frame[c].tolist() for c in KEY_COLUMNS)))
+        values = list(zip(*(frame[c].tolist() for c in OBSERVATION_COLUMNS)))
+        snapshot = dict(zip(keys, values))
+
+        added_idx, moved_idx = [], []
+        for i, key in enumerate(keys):
+            prev = self.snapshot.get(key)
+            if prev is None:
+                added_idx.append(i)
+            elif prev != values[i]:
+                moved_idx.append(i)
+        removed = [key for key in self.snapshot if key not in snapshot]
+        self.snapshot = snapshot
+
+        base_seq = self.seq
+        self.cycles_since_full += 1
+        full = self.force_full or self.cycles_since_full >= self.full_every
+        # An empty delta doesn't advance seq. It can be skipped without breaking the chain of deltas.
+        if full or len(added_idx) + len(moved_idx) + len(removed) > 0:
+            self.seq += 1
+
+        delta = {
+            "seq": self.seq,
+            "base_seq": base_seq,
+            "full": full,
+            "added": frame.iloc[added_idx].reset_index(drop=True),
+            "moved": frame.iloc[moved_idx].reset_index(drop=True),
+            "removed": pd.DataFrame(removed, columns=KEY_COLUMNS)
+        }
+        if full:
+            delta["base_seq"] = None
+            delta["snapshot"] = frame.reset_index(drop=True)
+            if len(added_idx) == len(frame):
+                # Every train is added (e.g. the first delta). The same frame is sent once.
+                delta["added"] = delta["snapshot"]
+            self.force_full = False
+            self.cycles_since_full = 0
+        return delta
+
+class PositionDeltaDecoder:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """ Drop the snapshot and wait for a full snapshot """
+        self.seq: int|None = None
+        self.frame: pd.DataFrame|None = None
+
+    def apply(self, delta: dict) -> pd.DataFrame|None:
+        """ Apply a delta to the snapshot
+
+        Args:
+            delta (dict): delta from PositionDeltaEncoder
+
+        Returns:
+            pd.DataFrame|None: whole realtime position. None if the delta can't be applied. (waiting for a full snapshot)
+        """
+        if delta["full"]:
+            self.frame = delta["snapshot"].set_index(KEY_COLUMNS, drop=False)
+        elif self.seq is None or delta["base_seq"] != self.seq:
+            if self.seq is not None:
+                logger.warning(f"Delta {delta['seq']} is based on {delta['base_seq']}, but the last applied delta is {self.seq}. Wait for a full snapshot.")
+            self.reset()
+            return None
+        else:
+            self.frame = _apply(self.frame, delta)
+        self.seq = delta["seq"]
+        return self.frame.reset_index(drop=True)
+
+def _key_list(frame: pd.DataFrame) -> list[tuple]:
+    return list(zip(*(frame[c].tolist() for c in KEY_COLUMNS)))
+
+def _apply(frame: pd.DataFrame, delta: dict) -> pd.DataFrame:
+    # frame is indexed by KEY_COLUMNS
+    upserts = [f for f in (delta["added"], delta["moved"]) if len(f) > 0]
+    drop_keys = _key_list(delta["removed"]) + [key for f in upserts for key in _key_list(f)]
+    if len(drop_keys) > 0:
+        frame = frame.drop(index=drop_keys, errors="ignore")
+    if len(upserts) > 0:
+        frame = pd.concat([frame] + [f.set_index(KEY_COLUMNS, drop=False) for f in upserts])
+    return frame
+
+def merge_deltas(older: dict, newer: dict) -> dict:
+    """ One delta which has the same effect as applying older and then newer """
+    older_added = set(_key_list(older["added"]))
+    older_removed = set(_key_list(older["removed"]))
+    newer_added = set(_key_list(newer["added"]))
+    newer_removed = set(_key_list(newer["removed"]))
+    newer_keys = newer_added | set(_key_list(newer["moved"])) | newer_removed
+
+    # Rows of the older delta which aren't touched by the newer delta
+    older_added_rows = older["added"][[key not in newer_keys for key in _key_list(older["added"])]]
+    older_moved_rows = older["moved"][[key not in newer_keys for key in _key_list(older["moved"])]]
+
+    # A train added by the older delta is still an added train.
+    # A train removed by the older delta and added again by the newer delta is a moved train.
+    newer_moved_keys = _key_list(newer["moved"])
+    newer_added_keys = _key_list(newer["added"])
+    added = pd.concat([
+        older_added_rows,
+        newer["added"][[key not in older_removed for key in newer_added_keys]],
+        newer["moved"][[key in older_added for key in newer_moved_keys]]
+    ])
+    moved = pd.concat([
+        older_moved_rows,
+        newer["added"][[key in older_removed for key in newer_added_keys]],
+        newer["moved"][[key not in older_added for key in newer_moved_keys]]
+    ])
+    removed = [key for key in older_removed if key not in newer_added] + [key for key in newer_removed if key not in older_added]
+    merged = {
+        "seq": newer["seq"],
+        "base_seq": older["base_seq"],
+        "full": False,
+        "added": added.reset_index(drop=True),
+        "moved": moved.reset_index(drop=True),
+        "removed": pd.DataFrame(removed, columns=KEY_COLUMNS)
+    }
+    if newer["full"]:
+        merged.update(base_seq=None, full=True, snapshot=newer["snapshot"])
+    elif older["full"]:
+        frame = _apply(older["snapshot"].set_index(KEY_COLUMNS, drop=False), newer)
+        merged.update(full=True, snapshot=frame.reset_index(drop=True))
+    return merged
+
+def merge_payloads(older, newer):
+    """ Compose a payload of collect onto the unsent payload
+
+    Signals (position 0 or 1) and payloads without a delta replace the unsent payload as before.
+    """
+    if not (isinstance(older, dict) and isinstance(newer, dict) and is_delta(older.get("position")) and is_delta(newer.get("position"))):
+        return newer
+    return {
+        **newer,
+        "position": merge_deltas(older["position"], newer["position"]),
+        # None means that the arrival list isn't changed
+        "arrival_all": newer["arrival_all"] if newer["arrival_all"] is not None else older["arrival_all"],
+        "changed_lines": older.get("changed_lines", set()) | newer.get("changed_lines", set()),
+        # A line failed in either cycle. It is cleared by the next payload.
+        "stale_lines": older.get("stale_lines", set()) | newer.get("stale_lines", set())
+    }
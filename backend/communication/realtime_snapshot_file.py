@@ -0,0 +1,144 @@
+import os
+import mmap
+import struct
+import logging
+from datetime import datetime
+from collections.abc import Mapping
+
+import numpy as np
+from pydantic import TypeAdapter
+
+from model.pydantic_model import RealtimeSnapshot, RealtimePosition, RealtimeArrivalRow
+
+logger = logging.getLogger("realtime_snapshot_file")
+
+"""
+    Realtime snapshot file shared by the transform service and API workers
+
+    The transform service writes each snapshot to a new file and renames it onto the path. (os.replace)
+    API workers memory map the file. A reader keeps the mapping of the file it opened,
+    so it never sees a half written snapshot, and it maps the new file when the path is replaced.
+    Put the file on a memory file system (e.g. /dev/shm) to avoid disk writes.
+
+    Layout (little endian)
+        header: magic (8s), seq (Q), built_at timestamp (d), number of lines (I), number of stations (I)
+        line index: (line_id, offset, length) sorted by line_id
+        station index: (station_id, offset, length) sorted by station_id
+        data: JSON of RealtimePosition for each line and JSON list of RealtimeArrivalRow for each station
+
+    A request reads only the index (without copying) and the JSON of its line and station.
+"""
+
+MAGIC = b"RTSNAP01"
+HEADER = struct.Struct("<8sQdII")
+INDEX_DTYPE = np.dtype([("key", "<i8"), ("offset", "<u8"), ("length", "<u8")])
+
+ARRIVAL_ROWS = TypeAdapter(list[RealtimeArrivalRow])
+
+class RealtimeSnapshotWriter:
+    def __init__(self, path: str):
+        self.path = path
+        # (kind, key) -> (object, JSON). Lines and stations which aren't changed are the same objects. (copy on write)
+        self.cache: dict[tuple[str, int], tuple[object, bytes]] = {}
+
+    def _encode(self, kind: str, key: int, value) -> bytes:
+        cached = self.cache.get((kind, key))
+        if cached is not None and cached[0] is value:
+            return cached[1]
+        data = value.model_dump_json().encode() if kind == "line" else ARRIVAL_ROWS.dump_json(value)
+        self.cache[(kind, key)] = (value, data)
+        return data
+
+    def write(self, snapshot: RealtimeSnapshot):
+        """ Write the snapshot and replace the file of the path """
+        lines = sorted(snapshot.position)
+        stations = sorted(snapshot.arrival)
+        blobs = [self._encode("line", k, snapshot.position[k]) for k in lines] + [self._encode("station", k, snapshot.arrival[k]) for k in stations]
+        # Forget removed lines and stations
+        keys = {("line", k) for k in lines} | {("station", k) for k in stations}
+        self.cache = {k: v for k, v in self.cache.items() if k in keys}
+
+        index = np.zeros(len(blobs), dtype=INDEX_DTYPE)
+        index["key"] = lines + stations
+        index["length"] = [len(b) for b in blobs]
+        index["offset"] = HEADER.size + index.nbytes + np.cumsum(index["length"]) - index["length"]
+
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, snapshot.seq, snapshot.built_at.timestamp(), len(lines), len(stations)))
+            f.write(index.tobytes())
+            for b in blobs:
+                f.write(b)
+        os.replace(tmp_path, self.path)
+
+class _SnapshotMapping(Mapping):
+    """ Read-only mapping of a section of the snapshot file. Values are parsed on access. """
+    def __init__(self, buffer, index: np.ndarray, parse):
+        self.buffer = buffer
+        self.index = index
+        self.parse = parse
+
+    def _find(self, key) -> int:
+        i = int(np.searchsorted(self.index["key"], key))
+        if i < len(self.index) and self.index["key"][i] == key:
+            return i
+        return -1
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        offset, length = int(self.index["offset"][i]), int(self.index["length"][i])
+        return self.parse(self.buffer[offset:offset + length])
+
+    def __contains__(self, key) -> bool:
+        return self._find(key) >= 0
+
+    def __iter__(self):
+        return iter(self.index["key"].tolist())
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+class RealtimeSnapshotView:
+    """ One snapshot in the file. It has the same attributes as RealtimeSnapshot. """
+    def __init__(self, buffer = None):
+        if buffer is None:
+            # No snapshot yet
+            self.seq, self.built_at = -1, None
+            empty = np.zeros(0, dtype=INDEX_DTYPE)
+            self.position = _SnapshotMapping(b"", empty, RealtimePosition.model_validate_json)
+            self.arrival = _SnapshotMapping(b"", empty, ARRIVAL_ROWS.validate_json)
+            return
+        magic, seq, built_at, n_lines, n_stations = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise Exception(f"There isn't a realtime snapshot file. magic: {magic}")
+        self.seq = seq
+        self.built_at = datetime.fromtimestamp(built_at)
+        index = np.frombuffer(buffer, dtype=INDEX_DTYPE, count=n_lines + n_stations, offset=HEADER.size)
+        self.position = _SnapshotMapping(buffer, index[:n_lines], RealtimePosition.model_validate_json)
+        self.arrival = _SnapshotMapping(buffer, index[n_lines:], ARRIVAL_ROWS.validate_json)
+
+class RealtimeSnapshotReader:
+    def __init__(self, path: str):
+        self.path = path
+        self.file_id = None
+        self.view = RealtimeSnapshotView()
+
+    def read(self) -> RealtimeSnapshotView:
+        """ The latest snapshot. Use the returned view for a whole request. """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return self.view
+        if (stat.st_ino, stat.st_mtime_ns, stat.st_size) != self.file_id:
+            with open(self.path, "rb") as f:
+                # The path can be replaced again after stat. Identify the opened file.
+                stat = os.fstat(f.fileno())
+                file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                # The mapping is valid after the file is closed or replaced
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # One assignment. Requests in progress keep the previous view.
+            self.view, self.file_id = RealtimeSnapshotView(buffer), file_id
+            logger.debug(f"Map the realtime snapshot {self.view.seq}")
+        return self.view
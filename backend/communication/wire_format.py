@@ -0,0 +1,260 @@
+import json
+import struct
+import logging
+from itertools import repeat
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("wire_format")
+
+"""
+    Binary wire format of collect -> transform payloads
+
+    Message
+        header: magic (4s), version (H), number of frames (H), length of meta (I)
+        meta: JSON {"payload": ..., "frames": [...]}
+              payload: DataFrames are replaced by {"$frame": i},
+                       lists of dicts (e.g. arrival/all rows) by {"$records": i} and sets by {"$set": [...]}
+              frames: directory of each frame. Buffers are (offset, length) in the body.
+                      [number of rows, string offsets, string table, [[name, kind, dtype, offset, length], ...]]
+        body: buffers, each 8 byte aligned. The body starts at the next 8 byte boundary after meta.
+
+    Frame (one DataFrame, the index isn't kept)
+        string offsets (<i8, code points) and string table (utf-8):
+            distinct values of every string and json column of the frame
+        columns by kind
+        1. numeric: values of a fixed width numpy dtype. e.g. <i8
+        2. string: codes of the string table (-1 is missing)
+           codes are i1, <i2 or <i4 by the size of the string table. (width: length / number of rows)
+           dtype is the pandas dtype to restore. "string" or "object"
+        3. json: like string, but each value is a JSON text. Columns of other types. (e.g. mixed objects)
+        4. datetime: <i8 values since the epoch (UTC), NaT is the minimum. dtype is the pandas dtype.
+           e.g. datetime64[ns] or datetime64[ns, Asia/Seoul]
+
+    A DataFrame which appears twice in the payload (e.g. added and snapshot of a full delta) is written once.
+    Decoding numeric and naive datetime columns doesn't copy: they are np.frombuffer views of the received bytes.
+    The fixed cost of a frame is small: headers are one JSON, string columns are factorized together
+    and the string table is decoded at once.
+    There isn't a Python loop over rows: records with the same keys are transposed with itemgetter
+    and records aren't built as a DataFrame.
+"""
+
+MAGIC = b"MTWF"
+WIRE_VERSION = 3
+MESSAGE_HEADER = struct.Struct("<4sHHI")
+
+NUMERIC, STRING, JSON, DATETIME = 0, 1, 2, 3
+CODE_DTYPES = {1: "i1", 2: "<i2", 4: "<i4"}
+
+def _append(body: bytearray, data: bytes) -> list[int]:
+    # 8 byte aligned. Returns (offset, length)
+    body.extend(b"\0" * (-len(body) % 8))
+    offset = len(body)
+    body.extend(data)
+    return [offset, len(data)]
+
+def _code_width(n_texts: int) -> str:
+    return "i1" if n_texts < 2**7 else "<i2" if n_texts < 2**15 else "<i4"
+
+def _is_fixed_width(values) -> bool:
+    return isinstance(values, np.ndarray) and values.dtype.kind in "iufbmM" or isinstance(values.dtype, pd.DatetimeTZDtype)
+
+def _fixed_width_buffer(values) -> tuple[int, str, bytes]:
+    if values.dtype.kind == "M" or isinstance(values.dtype, pd.DatetimeTZDtype):
+        # UTC values. The dtype keeps the unit and the time zone.
+        dtype = str(values.dtype)
+        values = values.view("<i8") if isinstance(values, np.ndarray) else values.asi8
+        return DATETIME, dtype, np.ascontiguousarray(values, dtype="<i8").tobytes()
+    values = np.ascontiguousarray(values)
+    return NUMERIC, values.dtype.str, values.tobytes()
+
+def _string_columns(columns: dict) -> tuple[dict, list[str]]:
+    """ Factorize string and json columns of a frame together
+
+    Returns:
+        tuple[dict, list[str]]: name -> (kind, dtype, codes) and the string table
+    """
+    names = [name for name, values in columns.items() if not _is_fixed_width(values)]
+    if len(names) == 0:
+        return {}, []
+    dtypes = {name: "string" if isinstance(columns[name].dtype, pd.StringDtype) else "object" for name in names}
+    # The object ndarray of a StringArray isn't copied. Missing values are code -1.
+    arrays = [np.asarray(columns[name], dtype=object) for name in names]
+    values = np.concatenate(arrays)
+    if pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty"):
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        result, start = {}, 0
+        for name, column in zip(names, arrays):
+            result[name] = (STRING, dtypes[name], codes[start:start + len(column)])
+            start += len(column)
+        return result, uniques.tolist()
+
+    # Columns of other types. Each column is checked and values of json columns are dumped. (rare)
+    result, texts = {}, []
+    for name, column in zip(names, arrays):
+        if dtypes[name] == "string" or pd.api.types.infer_dtype(column, skipna=True) in ("string", "empty"):
+            kind, dtype = STRING, dtypes[name]
+        else:
+            kind, dtype, column = JSON, "object", np.array([json.dumps(v) for v in column.tolist()], dtype=object)
+        c, u = pd.factorize(column, use_na_sentinel=True)
+        result[name] = (kind, dtype, np.where(c >= 0, c + len(texts), -1))
+        texts.extend(u.tolist())
+    return result, texts
+
+def _write_frame(body: bytearray, n_rows: int, columns: dict) -> list:
+    """ Append buffers of a frame to the body
+
+    Returns:
+        list: directory of the frame
+    """
+    strings, texts = _string_columns(columns)
+    offsets = np.zeros(len(texts) + 1, dtype="<i8")
+    offsets[1:] = np.cumsum(np.fromiter(map(len, texts), dtype="<i8", count=len(texts)))
+    width = _code_width(len(texts))
+
+    directory = [n_rows, _append(body, offsets.tobytes()), _append(body, "".join(texts).encode()), []]
+    for name, values in columns.items():
+        if name in strings:
+            kind, dtype, codes = strings[name]
+            data = codes.astype(width).tobytes()
+        else:
+            kind, dtype, data = _fixed_width_buffer(values)
+        directory[3].append([str(name), kind, dtype, *_append(body, data)])
+    return directory
+
+def _frame_columns(frame: pd.DataFrame) -> dict:
+    return {c: values.array if isinstance(values.dtype, (pd.StringDtype, pd.DatetimeTZDtype)) else values.to_numpy() for c, values in frame.items()}
+
+def _records_columns(records: list[dict]) -> dict:
+    keys = list(records[0])
+    # Rows of an API response have the same keys. They are transposed without a Python loop over rows.
+    if len(keys) > 1 and set(map(len, records)) == {len(keys)}:
+        try:
+            rows = list(map(itemgetter(*keys), records))
+            return {key: np.fromiter(values, dtype=object, count=len(records)) for key, values in zip(keys, zip(*rows))}
+        except KeyError:
+            pass
+    # A missing key is None
+    keys = dict.fromkeys(key for row in records for key in row)
+    return {key: np.fromiter((row.get(key) for row in records), dtype=object, count=len(records)) for key in keys}
+
+def _pack(value, frames: dict):
+    # Payload -> JSON meta. DataFrames and lists of records are collected. (id -> (index, value))
+    if isinstance(value, pd.DataFrame):
+        if id(value) not in frames:
+            frames[id(value)] = (len(frames), value)
+        return {"$frame": frames[id(value)][0]}
+    if isinstance(value, dict):
+        return {str(k): _pack(v, frames) for k, v in value.items()}
+    if isinstance(value, (set, frozenset)):
+        return {"$set": [_pack(v, frames) for v in value]}
+    if isinstance(value, list) and len(value) > 0 and set(map(type, value)) == {dict}:
+        frames[id(value)] = (len(frames), value)
+        return {"$records": frames[id(value)][0]}
+    if isinstance(value, (list, tuple)):
+        return [_pack(v, frames) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def encode_payload(payload) -> bytes:
+    """ Encode a payload of collect
+
+    Args:
+        payload: dict, DataFrame, list of dicts, set and JSON values
+
+    Returns:
+        bytes: message
+    """
+    frames: dict[int, tuple[int, pd.DataFrame|list[dict]]] = {}
+    packed = _pack(payload, frames)
+    body = bytearray()
+    directory = []
+    for _, value in frames.values():
+        columns = _frame_columns(value) if isinstance(value, pd.DataFrame) else _records_columns(value)
+        directory.append(_write_frame(body, len(value), columns))
+    meta = json.dumps({"payload": packed, "frames": directory}, ensure_ascii=False).encode()
+    header = MESSAGE_HEADER.pack(MAGIC, WIRE_VERSION, len(frames), len(meta))
+    return b"".join([header, meta, b"\0" * (-(len(header) + len(meta)) % 8), body])
+
+def _read_datetime(data: bytes, offset: int, n_rows: int, dtype: str):
+    dtype = pd.api.types.pandas_dtype(dtype)
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        values = np.frombuffer(data, dtype="<i8", count=n_rows, offset=offset).view(f"M8[{dtype.unit}]")
+        return pd.DatetimeIndex(values).tz_localize("UTC").tz_convert(dtype.tz).array
+    return np.frombuffer(data, dtype="<i8", count=n_rows, offset=offset).view(dtype)
+
+def _read_strings(distinct: list[str], codes: dict[str, tuple[int, str, np.ndarray]]) -> dict:
+    """ Build string and json columns of a frame from the string table """
+    columns = {}
+    # Distinct values and a missing value for code -1
+    values = np.empty(len(distinct) + 1, dtype=object)
+    values[:-1] = distinct
+    na_values = values.copy()
+    na_values[-1] = pd.NA
+    for name, (kind, dtype, c) in codes.items():
+        if kind == JSON:
+            # Only distinct values are parsed
+            parsed = values.copy()
+            for k in np.unique(c[c >= 0]).tolist():
+                parsed[k] = json.loads(values[k])
+            columns[name] = parsed[c]
+        elif dtype == "string":
+            columns[name] = pd.arrays.StringArray(na_values[c])
+        else:
+            columns[name] = values[c]
+    return columns
+
+def _read_frame(data: bytes, base: int, directory: list) -> tuple[int, dict]:
+    n_rows, (offsets_at, offsets_length), (table_at, table_length), columns_directory = directory
+    columns, codes = {}, {}
+    for name, kind, dtype, offset, length in columns_directory:
+        if kind == NUMERIC:
+            columns[name] = np.frombuffer(data, dtype=dtype, count=n_rows, offset=base + offset)
+        elif kind == DATETIME:
+            columns[name] = _read_datetime(data, base + offset, n_rows, dtype)
+        elif kind in (STRING, JSON):
+            columns[name] = None # Keep the order of columns
+            width = CODE_DTYPES[length // n_rows] if n_rows > 0 else "i1"
+            codes[name] = (kind, dtype, np.frombuffer(data, dtype=width, count=n_rows, offset=base + offset))
+        else:
+            raise Exception(f"There isn't a column kind {kind} of the wire format")
+    if len(codes) > 0:
+        bounds = np.frombuffer(data, dtype="<i8", count=offsets_length // 8, offset=base + offsets_at).tolist()
+        table = str(data[base + table_at:base + table_at + table_length], "utf-8")
+        distinct = [table[start:end] for start, end in zip(bounds, bounds[1:])]
+        columns.update(_read_strings(distinct, codes))
+    return n_rows, columns
+
+def _unpack(value, frames: list):
+    # frames: (number of rows, columns). A DataFrame replaces them when it's built. (It can appear twice)
+    if isinstance(value, dict):
+        if "$frame" in value:
+            i = value["$frame"]
+            if not isinstance(frames[i], pd.DataFrame):
+                n_rows, columns = frames[i]
+                frames[i] = pd.DataFrame(columns, copy=False) if len(columns) > 0 else pd.DataFrame(index=pd.RangeIndex(n_rows))
+            return frames[i]
+        if "$records" in value:
+            _, columns = frames[value["$records"]]
+            keys = list(columns)
+            return list(map(dict, map(zip, repeat(keys), zip(*(columns[key].tolist() for key in keys)))))
+        if "$set" in value:
+            return {_unpack(v, frames) for v in value["$set"]}
+        return {k: _unpack(v, frames) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_unpack(v, frames) for v in value]
+    return value
+
+def decode_payload(data: bytes):
+    """ Decode a message of encode_payload """
+    magic, version, n_frames, meta_length = MESSAGE_HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != WIRE_VERSION:
+        raise Exception(f"There isn't a supported wire format. magic: {magic}, version: {version}")
+    meta = json.loads(data[MESSAGE_HEADER.size:MESSAGE_HEADER.size + meta_length])
+    base = MESSAGE_HEADER.size + meta_length
+    base += -base % 8
+    frames = [_read_frame(data, base, directory) for directory in meta["frames"]]
+    return _unpack(meta["payload"], frames)
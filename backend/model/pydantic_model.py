@@ -1,7 +1,7 @@
 from datetime import datetime, time
 from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 class Line(BaseModel):
     line_id: int
@@ -80,6 +80,8 @@ class RealtimeArrivalRow(BaseModel):
 # The data model of realtime position info
 class RealtimePosition(BaseModel):
     place: List[RealtimePositionRow]
+    # The collect of the line is failing and this is its last good frame
+    stale: bool = False
     
 # The data model of realtime station info
 # This model is divided into left and right.
@@ -87,6 +89,18 @@ class RealtimeArrival(BaseModel):
     left: List[RealtimeArrivalRow]
     right: List[RealtimeArrivalRow]
 
+# Realtime data of a transform cycle shared with the API
+# Immutable: it is replaced as a whole (one reference swap) and never changed after it is published.
+# So a reader sees position and arrival data of the same cycle without a lock.
+# seq is increased by each publish. It can be used as a cache key.
+class RealtimeSnapshot(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
+    seq: int
+    built_at: datetime
+    position: dict[int, RealtimePosition] = {} # line_id -> position
+    arrival: dict[int, List[RealtimeArrivalRow]] = {} # station_id -> arrival rows
+
 # The data model of realtime data
 # The line attribute is realtime position data
 # The station attribute is realtime arrival data
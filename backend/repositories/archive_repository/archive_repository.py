@@ -0,0 +1,44 @@
+from abc import ABC, abstractmethod
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+class ArchiveRepository(ABC):
+    
+    @abstractmethod
+    def save_realtimes(self, op_date: str, chunks: Iterable[pd.DataFrame]) -> int:
+        """ Archive realtime data of an operational date
+
+        Args:
+            op_date (str): operational date. YYYY-MM-DD
+            chunks (Iterable[pd.DataFrame]): realtime data. e.g. RealtimeRepository.iter_realtimes
+
+        Returns:
+            int: the number of archived rows
+        """
+        pass
+    
+    @abstractmethod
+    def open_realtimes(self, op_date: str) -> dict[str, np.ndarray]:
+        """ Columns of archived realtime data. (memory mapped if the archive isn't compressed)
+
+        Args:
+            op_date (str): operational date. YYYY-MM-DD
+
+        Returns:
+            dict[str, np.ndarray]: column name -> array
+        """
+        pass
+    
+    @abstractmethod
+    def load_realtimes(self, op_date: str) -> pd.DataFrame:
+        """ Archived realtime data of an operational date as a frame
+        """
+        pass
+    
+    @abstractmethod
+    def find_archived_dates(self) -> list[str]:
+        """ Operational dates which are archived
+        """
+        pass
@@ -0,0 +1,119 @@
+import os
+import logging
+from typing import Iterable
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from repositories.archive_repository.archive_repository import ArchiveRepository
+from utils.columnar import DictionaryEncoder, smallest_uint_dtype, smallest_int_dtype, delta_encode, delta_decode, save_columns, load_meta, load_columns
+
+logger = logging.getLogger("columnar_archive_repository")
+
+"""
+    Daily columnar archive of realtime data
+
+    {archive_dir}/realtimes_YYYYMMDD/
+        meta.json: version, op_date, rows, received_at_start
+        columns.npz: compressed columns below (version 2). Version 1 has a plain .npy file for each column.
+        line_id.npy: int16
+        station_code.npy, station_ids.npy: dictionary encoded station_id (codes in the smallest uint)
+        train_code.npy, train_ids.npy: dictionary encoded train_id
+        train_status.npy: int8
+        received_at_delta.npy: seconds from the previous row. Rows are sorted by received_at, so deltas are small.
+        requested_at_offset.npy: requested_at - received_at in seconds
+
+    A closed day isn't written again, so the columns are compressed with np.savez_compressed.
+    They are decompressed into memory when the day is opened. (version 1 archives are still memory mapped)
+    A row takes about 8 bytes before compression instead of 100+ bytes of a SQLite or PostgreSQL row.
+"""
+
+ARCHIVE_VERSION = 2
+READABLE_VERSIONS = (1, 2)
+ARCHIVE_PREFIX = "realtimes_"
+
+def to_seconds(values) -> np.ndarray:
+    # "YYYY-MM-DD HH:MM:SS[.ffffff]" -> seconds since epoch (naive local time)
+    return pd.to_datetime(pd.Series(values), format="ISO8601").to_numpy(dtype="datetime64[s]").astype(np.int64)
+
+class ColumnarArchiveRepository(ArchiveRepository):
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+    def _path(self, op_date: str) -> str:
+        return os.path.join(self.archive_dir, ARCHIVE_PREFIX + datetime.strptime(op_date, "%Y-%m-%d").strftime("%Y%m%d"))
+
+    def save_realtimes(self, op_date: str, chunks: Iterable[pd.DataFrame]) -> int:
+        stations, trains = DictionaryEncoder(), DictionaryEncoder()
+        parts: dict[str, list[np.ndarray]] = {c: [] for c in ("line_id", "station_code", "train_code", "train_status", "received_at", "requested_at")}
+
+        # Encode chunk by chunk. Only compact arrays are kept.
+        for df in chunks:
+            parts["line_id"].append(df["line_id"].to_numpy(dtype=np.int16))
+            parts["station_code"].append(stations.encode(df["station_id"].to_numpy(dtype=np.int64)))
+            parts["train_code"].append(trains.encode(df["train_id"].to_numpy(dtype=object)))
+            parts["train_status"].append(df["train_status"].to_numpy(dtype=np.int8))
+            parts["received_at"].append(to_seconds(df["received_at"]))
+            parts["requested_at"].append(to_seconds(df["requested_at"]))
+
+        columns = {c: np.concatenate(v) if len(v) > 0 else np.empty(0, dtype=np.int64) for c, v in parts.items()}
+        rows = len(columns["received_at"])
+
+        # Sort by received_at for small deltas
+        order = np.argsort(columns["received_at"], kind="stable")
+        columns = {c: v[order] for c, v in columns.items()}
+        received_at_start, received_at_delta = delta_encode(columns["received_at"])
+        requested_at_offset = columns["requested_at"] - columns["received_at"]
+
+        save_columns(
+            self._path(op_date),
+            {
+                "line_id": columns["line_id"].astype(np.int16),
+                "station_code": columns["station_code"].astype(smallest_uint_dtype(max(len(stations.values) - 1, 0))),
+                "station_ids": np.array(stations.values, dtype=np.int64),
+                "train_code": columns["train_code"].astype(smallest_uint_dtype(max(len(trains.values) - 1, 0))),
+                "train_ids": np.array(trains.values, dtype=str),
+                "train_status": columns["train_status"].astype(np.int8),
+                "received_at_delta": received_at_delta,
+                "requested_at_offset": requested_at_offset.astype(smallest_int_dtype(int(requested_at_offset.min(initial=0)), int(requested_at_offset.max(initial=0)))),
+            },
+            {"version": ARCHIVE_VERSION, "op_date": op_date, "rows": rows, "received_at_start": received_at_start},
+            compressed = True
+        )
+        logger.info(f"Archive {rows} realtime rows of {op_date}")
+        return rows
+
+    def open_realtimes(self, op_date: str) -> dict[str, np.ndarray]:
+        path = self._path(op_date)
+        if not os.path.exists(path):
+            raise Exception(f"There isn't no archive of {op_date}")
+        meta = load_meta(path)
+        if meta["version"] not in READABLE_VERSIONS:
+            raise Exception(f"There isn't no reader of archive version {meta['version']}")
+
+        names = ("line_id", "station_code", "station_ids", "train_code", "train_ids", "train_status", "received_at_delta", "requested_at_offset")
+        columns = load_columns(path, list(names))
+        columns["received_at_start"] = np.int64(meta["received_at_start"])
+        return columns
+
+    def load_realtimes(self, op_date: str) -> pd.DataFrame:
+        columns = self.open_realtimes(op_date)
+        received_at = delta_decode(int(columns["received_at_start"]), columns["received_at_delta"])
+        requested_at = received_at + columns["requested_at_offset"]
+        return pd.DataFrame({
+            "line_id": columns["line_id"].astype(np.int64),
+            "station_id": columns["station_ids"][columns["station_code"]],
+            "train_id": pd.array(columns["train_ids"][columns["train_code"]], dtype="string"),
+            "received_at": received_at.astype("datetime64[s]"),
+            "train_status": columns["train_status"].astype(np.int64),
+            "requested_at": requested_at.astype("datetime64[s]"),
+        })
+
+    def find_archived_dates(self) -> list[str]:
+        dates = []
+        for name in sorted(os.listdir(self.archive_dir)):
+            if name.startswith(ARCHIVE_PREFIX) and not name.endswith(".tmp"):
+                dates.append(datetime.strptime(name[len(ARCHIVE_PREFIX):], "%Y%m%d").strftime("%Y-%m-%d"))
+        return dates
@@ -1,4 +1,7 @@
 from abc import ABC, abstractmethod
+from typing import Iterator
+
+import pandas as pd
 
 class RealtimeRepository(ABC):
     
@@ -12,13 +15,13 @@ class RealtimeRepository(ABC):
     
     @abstractmethod
     def upsert_realtimes(self, data: list[dict]):
-        """ Insert data to realtime data
+        """ Insert data to realtime data of the operational date of each row
         """
         pass
     
     @abstractmethod
     def remove_realtimes(self, op_date: str):
-        """ Remove all data from realtime data
+        """ Remove all realtime data of the operational date
         """
         pass
     
@@ -32,4 +35,17 @@ class RealtimeRepository(ABC):
         Returns:
             list[dict]: _description_
         """
-        pass
\ No newline at end of file
+        pass
+    
+    @abstractmethod
+    def iter_realtimes(self, op_date: str, chunk_size: int = 50000) -> Iterator[pd.DataFrame]:
+        """ Stream all data of a specified date in chunks
+
+        Args:
+            op_date (str): operational date. YYYY-MM-DD
+            chunk_size (int): the maximum number of rows of a chunk
+
+        Returns:
+            Iterator[pd.DataFrame]: typed frames of at most chunk_size rows
+        """
+        pass
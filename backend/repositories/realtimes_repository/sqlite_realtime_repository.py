@@ -1,49 +1,265 @@
+import re
+import logging
+import threading
+from typing import Iterator
+from datetime import datetime, timedelta
 
-from sqlalchemy import create_engine, text
+import numpy as np
+import pandas as pd
+
+from sqlalchemy import create_engine, text, event, inspect, MetaData
 from sqlalchemy.orm import Session
 from sqlalchemy.dialects.sqlite import insert
 
 from repositories.realtimes_repository.realtime_repository import RealtimeRepository
 from model.sqlalchemy_model import Realtime
+from utils.utils import OP_DAY_START, OP_DAY_START_SECONDS
+
+logger = logging.getLogger("sqlite_realtime_repository")
+
+"""
+    High throughput write mode of SQLite
+
+    1. journal_mode=WAL: Readers (end of day job) don't block the writer (collect) and vice versa.
+    2. synchronous=NORMAL: fsync only at checkpoints. A power loss can drop the last transactions, not corrupt the db.
+    3. cache_size, temp_store: Keep pages and temporary tables in memory.
+    4. busy_timeout: Wait for a lock instead of raising "database is locked" at once.
+
+    The upsert statement is compiled once and rows are bound as tuples by executemany of the driver.
+    Per row bind processing of SQLAlchemy is skipped, so timestamps are formatted here
+    in the same format as the DateTime type of SQLAlchemy. (YYYY-MM-DD HH:MM:SS.ffffff)
+
+    Partitioning by operational date
+        Rows are stored in one table per operational date: realtimes_YYYYMMDD (same schema as Realtime)
+        The operational date of a row is DATE(received_at - 04:50), the same as the filter of find_realtimes before partitioning.
+        A row received before 04:50 and requested after it stays in the previous date.
+        find_realtimes reads only the table of the date and remove_realtimes drops it.
+        Tables are created on the first upsert of the date. No other table (e.g. realtimes) is needed.
+
+    Startup (prepare_partitions)
+        1. Rows of the single table before partitioning (realtimes) are moved to the partitions once, and the table is dropped.
+           It is idempotent: rows which are in the partition already are kept and a failed move is done again on the next start.
+        2. Partitions older than the retention window are dropped. e.g. days whose archive failed
+"""
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -20000, # KiB
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000 # ms
+}
+
+# Order of the parameters of the upsert statement
+UPSERT_COLUMNS = ("line_id", "station_id", "train_id", "received_at", "train_status", "requested_at")
+
+PARTITION_PREFIX = "realtimes_"
+PARTITION_PATTERN = re.compile(r"^realtimes_([0-9]{8})$")
+# The single table before partitioning
+LEGACY_TABLE = Realtime.__tablename__
+# Operational date starts at 04:50 (utils.OP_DAY_START)
+OP_DATE_OFFSET = timedelta(seconds=OP_DAY_START_SECONDS)
+
+def partition_name(op_date: str) -> str:
+    # YYYY-MM-DD -> realtimes_YYYYMMDD
+    return PARTITION_PREFIX + datetime.strptime(op_date, "%Y-%m-%d").strftime("%Y%m%d")
+
+def get_op_date(value: datetime|str) -> str:
+    """ Operational date (YYYY-MM-DD) of a timestamp """
+    if isinstance(value, str):
+        # "YYYY-MM-DD HH:MM:SS..."
+        if value[11:16] >= OP_DAY_START[0:5]:
+            return value[:10]
+        value = datetime.strptime(value[:10], "%Y-%m-%d")
+        return (value - timedelta(days=1)).strftime("%Y-%m-%d")
+    return (value - OP_DATE_OFFSET).strftime("%Y-%m-%d")
+
+# column -> dtype of frames from iter_realtimes
+REALTIME_DTYPES = {
+    "line_id": "int64",
+    "station_id": "int64",
+    "train_id": "string",
+    "received_at": "string",
+    "train_status": "int64",
+    "requested_at": "string"
+}
+
+def to_sqlite_datetime(value: datetime|str) -> str:
+    if isinstance(value, str):
+        # "YYYY-MM-DD HH:MM:SS" from the API
+        return value + ".000000" if len(value) == 19 else value
+    return value.isoformat(" ", "microseconds")
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
 
 class SqliteRealtimeRepository(RealtimeRepository):
-    
+
     def create_engine(self, db_url: str):
         self.db_url = db_url
         self.engine = create_engine(self.db_url)
-        
+        # Pragmas are set on every new connection
+        event.listen(self.engine, "connect", set_sqlite_pragmas)
+
+        # Partition tables which exist. table name -> compiled upsert statement
+        self.partitions: dict[str, str] = {}
+        self.partition_metadata = MetaData()
+        self.partition_lock = threading.Lock()
+
+    def _compile_upsert(self, table) -> str:
+        # Upsert statement is compiled once for each partition. Rows are bound by executemany.
+        insert_stmt = insert(table)
+        upsert_stmt = insert_stmt.on_conflict_do_update(
+            index_elements=['line_id', 'station_id', 'train_id', 'train_status'],
+            set_={"received_at": insert_stmt.excluded.received_at, "requested_at": insert_stmt.excluded.requested_at}
+        )
+        compiled = upsert_stmt.compile(dialect=self.engine.dialect)
+        if tuple(compiled.positiontup) != UPSERT_COLUMNS:
+            raise Exception(f"There isn't the expected parameter order of the upsert statement: {compiled.positiontup}")
+        return compiled.string
+
+    def _get_partition(self, op_date: str) -> str:
+        """ Create the partition table of the operational date if it doesn't exist
+
+        Returns:
+            str: compiled upsert statement of the partition
+        """
+        name = partition_name(op_date)
+        with self.partition_lock:
+            if name not in self.partitions:
+                table = self.partition_metadata.tables.get(name)
+                if table is None:
+                    table = Realtime.__table__.to_metadata(self.partition_metadata, name=name)
+                table.create(self.engine, checkfirst=True)
+                self.partitions[name] = self._compile_upsert(table)
+            return self.partitions[name]
+
+    def prepare_partitions(self, retention_days: int|None = None):
+        """ Startup job of partitions. See the module docstring.
+
+        Args:
+            retention_days (int, optional): Partitions older than retention_days before the current operational date are dropped.
+                None keeps every partition.
+        """
+        self.migrate_legacy_table()
+        if retention_days is not None:
+            self.drop_old_partitions(retention_days)
+
+    def migrate_legacy_table(self) -> int:
+        """ Move rows of the single table before partitioning to the partitions of their operational date
+
+        Returns:
+            int: the number of moved rows
+        """
+        if not inspect(self.engine).has_table(LEGACY_TABLE):
+            return 0
+        # The same operational date as get_op_date
+        op_date_sql = f"DATE(received_at, '-{OP_DAY_START_SECONDS} seconds')"
+        with self.engine.connect() as conn:
+            op_dates = [row[0] for row in conn.exec_driver_sql(f'SELECT DISTINCT {op_date_sql} FROM "{LEGACY_TABLE}"')]
+        for op_date in op_dates:
+            self._get_partition(op_date)
+
+        columns = ", ".join(UPSERT_COLUMNS)
+        rows = 0
+        # One transaction: rows are moved and the table is dropped together
+        with self.engine.begin() as conn:
+            for op_date in op_dates:
+                result = conn.exec_driver_sql(
+                    f'INSERT OR IGNORE INTO "{partition_name(op_date)}" ({columns}) SELECT {columns} FROM "{LEGACY_TABLE}" WHERE {op_date_sql} = ?',
+                    (op_date,)
+                )
+                rows += result.rowcount
+            conn.exec_driver_sql(f'DROP TABLE IF EXISTS "{LEGACY_TABLE}"')
+        logger.info(f"Move {rows} rows of {LEGACY_TABLE} to partitions of {op_dates}")
+        return rows
+
+    def find_partitions(self) -> list[str]:
+        """ Operational dates (YYYY-MM-DD) which have a partition """
+        op_dates = []
+        for name in inspect(self.engine).get_table_names():
+            match = PARTITION_PATTERN.match(name)
+            if match is not None:
+                op_dates.append(datetime.strptime(match.group(1), "%Y%m%d").strftime("%Y-%m-%d"))
+        return sorted(op_dates)
+
+    def drop_old_partitions(self, retention_days: int, now: datetime|None = None) -> list[str]:
+        """ Drop partitions older than retention_days before the operational date of now
+
+        Returns:
+            list[str]: operational dates of the dropped partitions
+        """
+        oldest = (datetime.strptime(get_op_date(now or datetime.now()), "%Y-%m-%d") - timedelta(days=retention_days)).strftime("%Y-%m-%d")
+        dropped = [op_date for op_date in self.find_partitions() if op_date < oldest]
+        for op_date in dropped:
+            self.remove_realtimes(op_date)
+        if len(dropped) > 0:
+            logger.info(f"Drop partitions older than {oldest}: {dropped}")
+        return dropped
+
+    def has_partition(self, op_date: str) -> bool:
+        return inspect(self.engine).has_table(partition_name(op_date))
+
     def dispose(self):
         self.engine.dispose()
-        
+
     def find_realtimes(self, op_date: str) -> list[dict]:
+        if not self.has_partition(op_date):
+            return []
         with Session(self.engine) as session:
-            response = session.execute(text(
-                    """
-                    SELECT *
-                    FROM realtimes
-                    WHERE DATE(received_at, "-04:50:00") = :op_date
-                    """),
-                {"op_date":op_date}
-            )
+            response = session.execute(text(f'SELECT * FROM "{partition_name(op_date)}"'))
             columns = response.keys()
             data = [
-                {c:row[i] for i, c in enumerate(columns)} 
+                {c:row[i] for i, c in enumerate(columns)}
                 for row in response.fetchall()
             ]
         return data
-    
+
+    def iter_realtimes(self, op_date: str, chunk_size: int = 50000) -> Iterator[pd.DataFrame]:
+        if not self.has_partition(op_date):
+            return
+        columns = list(REALTIME_DTYPES)
+        with self.engine.connect() as conn:
+            # The cursor of sqlite3 fetches rows lazily
+            result = conn.exec_driver_sql(f'SELECT {", ".join(columns)} FROM "{partition_name(op_date)}"')
+            while True:
+                rows = result.fetchmany(chunk_size)
+                if len(rows) == 0:
+                    break
+                # Rows -> typed column arrays without dicts of each row
+                values = list(zip(*rows))
+                yield pd.DataFrame({
+                    c: np.array(v, dtype=dtype) if dtype == "int64" else pd.array(v, dtype=dtype)
+                    for (c, dtype), v in zip(REALTIME_DTYPES.items(), values)
+                })
+
     def remove_realtimes(self, op_date: str):
-        with Session(self.engine) as session:
-            delete_stmt = text("DELETE FROM realtimes WHERE DATE(requested_at, '-04:50:00') = :op_date")
-            session.execute(delete_stmt, {"op_date":op_date})
-            session.commit()
-            
+        # Drop the partition instead of deleting rows
+        name = partition_name(op_date)
+        with self.partition_lock:
+            with self.engine.begin() as conn:
+                conn.exec_driver_sql(f'DROP TABLE IF EXISTS "{name}"')
+            self.partitions.pop(name, None)
+
     def upsert_realtimes(self, data: list[dict]):
-        with Session(self.engine) as session:
-            insert_stmt = insert(Realtime).values(data)
-            upsert_stmt = insert_stmt.on_conflict_do_update(
-                index_elements=['line_id', 'station_id', 'train_id', 'train_status'],
-                set_={"received_at": insert_stmt.excluded.received_at, "requested_at": insert_stmt.excluded.requested_at}
+        if len(data) == 0:
+            return
+        # Route rows to the partition of their operational date
+        params_by_op_date: dict[str, list[tuple]] = {}
+        op_dates: dict = {}
+        for d in data:
+            received_at = d["received_at"]
+            op_date = op_dates.get(received_at)
+            if op_date is None:
+                op_date = op_dates[received_at] = get_op_date(received_at)
+            params_by_op_date.setdefault(op_date, []).append(
+                (int(d["line_id"]), int(d["station_id"]), str(d["train_id"]), to_sqlite_datetime(received_at), int(d["train_status"]), to_sqlite_datetime(d["requested_at"]))
             )
-            session.execute(upsert_stmt)
-            session.commit()
\ No newline at end of file
+        upsert_sqls = {op_date: self._get_partition(op_date) for op_date in params_by_op_date}
+        # One transaction per call
+        with self.engine.begin() as conn:
+            for op_date, params in params_by_op_date.items():
+                conn.exec_driver_sql(upsert_sqls[op_date], params)
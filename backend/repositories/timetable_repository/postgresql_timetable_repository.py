@@ -49,6 +49,24 @@ class PostgresqlTimetableRepository(TimetableRepository):
             ]
         return data
         
+    def find_timetable_version(self, op_date: str, day_code: int) -> str:
+        # Aggregates of the rows of find_timetable_for_calculation_delay without the join
+        with Session(self.engine) as session:
+            row = session.execute(text(
+                    """
+                    SELECT 
+                        COUNT(*),
+                        MAX(tb.updated_at),
+                        MAX(tb.end_date),
+                        (SELECT COUNT(*) FROM stations) AS station_count
+                    FROM timetables tb
+                    WHERE (tb.updated_at <= :op_date AND (tb.end_date > :op_date OR tb.end_date IS NULL))
+                    AND tb.day_code = :day_code
+                    """),
+                {"op_date":op_date, "day_code": day_code}
+            ).fetchone()
+        return ":".join(str(v) for v in row)
+        
     def find_timetable_by_station_public_code(self, op_date: str, station_public_code: str) -> dict[str, Timetable]:
         with Session(self.engine) as session:
             response = session.execute(text(
@@ -25,6 +25,21 @@ class TimetableRepository(ABC):
         """
         pass
     
+    @abstractmethod
+    def find_timetable_version(self, op_date: str, day_code: int) -> str:
+        """Query a version stamp of the timetable for calculation delay.
+        The stamp is changed when the result of find_timetable_for_calculation_delay is changed.
+        It is used to validate a local snapshot of the timetable without loading the timetable.
+
+        Args:
+            op_date (str): operation date
+            day_code (int): 8 weekday, 9 holiday
+
+        Returns:
+            str: version stamp
+        """
+        pass
+    
     @abstractmethod
     def find_timetable_by_station_public_code(self, op_date: str, station_public_code: str) -> list[dict]:
         """Query timetable information
@@ -7,8 +7,11 @@ import time
 from dotenv import load_dotenv
 
 from communication.ipc_listener import IPCListener 
+from communication.position_delta import merge_payloads
+from communication.wire_format import encode_payload
 
 from services.collect.src.realtime_collect_worker import RealtimeCollectWorker
+from services.collect.src.realtime_record import RealtimeRecorder, ReplaySession
 from repositories.realtimes_repository.sqlite_realtime_repository import SqliteRealtimeRepository
 
 if __name__ == "__main__":
@@ -91,18 +94,32 @@ if __name__ == "__main__":
     
     # Parameter
     interval = 10
+    # Record raw responses or replay recorded responses
+    record_dir = os.getenv("COLLECT_RECORD_DIR")
+    replay_dir = os.getenv("COLLECT_REPLAY_DIR")
+    recorder = RealtimeRecorder(record_dir) if record_dir else None
+    replay_session = ReplaySession(replay_dir, float(os.getenv("COLLECT_REPLAY_SPEED", "1"))) if replay_dir else None
+    
     # Create IPC listener
-    ipc_listener = IPCListener(address)
+    # Unsent deltas are composed, not replaced
+    # Payloads are sent in the binary wire format. The transform decodes them. (decode_payload)
+    ipc_listener = IPCListener(address, merge_payloads, encode_payload)
     ipc_listener.start()
     # Create SQLite repository
     sqlite_realtime_repository = SqliteRealtimeRepository()
     sqlite_realtime_repository.create_engine(db_url)
+    # Move the table before partitioning and drop partitions older than the retention
+    retention_days = os.getenv("REALTIME_RETENTION_DAYS")
+    sqlite_realtime_repository.prepare_partitions(int(retention_days) if retention_days else None)
     
     realtime_collect_worker = RealtimeCollectWorker(
         interval, 
         ipc_listener, 
         sqlite_realtime_repository,
         os.getenv("START_TIME"),
-        os.getenv("END_TIME")
+        os.getenv("END_TIME"),
+        os.getenv("COLLECT_OVERRUN_POLICY", "skip"),
+        recorder,
+        replay_session
     )
     realtime_collect_worker.start()
\ No newline at end of file
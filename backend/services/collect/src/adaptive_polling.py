@@ -0,0 +1,158 @@
+import time
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger("adaptive_polling")
+
+"""
+    AdaptivePollingPlanner Class
+
+    To assign each line its own poll interval.
+
+    Request budget
+        The same number of requests as polling every line every base_interval seconds.
+        If the daily quota is set, the budget is reduced so that the remaining quota lasts until end_time.
+        quota_source (e.g. ApiKeyPool.remaining_quota) replaces the own count of the planner.
+
+    realtimeStationArrival/ALL is polled every base_interval seconds and counted in the quota.
+
+    Weight of a line
+        activity = active train count + change_weight * position changes per minute
+        Busy lines get a shorter interval, sparse lines a longer one.
+        interval_i = sum(weights) / (budget_rate * weight_i), clamped to [min_interval, max_interval]
+"""
+
+class AdaptivePollingPlanner:
+    def __init__(self,
+                 line_ids: list[int],
+                 base_interval: float,
+                 min_interval: float,
+                 max_interval: float,
+                 end_time: str,
+                 daily_quota: int|None = None,
+                 quota_source = None,
+                 change_weight: float = 1.0,
+                 smoothing: float = 0.3,
+                 clock = time.time):
+        self.line_ids = list(line_ids)
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.end_time = end_time # HH:MM:SS
+        self.daily_quota = daily_quota
+        self.quota_source = quota_source
+        self.change_weight = change_weight
+        self.smoothing = smoothing # EWMA factor of the change rate
+        self.clock = clock
+
+        # State of lines
+        self.train_counts: dict[int, int] = {line_id: 0 for line_id in self.line_ids}
+        self.change_rates: dict[int, float] = {line_id: 0.0 for line_id in self.line_ids} # changes per minute
+        self.last_states: dict[int, dict[str, tuple]] = {}
+        self.last_polled: dict[int|str, float] = {}
+        self.intervals: dict[int, float] = {line_id: base_interval for line_id in self.line_ids}
+
+        # Quota usage of the day
+        self.used_requests = 0
+        self.quota_date = datetime.fromtimestamp(self.clock()).date()
+
+    def remaining_quota(self) -> int|None:
+        if self.quota_source is not None:
+            return self.quota_source()
+        if self.daily_quota is None:
+            return None
+        return max(0, self.daily_quota - self.used_requests)
+
+    def _reset_quota_if_new_day(self, now: float):
+        today = datetime.fromtimestamp(now).date()
+        if today != self.quota_date:
+            self.quota_date = today
+            self.used_requests = 0
+
+    def _remaining_seconds(self, now: float) -> float:
+        # Seconds until end_time, today or tomorrow.
+        cur_datetime = datetime.fromtimestamp(now)
+        end = datetime.combine(cur_datetime.date(), datetime.strptime(self.end_time, "%H:%M:%S").time())
+        if end.timestamp() <= now:
+            end += timedelta(days=1)
+        return end.timestamp() - now
+
+    def budget_rate(self, now: float|None = None) -> float:
+        """ Requests per second that can be spent on the lines.
+        """
+        now = self.clock() if now is None else now
+        rate = len(self.line_ids) / self.base_interval
+        remaining_quota = self.remaining_quota()
+        if remaining_quota is not None:
+            rate = min(rate, remaining_quota / self._remaining_seconds(now))
+        return rate
+
+    def weight(self, line_id: int) -> float:
+        activity = self.train_counts[line_id] + self.change_weight * self.change_rates[line_id]
+        return max(activity, 1.0)
+
+    def plan(self, now: float|None = None) -> dict[int, float]:
+        """ Reassign the poll interval of every line.
+
+        Returns:
+            dict[int, float]: line_id -> interval seconds
+        """
+        now = self.clock() if now is None else now
+        rate = self.budget_rate(now)
+        weights = {line_id: self.weight(line_id) for line_id in self.line_ids}
+        total = sum(weights.values())
+        for line_id, w in weights.items():
+            interval = total / (rate * w) if rate > 0 else self.max_interval
+            self.intervals[line_id] = min(self.max_interval, max(self.min_interval, interval))
+        return self.intervals
+
+    def due_lines(self, now: float|None = None, tolerance: float = 0.5) -> list[int]:
+        """ Lines to poll now
+
+        Args:
+            tolerance (float): Lines due within tolerance seconds are polled as well.
+        """
+        now = self.clock() if now is None else now
+        self._reset_quota_if_new_day(now)
+        self.plan(now)
+        return [
+            line_id for line_id in self.line_ids
+            if line_id not in self.last_polled or now + tolerance >= self.last_polled[line_id] + self.intervals[line_id]
+        ]
+
+    def arrival_all_due(self, now: float|None = None, tolerance: float = 0.5) -> bool:
+        now = self.clock() if now is None else now
+        return "ALL" not in self.last_polled or now + tolerance >= self.last_polled["ALL"] + self.base_interval
+
+    def record_request(self, key: int|str, now: float|None = None):
+        # Count a request in the quota
+        now = self.clock() if now is None else now
+        self.used_requests += 1
+        self.last_polled[key] = now
+
+    def observe(self, line_id: int, data: list[dict]|None, now: float|None = None):
+        """ Update the state of a line after polling it.
+
+        Args:
+            line_id (int): polled line
+            data (list[dict] | None): raw realtimePosition rows. None when the request failed.
+        """
+        now = self.clock() if now is None else now
+        prev_polled = self.last_polled.get(line_id)
+        self.record_request(line_id, now)
+        if data is None:
+            return
+
+        # Position state of each train
+        states = {row.get("trainNo"): (row.get("statnId"), row.get("trainSttus")) for row in data}
+        self.train_counts[line_id] = len(states)
+
+        prev_states = self.last_states.get(line_id)
+        self.last_states[line_id] = states
+        if prev_states is None or prev_polled is None or now <= prev_polled:
+            return
+
+        changes = sum(1 for train_id, state in states.items() if prev_states.get(train_id) != state)
+        changes += sum(1 for train_id in prev_states if train_id not in states)
+        rate = changes / (now - prev_polled) * 60
+        self.change_rates[line_id] = self.smoothing * rate + (1 - self.smoothing) * self.change_rates[line_id]
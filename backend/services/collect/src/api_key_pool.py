@@ -0,0 +1,137 @@
+import sqlite3
+import threading
+import logging
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger("api_key_pool")
+
+"""
+    ApiKeyPool Class
+
+    To spread requests over every key in the api_keys table.
+
+    Each key has its own usage and error codes reported from RealtimeAPI.parse_response.
+    acquire() returns the available key with the least usage of the day.
+
+    Error codes of Seoul open API which make a key unavailable
+    1. ERROR-337: Daily traffic limit exceeded. Unavailable until tomorrow.
+    2. INFO-100, ERROR-290: Invalid key. Unavailable until the pool is reloaded.
+    The other error codes (ERROR-500, ERROR-600, INFO-200, ...) are only counted.
+"""
+
+QUOTA_EXCEEDED_CODES = ("ERROR-337",)
+INVALID_KEY_CODES = ("INFO-100", "ERROR-290")
+
+class ApiKeyPool:
+    def __init__(self, db_path: str|None, daily_quota: int|None = None, clock = time.time, keys: list[str]|None = None):
+        self.db_path = db_path
+        self.daily_quota = daily_quota # per key
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        # key -> {"used": int, "errors": {code: count}, "disabled_until": timestamp|None}
+        self.keys: dict[str, dict] = {}
+        self.usage_date = datetime.fromtimestamp(self.clock()).date()
+        if keys is not None:
+            # Keys given directly. e.g. replay without the key db
+            self.keys = {key: self._new_state() for key in keys}
+        else:
+            self.load_keys()
+
+    def load_keys(self):
+        conn = sqlite3.connect(self.db_path)
+        cur = conn.cursor()
+        # Get all api keys
+        rows = cur.execute("SELECT key FROM api_keys").fetchall()
+        # Close connection.
+        cur.close()
+        conn.close()
+
+        if len(rows) == 0:
+            raise Exception(f"There are no api keys in {self.db_path}")
+
+        with self.lock:
+            self.keys = {row[0]: self._new_state() for row in rows}
+        logger.info(f"Load {len(self.keys)} api keys")
+
+    def _new_state(self) -> dict:
+        return {"used": 0, "errors": {}, "disabled_until": None}
+
+    def _reset_if_new_day(self, now: float):
+        today = datetime.fromtimestamp(now).date()
+        if today != self.usage_date:
+            self.usage_date = today
+            for state in self.keys.values():
+                state["used"] = 0
+
+    def _is_available(self, state: dict, now: float) -> bool:
+        if state["disabled_until"] is not None and state["disabled_until"] > now:
+            return False
+        if self.daily_quota is not None and state["used"] >= self.daily_quota:
+            return False
+        return True
+
+    def acquire(self) -> str:
+        """ Get the key with the least usage among available keys.
+            If there are no available keys, the least used key is returned anyway.
+        """
+        with self.lock:
+            now = self.clock()
+            self._reset_if_new_day(now)
+            available = [key for key, state in self.keys.items() if self._is_available(state, now)]
+            if len(available) == 0:
+                logger.error("There are no available api keys. Use the least used key.")
+                available = list(self.keys)
+            key = min(available, key=lambda k: self.keys[k]["used"])
+            self.keys[key]["used"] += 1
+            return key
+
+    def report(self, key: str, code: str|None):
+        """ Report the result code of a request made with the key.
+
+        Args:
+            key (str): api key
+            code (str | None): result code. INFO-000 or None means success.
+        """
+        if code is None or code == "INFO-000":
+            return
+        with self.lock:
+            state = self.keys.get(key)
+            if state is None:
+                return
+            state["errors"][code] = state["errors"].get(code, 0) + 1
+
+            now = self.clock()
+            if code in QUOTA_EXCEEDED_CODES:
+                tomorrow = datetime.combine(datetime.fromtimestamp(now).date() + timedelta(days=1), datetime.min.time())
+                state["disabled_until"] = tomorrow.timestamp()
+                logger.warning(f"Api key {self.mask(key)} exceeded the daily quota. Rotate to other keys.")
+            elif code in INVALID_KEY_CODES:
+                state["disabled_until"] = float("inf")
+                logger.error(f"Api key {self.mask(key)} is invalid. Error code is {code}.")
+
+    def remaining_quota(self) -> int|None:
+        """ Remaining requests of the day over all available keys. None means unlimited.
+        """
+        if self.daily_quota is None:
+            return None
+        with self.lock:
+            now = self.clock()
+            self._reset_if_new_day(now)
+            return sum(
+                max(0, self.daily_quota - state["used"])
+                for state in self.keys.values() if self._is_available(state, now)
+            )
+
+    def stats(self) -> dict[str, dict]:
+        with self.lock:
+            return {
+                f"#{i} {self.mask(key)}": {"used": state["used"], "errors": dict(state["errors"])} 
+                for i, (key, state) in enumerate(self.keys.items())
+            }
+
+    @staticmethod
+    def mask(key: str) -> str:
+        # Never write a whole key to logs
+        return key[:4] + "*" * max(0, len(key) - 4)
@@ -0,0 +1,70 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger("circuit_breaker")
+
+"""
+    CircuitBreaker Class
+
+    To stop requesting an endpoint which keeps failing.
+
+    States
+    1. closed: Requests are allowed. Opens after failure_threshold consecutive failures.
+    2. open: Requests are rejected without waiting on the network.
+             After recovery_timeout seconds, one probe request is allowed. (half_open)
+    3. half_open: The probe is in flight. Success closes the circuit, failure opens it again.
+                  A probe without a verdict (record_ignored) opens it again without counting a failure.
+"""
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 3, recovery_timeout: float = 60, clock = time.time):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: float|None = None
+
+    def allow_request(self) -> bool:
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.clock() - self.opened_at >= self.recovery_timeout:
+                # Probe
+                self.state = HALF_OPEN
+                logger.info(f"Circuit {self.name} is half open. Probe the endpoint.")
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit {self.name} is closed.")
+            self.state = CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"Circuit {self.name} is open after {self.failures} failures.")
+                self.state = OPEN
+                self.opened_at = self.clock()
+
+    def record_ignored(self):
+        # A result which isn't about the endpoint. (e.g. an error of the api key)
+        with self.lock:
+            if self.state == HALF_OPEN:
+                # Wait for the next probe
+                self.state = OPEN
+                self.opened_at = self.clock()
@@ -7,4 +7,31 @@ API_KEY_DB_PATH = os.getenv('API_KEY_DB_PATH')
 BASE_URL = os.getenv("BASE_URL")
 REALTIME_POSITION = os.getenv("REALTIME_POSITION")
 REALTIME_STATIONS_ARRIVAL = os.getenv("REALTIME_STATIONS_ARRIVAL")
-REALTIME_STATIONS_ARRIVAL_ALL = os.getenv("REALTIME_STATIONS_ARRIVAL_ALL")
\ No newline at end of file
+REALTIME_STATIONS_ARRIVAL_ALL = os.getenv("REALTIME_STATIONS_ARRIVAL_ALL")
+# Fetch mode of realtime collect: concurrent | sequential
+COLLECT_FETCH_MODE = os.getenv("COLLECT_FETCH_MODE", "concurrent")
+# The maximum number of requests in flight at once (concurrent mode)
+COLLECT_MAX_WORKERS = int(os.getenv("COLLECT_MAX_WORKERS", "20"))
+
+# Adaptive polling: Each line gets its own poll interval by train density and quota
+COLLECT_ADAPTIVE_POLLING = os.getenv("COLLECT_ADAPTIVE_POLLING", "false").lower() == "true"
+COLLECT_MIN_POLL_INTERVAL = float(os.getenv("COLLECT_MIN_POLL_INTERVAL", "5"))
+COLLECT_MAX_POLL_INTERVAL = float(os.getenv("COLLECT_MAX_POLL_INTERVAL", "60"))
+# Daily request quota of each API key. Empty means unlimited.
+API_DAILY_QUOTA = int(os.getenv("API_DAILY_QUOTA")) if os.getenv("API_DAILY_QUOTA") else None
+END_TIME = os.getenv("END_TIME")
+
+# Circuit breaker of each endpoint
+COLLECT_BREAKER_FAILURES = int(os.getenv("COLLECT_BREAKER_FAILURES", "3"))
+COLLECT_BREAKER_RECOVERY = float(os.getenv("COLLECT_BREAKER_RECOVERY", "60"))
+# Seconds to serve the last good frame of a failing endpoint as stale
+COLLECT_STALE_TTL = float(os.getenv("COLLECT_STALE_TTL", "120"))
+
+# Send a full position snapshot to transform every N cycles. The other cycles send deltas.
+COLLECT_FULL_SNAPSHOT_EVERY = int(os.getenv("COLLECT_FULL_SNAPSHOT_EVERY", "30"))
+
+# Write-behind queue of realtime rows
+# The maximum number of queued cycles, cycles in one transaction and seconds to wait when the queue is full
+COLLECT_WRITE_QUEUE_SIZE = int(os.getenv("COLLECT_WRITE_QUEUE_SIZE", "60"))
+COLLECT_WRITE_MAX_BATCH = int(os.getenv("COLLECT_WRITE_MAX_BATCH", "20"))
+COLLECT_WRITE_PUT_TIMEOUT = float(os.getenv("COLLECT_WRITE_PUT_TIMEOUT", "0.5"))
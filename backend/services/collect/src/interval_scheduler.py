@@ -0,0 +1,149 @@
+import time
+import math
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+
+from utils.utils import OP_DAY_START
+
+logger = logging.getLogger("interval_scheduler")
+
+"""
+    IntervalScheduler Class
+
+    To fire collection cycles on fixed wall-clock ticks.
+
+    Ticks are on a fixed grid: every multiple of interval seconds from the epoch.
+    So the period doesn't depend on how long a cycle takes and doesn't drift through the day.
+
+    Overrun policy: what to do when a cycle ends after the next tick
+    1. skip: Wait for the first tick after the current time. Missed ticks are counted.
+    2. immediate: Start the next cycle at once and go back on the grid after that.
+
+    Operating hours (start_time - end_time of tomorrow) are computed against the same clock.
+    Cycles don't start before the operational day (OP_DAY_START, 04:50).
+    Rows before it belong to the previous operational date, so an earlier start_time is moved to OP_DAY_START.
+"""
+
+OVERRUN_POLICIES = ("skip", "immediate")
+
+class IntervalScheduler:
+    def __init__(self,
+                 interval: float,
+                 start_time: str,
+                 end_time: str,
+                 overrun_policy: str = "skip",
+                 clock = time.time,
+                 sleep = time.sleep,
+                 history_size: int = 360):
+        if interval <= 0:
+            raise Exception(f"The interval must be positive. interval: {interval}")
+        if overrun_policy not in OVERRUN_POLICIES:
+            raise Exception(f"There isn't no overrun policy named {overrun_policy}")
+
+        self.interval = interval
+        self.start_time = max(start_time, OP_DAY_START) # HH:MM:SS
+        if self.start_time != start_time:
+            logger.info(f"Start time {start_time} is before the operational day. Start at {self.start_time}.")
+        self.end_time = end_time # HH:MM:SS
+        self.overrun_policy = overrun_policy
+        self.clock = clock
+        self.sleep = sleep
+
+        # The tick of the last cycle
+        self.last_tick: float|None = None
+        # Lateness of each tick. (tick, lateness seconds)
+        self.lateness: deque[tuple[float, float]] = deque(maxlen=history_size)
+        self.skipped_ticks = 0
+
+    def now(self) -> float:
+        return self.clock()
+
+    def is_operating(self, now: float|None = None) -> bool:
+        # Maintaining time: start_time - end_time (tomorrow)
+        now = self.now() if now is None else now
+        dt_str_now = datetime.fromtimestamp(now).strftime("%H:%M:%S")
+        return dt_str_now >= self.start_time or dt_str_now <= self.end_time
+
+    def next_start(self, now: float|None = None) -> float:
+        """ The first start_time after now
+
+        Returns:
+            float: timestamp of the next start
+        """
+        now = self.now() if now is None else now
+        cur_datetime = datetime.fromtimestamp(now)
+        start = datetime.combine(cur_datetime.date(), datetime.strptime(self.start_time, "%H:%M:%S").time())
+        if start.timestamp() <= now:
+            start += timedelta(days=1)
+        return start.timestamp()
+
+    def next_tick(self, now: float|None = None) -> float:
+        """ The tick of the next cycle.
+
+            Lateness is decided by the overrun policy when now is already past the scheduled tick.
+        """
+        now = self.now() if now is None else now
+
+        # First cycle or restart: the first tick on the grid after now.
+        if self.last_tick is None:
+            return math.ceil(now / self.interval) * self.interval
+
+        scheduled = self.last_tick + self.interval
+        if now <= scheduled:
+            return scheduled
+
+        # Overrun
+        missed = math.floor((now - scheduled) / self.interval)
+        if self.overrun_policy == "skip":
+            # Wait for the tick after now
+            self.skipped_ticks += missed + 1
+            return scheduled + (missed + 1) * self.interval
+        else:
+            # Run at once on the latest missed tick
+            self.skipped_ticks += missed
+            return scheduled + missed * self.interval
+
+    def wait_next_tick(self) -> tuple[float, float]:
+        """ Sleep until the next tick
+
+        Returns:
+            tuple[float, float]: the tick and its lateness in seconds
+        """
+        tick = self.next_tick()
+        remaining = tick - self.now()
+        if remaining > 0:
+            self.sleep(remaining)
+
+        lateness = max(0.0, self.now() - tick)
+        self.last_tick = tick
+        self.lateness.append((tick, lateness))
+        if lateness >= self.interval / 2:
+            logger.warning(f"Tick {datetime.fromtimestamp(tick).strftime("%H:%M:%S")} is late {lateness:.3f}s. Skipped ticks: {self.skipped_ticks}")
+        return tick, lateness
+
+    def wait_next_start(self) -> float:
+        """ Sleep until the next start_time and reset the grid
+
+        Returns:
+            float: timestamp of the start
+        """
+        start = self.next_start()
+        remaining = start - self.now()
+        if remaining > 0:
+            self.sleep(remaining)
+        self.last_tick = None
+        return start
+
+    def lateness_stats(self) -> dict:
+        """ Summary of recorded lateness
+        """
+        values = [lateness for _, lateness in self.lateness]
+        if len(values) == 0:
+            return {"ticks": 0, "mean": 0.0, "max": 0.0, "skipped": self.skipped_ticks}
+        return {
+            "ticks": len(values),
+            "mean": sum(values) / len(values),
+            "max": max(values),
+            "skipped": self.skipped_ticks
+        }
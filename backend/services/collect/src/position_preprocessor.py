@@ -0,0 +1,130 @@
+import logging
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("position_preprocessor")
+
+"""
+    Columnar preprocessing of realtimePosition rows
+
+    The raw rows are converted to typed column arrays in one pass.
+    1. Change the names of columns
+    2. Correct known station id errors from STATION_ID_CORRECTIONS and LAST_STATION_ID_CORRECTIONS
+       Rows which still have an invalid value are dropped one by one and logged.
+    3. Change the train id of line 2
+    4. Drop prev information (train_status not in 0, 1, 2)
+    5. Drop duplicates by (line_id, train_id) keeping the latest received_at, using a hashmap.
+    6. Sort by (line_id, train_id)
+
+    The cost is linear in the number of rows, except the sort of the remaining rows.
+"""
+
+# (line_id, station_name) -> station_id
+# The API sends an empty station id for these stations.
+STATION_ID_CORRECTIONS: dict[tuple[int, str], int] = {
+    (1067, "광운대"): 1067080119, # 경춘선 광운대
+    (1067, "용산"): 1063075110, # 경의중앙선 용산역 코드
+}
+# (line_id, last_station_name) -> last_station_id
+LAST_STATION_ID_CORRECTIONS: dict[tuple[int, str], int] = {
+    (1067, "광운대"): 1067080119, # 경춘선 광운대
+}
+
+# Line 2 train ids starting with these digits are changed to start with "2"
+LINE2_TRAIN_ID_PREFIXES = ("3", "4", "6", "7", "8", "9")
+
+VALID_TRAIN_STATUS = (0, 1, 2)
+
+# raw name -> (column name, dtype)
+COLUMNS = {
+    "subwayId": ("line_id", "int64"),
+    "subwayNm": ("line_name", "string"),
+    "statnId": ("station_id", "int64"),
+    "statnNm": ("station_name", "string"),
+    "trainNo": ("train_id", "string"),
+    "recptnDt": ("received_at", "string"),
+    "updnLine": ("up_down", "int64"),
+    "statnTid": ("last_station_id", "int64"),
+    "statnTnm": ("last_station_name", "string"),
+    "trainSttus": ("train_status", "int64"),
+    "directAt": ("express", "int64"),
+    "lstcarAt": ("is_last_train", "int64"),
+}
+
+def _station_id(line_id: int, value, station_name, corrections: dict[tuple[int, str], int]) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        station_id = corrections.get((line_id, station_name))
+        if station_id is None:
+            raise
+        return station_id
+
+def preprocess_realtime_position(data: list[dict]) -> pd.DataFrame:
+    """ Preprocess realtimePosition rows
+
+    Args:
+        data (list[dict]): raw rows of realtimePosition
+
+    Returns:
+        pd.DataFrame: typed frame. One row for each (line_id, train_id), sorted by (line_id, train_id).
+    """
+    rows: list[tuple] = []
+    # (line_id, train_id) -> index of rows
+    latest: dict[tuple[int, str], int] = {}
+    error_data = []
+
+    for raw in data:
+        try:
+            train_status = int(raw["trainSttus"])
+            if train_status not in VALID_TRAIN_STATUS:
+                continue
+
+            line_id = int(raw["subwayId"])
+            train_id = raw["trainNo"]
+            received_at = raw["recptnDt"]
+            if train_id is None or received_at is None:
+                raise ValueError("trainNo and recptnDt are required")
+            if line_id == 1002 and train_id.startswith(LINE2_TRAIN_ID_PREFIXES):
+                train_id = "2" + train_id[1:]
+
+            row = (
+                line_id,
+                raw["subwayNm"],
+                _station_id(line_id, raw["statnId"], raw["statnNm"], STATION_ID_CORRECTIONS),
+                raw["statnNm"],
+                train_id,
+                received_at,
+                int(raw["updnLine"]),
+                _station_id(line_id, raw["statnTid"], raw["statnTnm"], LAST_STATION_ID_CORRECTIONS),
+                raw["statnTnm"],
+                train_status,
+                int(raw["directAt"]),
+                int(raw["lstcarAt"]),
+            )
+        except (KeyError, TypeError, ValueError):
+            error_data.append(raw)
+            continue
+
+        key = (line_id, train_id)
+        idx = latest.get(key)
+        if idx is None:
+            latest[key] = len(rows)
+            rows.append(row)
+        elif received_at >= rows[idx][5]:
+            # Keep the latest received_at. The later row wins a tie.
+            rows[idx] = row
+
+    if len(error_data) >= 1:
+        logger.warning("There are some error data.")
+        logger.warning(error_data)
+
+    # Same order as sort_values(["line_id", "train_id", "received_at"]).drop_duplicates(keep="last")
+    rows.sort(key=itemgetter(0, 4))
+    columns = list(zip(*rows)) if len(rows) > 0 else [() for _ in COLUMNS]
+    return pd.DataFrame({
+        name: np.array(values, dtype=dtype) if dtype == "int64" else pd.array(values, dtype=dtype)
+        for (name, dtype), values in zip(COLUMNS.values(), columns)
+    })
@@ -1,9 +1,9 @@
-import sqlite3
 import logging
 
 import requests
 
-from .config import API_KEY_DB_PATH, BASE_URL, REALTIME_POSITION, REALTIME_STATIONS_ARRIVAL, REALTIME_STATIONS_ARRIVAL_ALL
+from .config import API_KEY_DB_PATH, BASE_URL, REALTIME_POSITION, REALTIME_STATIONS_ARRIVAL, REALTIME_STATIONS_ARRIVAL_ALL, API_DAILY_QUOTA
+from .api_key_pool import ApiKeyPool
 
 """ 
     RealtimeAPI Class
@@ -19,32 +19,34 @@ from .config import API_KEY_DB_PATH, BASE_URL, REALTIME_POSITION, REALTIME_STATI
         1. realtimePosition
         2. realtimeStationArrival
         3. realtimeStationArrival/ALL
-    3. API_KEY
+    3. API_KEY: Every key in the api_keys table. Requests are spread over the keys by ApiKeyPool.
+
+    Result codes
+    1. INFO-000: data
+    2. INFO-200: no data. (e.g. no trains on the line at night) It isn't an error of the endpoint.
 """
 
 logger = logging.getLogger("realtime_api")
 
+NO_DATA_CODES = ("INFO-200",)
+
 class RealtimeAPI:
-    def __init__(self):
-        self.api_key = self.get_key()
+    def __init__(self, api_keys: list[str]|None = None):
+        # api_keys: If None, keys are loaded from API_KEY_DB_PATH.
+        self.key_pool = ApiKeyPool(API_KEY_DB_PATH, API_DAILY_QUOTA, keys=api_keys)
         self.base_url = BASE_URL
 
     def get_key(self) -> str:
-        conn = sqlite3.connect(API_KEY_DB_PATH)
-        cur = conn.cursor()
-        # Get the api key
-        row = cur.execute("SELECT key FROM api_keys").fetchone()
-        # Close connection.
-        cur.close()
-        conn.close()
-        return row[0]    
+        # Get the key to use for the next request
+        return self.key_pool.acquire()
     
-    def get_url(self, api_name: str, name: str = None) -> str:
+    def get_url(self, api_name: str, name: str = None, api_key: str|None = None) -> str:
         """ Get endpoint
 
         Args:
             api_name (str): realtimePosition | realtimeStationArrival | realtimeStationArrival/ALL
             name (str, optional): additional parameter. Defaults to None.
+            api_key (str, optional): api key of the request. Defaults to a key from the key pool.
 
         Raises:
             Exception: Raise exception if the api_name is wrong.
@@ -52,19 +54,30 @@ class RealtimeAPI:
         Returns:
             str: endpoint
         """
-        if api_name == REALTIME_POSITION: return f"{self.base_url}/{self.api_key}/json/{REALTIME_POSITION}/0/1000/{name}"
-        elif api_name == REALTIME_STATIONS_ARRIVAL: return f"{self.base_url}/{self.api_key}/json/{REALTIME_STATIONS_ARRIVAL}/0/1000/{name}"
-        elif api_name == REALTIME_STATIONS_ARRIVAL_ALL: return f"{self.base_url}/{self.api_key}/json/{REALTIME_STATIONS_ARRIVAL_ALL}"
+        api_key = self.get_key() if api_key is None else api_key
+        if api_name == REALTIME_POSITION: return f"{self.base_url}/{api_key}/json/{REALTIME_POSITION}/0/1000/{name}"
+        elif api_name == REALTIME_STATIONS_ARRIVAL: return f"{self.base_url}/{api_key}/json/{REALTIME_STATIONS_ARRIVAL}/0/1000/{name}"
+        elif api_name == REALTIME_STATIONS_ARRIVAL_ALL: return f"{self.base_url}/{api_key}/json/{REALTIME_STATIONS_ARRIVAL_ALL}"
         else: raise Exception(f"There isn't no api named {api_name}")
     
-    def parse_response(self, response: requests.models.Response|None) -> list[dict]|None:
+    def parse_response(self, response: requests.models.Response|None, api_key: str|None = None) -> list[dict]|None:
         """ Parsing requests.models.response
         Parameters: 
         response (requests.Response) : response for request_get() 
+        api_key (str, optional) : the key of the request. The result code is reported to the key pool.
         
         Return: 
         data(json) or None
         """
+        return self.parse_result(response, api_key)[1]
+    
+    def parse_result(self, response: requests.models.Response|None, api_key: str|None = None) -> tuple[str|None, list[dict]|None]:
+        """ Parsing requests.models.response with its result code
+        
+        Return:
+        (code, data): code is the result code of the API (e.g. INFO-000, INFO-200) or None if there is no response. 
+        data is None unless the code is INFO-000.
+        """
         # HTTP error
         try:
             status_code = response.status_code
@@ -73,30 +86,40 @@ class RealtimeAPI:
             if status_code != 200:
                 # status code != 200 is error
                 logger.error(f'The response status code is {status_code}')
+                if api_key is not None:
+                    self.key_pool.report(api_key, f"HTTP-{status_code}")
                 
         except Exception as err:
             import traceback
             tb = traceback.format_exc()
             logger.error(tb)
-            return None
+            return None, None
         
         # Check errorMessage
         json = response.json()
         keys = list(json.keys())
 
         if 'code' in keys:
-            logger.error(f"There is some error. Error code is {json['code']}. {json['message']}")
+            code = json['code']
+            if code in NO_DATA_CODES:
+                logger.debug(f"No data. {json['message']}")
+            else:
+                logger.error(f"There is some error. Error code is {json['code']}. {json['message']}")
             data = None
         else:
             error = json[keys[0]]
+            code = error['code']
             if error['code'] == 'INFO-000':
                 # If code is 'INFO-000', there is no issue.
                 data = json[keys[1]]
             else:
                 logger.error(f"There is some error. Error code is {error['code']}. {error['message']}")
                 data = None
+        
+        if api_key is not None:
+            self.key_pool.report(api_key, code)
 
-        return data
+        return code, data
 
 
 if __name__ == "__main__":
@@ -1,26 +1,109 @@
 import time
+import hashlib
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
+import traceback
 
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 
-from .realtime_api import RealtimeAPI
+from .realtime_api import RealtimeAPI, NO_DATA_CODES
+from .api_key_pool import QUOTA_EXCEEDED_CODES, INVALID_KEY_CODES
+from .adaptive_polling import AdaptivePollingPlanner
+from .realtime_record import RealtimeRecorder
+from .circuit_breaker import CircuitBreaker
+from .position_preprocessor import preprocess_realtime_position
+from .config import COLLECT_FETCH_MODE, COLLECT_MAX_WORKERS, COLLECT_ADAPTIVE_POLLING, COLLECT_MIN_POLL_INTERVAL, COLLECT_MAX_POLL_INTERVAL, END_TIME
+from .config import COLLECT_BREAKER_FAILURES, COLLECT_BREAKER_RECOVERY, COLLECT_STALE_TTL
 
 logger = logging.getLogger("realtime_collect")
 
 class RealtimeCollect:
-    def __init__(self):
-        self.realtime_api = RealtimeAPI()
+    def __init__(self, 
+                 fetch_mode: str = COLLECT_FETCH_MODE, 
+                 max_workers: int = COLLECT_MAX_WORKERS,
+                 adaptive_polling: bool = COLLECT_ADAPTIVE_POLLING,
+                 base_interval: float = 10,
+                 session = None,
+                 clock = time.time,
+                 recorder: RealtimeRecorder|None = None,
+                 api_keys: list[str]|None = None):
+        """
+        Args:
+            session (optional): requests.Session compatible object. e.g. ReplaySession. Defaults to a new requests.Session.
+            clock (optional): time source of requested_at and adaptive polling. e.g. ReplayClock.time
+            recorder (RealtimeRecorder, optional): If set, raw responses are captured.
+            api_keys (list[str], optional): If set, the key db isn't used.
+        """
+        self.realtime_api = RealtimeAPI(api_keys)
+        self.clock = clock
+        self.recorder = recorder
+        
+        # Fetch mode: "concurrent" requests every endpoint at once, "sequential" one by one.
+        if fetch_mode not in ("concurrent", "sequential"):
+            raise Exception(f"There is no fetch mode named {fetch_mode}")
+        self.fetch_mode = fetch_mode
+        self.max_workers = max(1, max_workers)
+        self.timeout = 2
+        
         # HTTP session
-        self.session = requests.Session()
+        # The connection pool is sized to the number of requests in flight.
+        self.session = requests.Session() if session is None else session
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Thread pool for concurrent fetch
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="realtime_fetch") if self.fetch_mode == "concurrent" else None
+        
         # Line id : name dict
         self.line_id_names: dict[int, str] = self._load_line_data() 
         
+        # Adaptive polling: If planner is None, every line is polled every cycle.
+        self.planner: AdaptivePollingPlanner|None = None
+        if adaptive_polling:
+            self.planner = AdaptivePollingPlanner(
+                list(self.line_id_names),
+                base_interval,
+                COLLECT_MIN_POLL_INTERVAL,
+                COLLECT_MAX_POLL_INTERVAL,
+                END_TIME,
+                quota_source=self.realtime_api.key_pool.remaining_quota,
+                clock=self.clock
+            )
+        
         # Save Data
         self.realtime_arrival_all: list[dict]|None = None
         self.realtime_position: pd.DataFrame|None = None
         
+        # The last preprocessed frame of each line. (requested_at included)
+        # Lines not polled or not changed in a cycle reuse them.
+        self.position_frames: dict[int, pd.DataFrame] = {}
+        # Rows of the lines changed in the last cycle
+        self.changed_position: pd.DataFrame|None = None
+        self.changed_lines: set[int] = set()
+        self.arrival_all_changed = False
+        
+        # Fingerprint of the raw response bytes and the last good parsed data of each endpoint
+        # key: "ALL" or line_id
+        self.fingerprints: dict[str|int, bytes] = {}
+        self.parsed_data: dict[str|int, list[dict]] = {}
+        # The time of the last good data of each endpoint
+        self.good_at: dict[str|int, float] = {}
+        
+        # Circuit breaker of each endpoint
+        # While a circuit is open, the last good data is served as stale for stale_ttl seconds.
+        self.breakers: dict[str|int, CircuitBreaker] = {}
+        self.stale_ttl = COLLECT_STALE_TTL
+        self.stale_lines: set[int] = set()
+        self.stale_lines_changed = False
+        self.arrival_all_stale = False
+        
+        # Latency and failure of each request in the last cycle
+        # key: "ALL" or line_id, value: {"latency": seconds, "rows": int, "error": str|None, "changed": bool, "skipped": bool}
+        self.fetch_stats: dict[str|int, dict] = {}
+        
     def _load_line_data(self) -> dict[int, str]:
         
         # Load line information dict
@@ -49,32 +132,162 @@ class RealtimeCollect:
         
         return data
     
-    def _get_realatime_arrival_all_data(self) -> list[dict]|None:
-        """ Requests realtimeArrival
-            TODO: Change api_name variable to an environment variable 
+    def _request(self, key: str|int, api_name: str, name: str|None = None) -> tuple[list[dict]|None, dict]:
+        """ Request one endpoint and measure it.
+        
+            If the raw response bytes are the same as the last response of the endpoint,
+            parsing is skipped and the last parsed data is returned.
+            
+            Circuit breaker: only transport errors, HTTP 5xx and invalid bodies are failures of the endpoint.
+            No data (INFO-200) is a success with an empty result. Errors of the api key are left to the key pool.
+
+        Args:
+            key (str|int): "ALL" or line_id
+            api_name (str): realtimePosition | realtimeStationArrival | realtimeStationArrival/ALL
+            name (str, optional): additional parameter. Defaults to None.
+
+        Returns:
+            tuple[list[dict]|None, dict]: parsed data and the stat of the request
         """
-        api_name = "realtimeStationArrival/ALL"
-        url = self.realtime_api.get_url(api_name)
-        response = self.session.get(url, timeout=2)
-        data = self.realtime_api.parse_response(response)
+        start = time.perf_counter()
+        data, error, changed = None, None, True
+        # Whether a request without data is a failure of the endpoint
+        failure = True
         
-        return data
+        breaker = self._get_breaker(key, api_name, name)
+        if not breaker.allow_request():
+            # Don't wait on a broken endpoint
+            return None, {"latency": 0.0, "rows": 0, "error": "Circuit open", "changed": False, "skipped": True}
+        
+        try:
+            api_key = self.realtime_api.get_key()
+            url = self.realtime_api.get_url(api_name, name, api_key)
+            requested_at = self.clock()
+            response = self.session.get(url, timeout=self.timeout)
+            if self.recorder is not None:
+                self.recorder.record(url, response, requested_at)
+            
+            fingerprint = hashlib.blake2b(response.content, digest_size=16).digest()
+            if response.status_code == 200 and self.fingerprints.get(key) == fingerprint:
+                # Same payload: reuse the last parsed data
+                data, changed = self.parsed_data[key], False
+            else:
+                code, data = self.realtime_api.parse_result(response, api_key)
+                if data is None and code in NO_DATA_CODES and response.status_code < 500:
+                    # No trains on the line. Not fingerprinted: an empty response is never unchanged.
+                    data = []
+                    self.fingerprints.pop(key, None)
+                    self.parsed_data[key] = data
+                elif data is None:
+                    error = f"Invalid response {code}"
+                    failure = response.status_code >= 500 or code not in QUOTA_EXCEEDED_CODES + INVALID_KEY_CODES
+                    self.fingerprints.pop(key, None)
+                else:
+                    self.fingerprints[key] = fingerprint
+                    self.parsed_data[key] = data
+        except Exception as err:
+            # One failed endpoint must not stop the others.
+            error = f"{type(err).__name__}: {err}"
+            logger.debug(traceback.format_exc())
+        
+        if data is None:
+            if failure:
+                breaker.record_failure()
+            else:
+                breaker.record_ignored()
+        else:
+            breaker.record_success()
+            self.good_at[key] = self.clock()
+        
+        stat = {
+            "latency": time.perf_counter() - start,
+            "rows": len(data) if data is not None else 0,
+            "error": error,
+            "changed": changed,
+            "skipped": False
+        }
+        return data, stat
     
-    def _get_realtime_position_data(self) -> list[dict]|None:
-        """ Requests realtime Position 
-            TODO: Change api_name variable to an environment variable 
-        """
-        api_name = "realtimePosition"
-        data = []
-        for line_id in self.line_id_names:
-            line_name = self.line_id_names[line_id]
-            url = self.realtime_api.get_url(api_name, line_name)
-            response = self.session.get(url, timeout=2)
-            tmp = self.realtime_api.parse_response(response)
+    def _get_breaker(self, key: str|int, api_name: str, name: str|None) -> CircuitBreaker:
+        if key not in self.breakers:
+            self.breakers[key] = CircuitBreaker(
+                api_name if name is None else f"{api_name}/{name}",
+                COLLECT_BREAKER_FAILURES,
+                COLLECT_BREAKER_RECOVERY,
+                self.clock
+            )
+        return self.breakers[key]
+    
+    def _is_fresh(self, key: str|int) -> bool:
+        # Whether the last good data of the endpoint can be served as stale
+        return key in self.good_at and self.clock() - self.good_at[key] <= self.stale_ttl
+    
+    def _fetch_all(self, jobs: dict[str|int, tuple[str, str|None]]) -> dict[str|int, list[dict]|None]:
+        """ Fetch every job and record the stats of each job.
             
-            if tmp is not None:
-                data.extend(tmp)
-        return data
+            In concurrent mode, all jobs run on the thread pool at once.
+            So a cycle takes about as long as the slowest request.
+            
+        Args:
+            jobs (dict[str|int, tuple[str, str|None]]): key -> (api_name, name)
+
+        Returns:
+            dict[str|int, list[dict]|None]: key -> parsed data
+        """
+        results: dict[str|int, list[dict]|None] = {}
+        if self.executor is None:
+            for key, (api_name, name) in jobs.items():
+                results[key], self.fetch_stats[key] = self._request(key, api_name, name)
+        else:
+            futures = {self.executor.submit(self._request, key, api_name, name): key for key, (api_name, name) in jobs.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                results[key], self.fetch_stats[key] = future.result()
+        
+        for key, stat in self.fetch_stats.items():
+            if stat["error"] is not None and not stat["skipped"]:
+                logger.warning(f"Failed to fetch {key} in {stat['latency']:.3f}s. {stat['error']}")
+        return results
+    
+    def _update_position_frames(self, results: dict[str|int, list[dict]|None], requested_at: str) -> set[int]:
+        """ Update the frames of polled lines.
+            Only lines whose payload changed are preprocessed again.
+            A failed line keeps its last good frame as stale for stale_ttl seconds. After that, it is dropped.
+            stale_lines_changed is True when a line becomes stale or isn't stale anymore.
+
+        Returns:
+            set[int]: changed lines
+        """
+        changed_lines = set()
+        # A stale line stays stale until it is polled successfully (or dropped)
+        stale_lines = set(self.stale_lines)
+        for line_id, tmp in results.items():
+            if self.planner is not None and not self.fetch_stats[line_id]["skipped"]:
+                self.planner.observe(line_id, tmp)
+            if tmp is None and line_id in self.position_frames and self._is_fresh(line_id):
+                stale_lines.add(line_id)
+                continue
+            stale_lines.discard(line_id)
+            if tmp is None:
+                if self.position_frames.pop(line_id, None) is not None:
+                    changed_lines.add(line_id)
+            elif self.fetch_stats[line_id]["changed"] or line_id not in self.position_frames:
+                frame = self._preprocess_realtime_position(tmp)
+                frame["requested_at"] = requested_at
+                self.position_frames[line_id] = frame
+                changed_lines.add(line_id)
+        self.stale_lines_changed = stale_lines != self.stale_lines
+        self.stale_lines = stale_lines
+        return changed_lines
+    
+    def _concat_position_frames(self, line_ids) -> pd.DataFrame:
+        # Keep the order of self.line_id_names
+        frames = [self.position_frames[line_id] for line_id in self.line_id_names if line_id in line_ids and line_id in self.position_frames]
+        if len(frames) == 0:
+            frame = self._preprocess_realtime_position([])
+            frame["requested_at"] = pd.Series(dtype="object")
+            return frame
+        return pd.concat(frames, ignore_index=True)
     
     def _preprocess_realtime_position(self, data: list[dict]) -> pd.DataFrame:
         """
@@ -83,107 +296,70 @@ class RealtimeCollect:
             2. Handle Exception: 데이터 자체 오류
             3. Change the train id of line 2
             4. Drop prev information
-        """
-        
-        # select using columns
-        change_cols = {
-            "subwayId": "line_id",
-            "subwayNm": "line_name",
-            "statnId": "station_id",
-            "statnNm": "station_name",
-            "trainNo": "train_id",
-            "recptnDt": "received_at",
-            "updnLine": "up_down",
-            "statnTid": "last_station_id",
-            "statnTnm": "last_station_name",
-            "trainSttus": "train_status",
-            "directAt": "express",
-            "lstcarAt": "is_last_train"
-        }
-        
-        # Convert dtypes
-        dtype = {
-            "line_id": "int", 
-            "line_name": "string",
-            "station_id": "int", 
-            "station_name": "string",
-            "train_id": "string", 
-            "received_at": "string", 
-            "up_down": "int",
-            "last_station_id": "int",
-            "last_station_name": "string",
-            "train_status": "int",
-            "express": "int",
-            "is_last_train": "int"
-        }
-        
-        # convert to dataframe
-        rt = pd.DataFrame(data, columns=list(change_cols.keys()))
-        
-        # Error when kyungchun line - kwangwoondae station
-        try:
-            rt = rt.rename(columns=change_cols).astype(dtype)
-        except Exception:
-            import traceback
+            5. Drop duplicates
             
-            # 경춘선 광운대
-            mask = (rt["subwayId"] == "1067") & (rt["statnNm"] == "광운대")
-            rt.loc[mask, "statnId"] = "1067080119"
-            
-            mask = (rt["subwayId"] == "1067") & (rt["statnTnm"] == "광운대")
-            rt.loc[mask, "statnTid"] = "1067080119"
-            
-            mask = (rt["subwayId"] == "1067") & (rt["statnNm"] == "용산")
-            rt.loc[mask, "statnId"] = "1063075110" # 경의중앙선 용산역 코드
-            
-            # 위 경춘선 광운대 이외의 오류 데이터는 로그에 기록 후 삭제
-            error_data = rt[rt["statnId"].isna() | rt["statnTid"].isna()]
-            if len(error_data) >= 1:
-                error = traceback.format_exc()
-                logger.error(error)
-                logger.warning("There are some error data.")
-                logger.warning(error_data.to_dict(orient="records"))
-                rt = rt.drop(index = error_data.index)
-            
-            rt = rt.rename(columns=change_cols).astype({"line_id": "int", "train_id": "string", "station_id": "int", "train_status": "int"})
-        
-        # Change the train_id of line 2
-        mask = (rt["line_id"] == 1002) & (rt["train_id"].str.startswith(("3", "4", "6", "7", "8", "9")))
-        rt.loc[mask, "train_id"] = "2" + rt.loc[mask, "train_id"].str[1:]
-        
-        # Drop prev information
-        mask = rt["train_status"].isin([0,1,2])
-        rt = rt[mask].reset_index(drop=True)
-        
+            See position_preprocessor.preprocess_realtime_position
         """
-            Drop duplicates
-            sort: sortkey ["line_id", "train_id", "received_at"]
-            drop_duplicates: subsetkey ["line_id", "train_id", "station_id"] keep = "last"
-        """
-        rt = rt.sort_values(["line_id", "train_id", "received_at"]).drop_duplicates(["line_id", "train_id"], keep="last")
-        return rt
+        return preprocess_realtime_position(data)
+    
+    def has_changes(self) -> bool:
+        return len(self.changed_lines) > 0 or self.arrival_all_changed or self.stale_lines_changed
     
     def collect_realtime_data(self):
         """
             realtime 
+            
+            realtimeArrival/ALL and realtimePosition of every line are requested in one fan-out.
+            Unchanged payloads reuse the last parsed data and frames.
+            
+            has_changes() is False when nothing changed in the cycle.
         """
         
-        logger.debug(f"Process realtime data {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}")
+        requested_at = datetime.fromtimestamp(self.clock()).strftime("%Y-%m-%d %H:%M:%S")
+        logger.debug(f"Process realtime data {requested_at}")
         start = time.time()
+        self.fetch_stats = {}
+        
+        # Get realtimeArrival/ALL and realtimePosition data
+        logger.debug(f"realtimeArrival/ALL, realtimePosition Requested_at: {requested_at}")
+        if self.planner is None:
+            arrival_all_due, due_lines = True, list(self.line_id_names)
+        else:
+            arrival_all_due, due_lines = self.planner.arrival_all_due(), self.planner.due_lines()
+        
+        jobs: dict[str|int, tuple[str, str|None]] = {"ALL": ("realtimeStationArrival/ALL", None)} if arrival_all_due else {}
+        jobs.update({line_id: ("realtimePosition", self.line_id_names[line_id]) for line_id in due_lines})
+        results = self._fetch_all(jobs)
         
-        # Get realtimeArrival/ALL data
-        requested_at_arrival_all = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        logger.debug(f"realtimeArrival/ALL Requested_at: {requested_at_arrival_all}")
-        self.realtime_arrival_all = self._get_realatime_arrival_all_data()
+        self.arrival_all_changed = False
+        self.arrival_all_stale = False
+        if arrival_all_due:
+            data = results.pop("ALL")
+            if data is None and "ALL" in self.parsed_data and self._is_fresh("ALL"):
+                # Serve the last good data as stale
+                self.arrival_all_stale = True
+                self.arrival_all_changed = self.realtime_arrival_all is not self.parsed_data["ALL"]
+                self.realtime_arrival_all = self.parsed_data["ALL"]
+            else:
+                self.arrival_all_changed = self.fetch_stats["ALL"]["changed"]
+                self.realtime_arrival_all = data
+            if self.planner is not None:
+                self.planner.record_request("ALL")
         
-        # Get realtimeArrival
-        requested_at_position= datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        logger.debug(f"realtimePosition Requested_at: {requested_at_position}")
-        data = self._get_realtime_position_data()
-        if data is not None:
-            self.realtime_position = self._preprocess_realtime_position(data)
-            self.realtime_position["requested_at"] = requested_at_position
+        # Preprocess only changed lines
+        self.changed_lines = self._update_position_frames(results, requested_at)
+        if len(self.changed_lines) > 0 or self.realtime_position is None:
+            self.realtime_position = self._concat_position_frames(self.position_frames)
+        self.changed_position = self._concat_position_frames(self.changed_lines)
         
+        if self.planner is not None:
+            logger.debug(f"Polled lines: {due_lines}, remaining quota: {self.planner.remaining_quota()}")
+        if len(self.fetch_stats) > 0:
+            slowest = max(self.fetch_stats, key=lambda k: self.fetch_stats[k]["latency"])
+            failed = [k for k, stat in self.fetch_stats.items() if stat["error"] is not None]
+            logger.debug(f"Fetch {len(self.fetch_stats)} endpoints ({self.fetch_mode}), slowest: {slowest} {self.fetch_stats[slowest]['latency']:.3f}s, failed: {failed}, changed lines: {sorted(self.changed_lines)}, stale lines: {sorted(self.stale_lines)}")
         logger.debug(f"Process data {time.time()-start:05f}s...")
+        if self.recorder is not None:
+            self.recorder.flush()
         # Close session
-        self.session.close()
\ No newline at end of file
+        self.session.close()
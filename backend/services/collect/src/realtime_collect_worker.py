@@ -10,7 +10,12 @@ import pandas as pd
 from repositories.realtimes_repository.realtime_repository import RealtimeRepository
 
 from services.collect.src.realtime_collect import RealtimeCollect
-from model.sqlalchemy_model import Base, MockRealtime, Realtime
+from services.collect.src.interval_scheduler import IntervalScheduler
+from services.collect.src.realtime_record import RealtimeRecorder, ReplaySession
+from services.collect.src.realtime_writer import RealtimeWriter
+from services.collect.src.config import COLLECT_ADAPTIVE_POLLING, COLLECT_MIN_POLL_INTERVAL, COLLECT_FULL_SNAPSHOT_EVERY
+from services.collect.src.config import COLLECT_WRITE_QUEUE_SIZE, COLLECT_WRITE_MAX_BATCH, COLLECT_WRITE_PUT_TIMEOUT
+from communication.position_delta import PositionDeltaEncoder
 
 logger = logging.getLogger("realtime_collect_worker")
 
@@ -20,16 +25,40 @@ class RealtimeCollectWorker:
                  listener, 
                  realtime_repository: RealtimeRepository,
                  start_time,
-                 end_time
+                 end_time,
+                 overrun_policy: str = "skip",
+                 recorder: RealtimeRecorder|None = None,
+                 replay_session: ReplaySession|None = None
                  ):
+        """
+        Args:
+            recorder (RealtimeRecorder, optional): Capture raw responses.
+            replay_session (ReplaySession, optional): Replay recorded responses instead of the live API.
+                The scheduler and the collector run on the replay clock.
+        """
         self.realtime_repository = realtime_repository
+        # Rows are written by a writer thread, not by the collect loop
+        self.writer = RealtimeWriter(realtime_repository, COLLECT_WRITE_QUEUE_SIZE, COLLECT_WRITE_MAX_BATCH, COLLECT_WRITE_PUT_TIMEOUT)
         self.interval = interval
         self.start_time = start_time
         self.end_time = end_time
+        self.recorder = recorder
+        self.replay_session = replay_session
+        
+        # Cycles are fired on fixed wall-clock ticks.
+        # With adaptive polling, ticks are as short as the minimum poll interval and each line decides whether to be polled.
+        tick_interval = COLLECT_MIN_POLL_INTERVAL if COLLECT_ADAPTIVE_POLLING else interval
+        if self.replay_session is None:
+            self.scheduler = IntervalScheduler(tick_interval, start_time, end_time, overrun_policy)
+        else:
+            clock = self.replay_session.clock
+            self.scheduler = IntervalScheduler(tick_interval, start_time, end_time, overrun_policy, clock=clock.time, sleep=clock.sleep)
         
         self.run_loop = self.check_time()
         
         self.listener = listener
+        # Position is sent as deltas of (line_id, train_id)
+        self.position_encoder = PositionDeltaEncoder(COLLECT_FULL_SNAPSHOT_EVERY)
         self.t = None # Set thread to an attribute.
     
     def check_thread_is_alive(self):
@@ -37,69 +66,108 @@ class RealtimeCollectWorker:
     
     def check_time(self):
         # Maintaining time: 04:50 - 01:30 (tomorrow)
-        dt_str_now = datetime.now().strftime("%H:%M:%S")
-        return dt_str_now >= self.start_time or dt_str_now <= self.end_time
+        return self.scheduler.is_operating()
     
     def interval_work(self):    
         # Realtime Collect Module
-        realtime_collect = RealtimeCollect()
-        Base.metadata.create_all(self.realtime_repository.engine)
+        if self.replay_session is None:
+            realtime_collect = RealtimeCollect(base_interval=self.interval, recorder=self.recorder)
+        else:
+            realtime_collect = RealtimeCollect(
+                base_interval=self.interval, 
+                session=self.replay_session, 
+                clock=self.replay_session.clock.time,
+                api_keys=["REPLAY"]
+            )
+        # Partition tables of the realtime repository are created on the first upsert of each date
         
         while True:
             self.run_loop = self.check_time()
             if self.run_loop:
+                # Wait for the next tick
+                tick, lateness = self.scheduler.wait_next_tick()
+                if not self.scheduler.is_operating(tick):
+                    continue
+                
                 try:
                     # Collect data
                     start = time.time()
+                    save_data = None
                     realtime_collect.collect_realtime_data()
                     
+                    # Nothing changed: skip sending and saving
+                    if not realtime_collect.has_changes():
+                        logger.debug("No changes in payloads. Skip the cycle.")
+                        continue
+                    
+                    # The transform process is (re)connected: send a full snapshot
+                    if self.listener.consume_resync():
+                        self.position_encoder.reset()
+                    delta = self.position_encoder.encode(realtime_collect.realtime_position)
+                    if not delta["full"] and not realtime_collect.arrival_all_changed and not realtime_collect.stale_lines_changed and len(delta["added"]) + len(delta["moved"]) + len(delta["removed"]) == 0:
+                        logger.debug("No trains moved. Skip the cycle.")
+                        continue
+                    
                     # Send data
                     self.listener.set_data(
                         {
-                            "position": realtime_collect.realtime_position,
-                            "arrival_all": realtime_collect.realtime_arrival_all
+                            "position": delta,
+                            # None: The arrival list isn't changed. A full snapshot always carries it.
+                            "arrival_all": realtime_collect.realtime_arrival_all if realtime_collect.arrival_all_changed or delta["full"] else None,
+                            "changed_lines": realtime_collect.changed_lines,
+                            "stale_lines": realtime_collect.stale_lines
                         }
                     )
-                    logger.debug(f"Take {time.time() - start:.5f}s from collect to send.")
-                    data = realtime_collect.realtime_position
-                    data["received_at"] = pd.to_datetime(data["received_at"], format="%Y-%m-%d %H:%M:%S")
-                    data["requested_at"] = pd.to_datetime(data["requested_at"], format="%Y-%m-%d %H:%M:%S")
-                    
-                    save_data = data[
-                        ["line_id", "station_id", "train_id", "received_at", "train_status", "requested_at"]    
-                    ].to_dict(orient="records")
+                    logger.debug(f"Take {time.time() - start:.5f}s from collect to send. Delta {delta['seq']}{' (full)' if delta['full'] else ''}: added {len(delta['added'])}, moved {len(delta['moved'])}, removed {len(delta['removed'])}")
                     
-                    self.realtime_repository.upsert_realtimes(save_data)
-
-                    logger.debug(f"Success to insert to db. The rows of data is {len(save_data)}")
+                    # Save added and moved trains only
+                    data = pd.concat([delta["added"], delta["moved"]])
+                    if len(data) > 0:
+                        # received_at and requested_at are "%Y-%m-%d %H:%M:%S" strings. The repository formats them.
+                        save_data = data[
+                            ["line_id", "station_id", "train_id", "received_at", "train_status", "requested_at"]    
+                        ].to_dict(orient="records")
+                        
+                        self.writer.put(save_data)
                 except Exception:
                     logger.error(traceback.format_exc())
                     logger.error(save_data)
                 
-                # TODO: After the listener is connected, interrupt time.sleep
-                time.sleep(self.interval)
+                logger.debug(f"Tick lateness {lateness:.3f}s. Cycle takes {time.time() - tick:.3f}s from the tick.")
                 
             else:
+                # Every row has to be written before the end of day job reads them
+                if not self.writer.flush(timeout=60):
+                    logger.error("Failed to flush the write queue in 60s.")
+                logger.info(f"Write queue: {self.writer.stats()}")
+                
                 # Send the signal to notice that the loop is stalled
                 self.listener.set_data({"position": 0, "arrival_all": 0})
                 
                 # Terminate loop.
-                cur_datetime = datetime.now()
-                next_start_datetime_str = cur_datetime.date().strftime("%Y-%m-%d") + " 04:50:00" 
-                next_start_datetime = datetime.strptime(next_start_datetime_str, "%Y-%m-%d %H:%M:%S")
-                next_start_interval = (next_start_datetime - cur_datetime).seconds + 1 # Adding 1 seconds to adjust interval time.
+                cur_datetime = datetime.fromtimestamp(self.scheduler.now())
+                next_start_interval = int(self.scheduler.next_start() - cur_datetime.timestamp())
                 logger.info(f"Current time: {cur_datetime.strftime("%Y-%m-%d %H:%M:%S")} Loop is terminated. After {next_start_interval//3600}h {next_start_interval%3600//60}m {next_start_interval%3600%60}s, loop will be restarted.")
+                logger.info(f"Lateness of ticks: {self.scheduler.lateness_stats()}")
+                logger.info(f"Api key usage: {realtime_collect.realtime_api.key_pool.stats()}")
+                logger.info(f"IPC listener: {self.listener.stats()}")
+                if self.recorder is not None:
+                    # Terminate the record file of the day
+                    self.recorder.close()
                 
-                # Time Sleep
-                time.sleep(next_start_interval)
+                # Sleep until the start time
+                self.scheduler.wait_next_start()
                 logger.info(f"Current time: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}. Loop is to be started.")
                 
                 # Send the signal to notice that the loop is started
                 self.listener.set_data({"position": 1, "arrival_all": 1})
+                # The transform process is initialized by the signal
+                self.position_encoder.reset()
         
     def start(self):
         """ Running on a new thread
         """
+        self.writer.start()
         self.t = threading.Thread(target = self.interval_work)
         logger.info(f"Start interval work {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}")
         self.t.start()
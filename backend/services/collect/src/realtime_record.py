@@ -0,0 +1,185 @@
+import os
+import re
+import zlib
+import gzip
+import glob
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+import requests
+
+logger = logging.getLogger("realtime_record")
+
+"""
+    Record and replay of raw Seoul API responses
+
+    RealtimeRecorder
+        Writes raw responses to a gzip compressed log per day and run. (realtime-YYYYMMDD-HHMMSS-pid.jsonl.gz)
+        A run never appends to the file of another run, so a file left unterminated by a crash stays readable up to its last flush.
+        The file of the day is closed at the end of day (close()) or when the date changes.
+        A record is a json line: {"t": timestamp, "endpoint": "realtimePosition/1호선", "status": 200, "body": "...", "requested_at": timestamp}
+        t is stamped when the record is written, so it never decreases in a file. ReplaySession reads records in order of t.
+        Concurrent fetches finish out of the order of their requests, so requested_at (optional) isn't monotonic.
+        Only responses which differ from the last response of the endpoint are written.
+        The api key is never written.
+
+    ReplayClock
+        Clock of the replay. It starts at the first recorded time and runs speed times faster than the wall clock.
+
+    ReplaySession
+        Stand-in of requests.Session. get() returns the latest recorded response of the endpoint
+        at or before the replay clock. The logs are read lazily as the clock advances.
+        A damaged file (e.g. cut off at the tail by a crash) is read up to the damage and the next file is read.
+"""
+
+def get_endpoint(url: str) -> str:
+    """ Endpoint of a url without the base url, api key and paging
+        e.g. http://.../{key}/json/realtimePosition/0/1000/1호선 -> realtimePosition/1호선
+    """
+    path = url.split("/json/", 1)[-1]
+    return re.sub(r"/\d+/\d+/", "/", path, count=1)
+
+class RealtimeRecorder:
+    def __init__(self, log_dir: str, clock = time.time):
+        self.log_dir = log_dir
+        self.clock = clock
+        self.lock = threading.Lock()
+        os.makedirs(self.log_dir, exist_ok=True)
+
+        self.file = None
+        self.file_date = None
+        # Files of this run: realtime-YYYYMMDD-{run_id}.jsonl.gz
+        self.run_id = f"{datetime.fromtimestamp(self.clock()).strftime('%H%M%S')}-{os.getpid()}"
+        # Fingerprint of the last written response of each endpoint
+        self.fingerprints: dict[str, bytes] = {}
+        # t of the last record
+        self.last_t = float("-inf")
+
+    def _open(self, now: float):
+        file_date = datetime.fromtimestamp(now).strftime("%Y%m%d")
+        if self.file is not None and self.file_date == file_date:
+            return
+        self._close()
+        self.file_date = file_date
+        # A new file of this run. Appending behind a member which isn't terminated makes the whole file unreadable.
+        self.file = gzip.open(os.path.join(self.log_dir, f"realtime-{file_date}-{self.run_id}.jsonl.gz"), "wb")
+        # Responses of the new file are written from the start
+        self.fingerprints = {}
+
+    def record(self, url: str, response: requests.models.Response, requested_at: float|None = None):
+        endpoint = get_endpoint(url)
+        content = response.content
+        fingerprint = hashlib.blake2b(content, digest_size=16).digest()
+        with self.lock:
+            if self.fingerprints.get(endpoint) == fingerprint:
+                return
+            self.fingerprints[endpoint] = fingerprint
+            # Stamped at write time. The clock can step back (e.g. NTP), so t is kept non decreasing.
+            now = max(self.clock(), self.last_t)
+            self.last_t = now
+            self._open(now)
+            record = {
+                "t": now,
+                "endpoint": endpoint,
+                "status": response.status_code,
+                "body": content.decode("utf-8", errors="replace")
+            }
+            if requested_at is not None:
+                record["requested_at"] = requested_at
+            line = json.dumps(record, ensure_ascii=False)
+            self.file.write(line.encode("utf-8") + b"\n")
+
+    def flush(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+
+    def close(self):
+        # Terminate the file of the day. The next record opens a new file.
+        with self.lock:
+            self._close()
+
+    def _close(self):
+        if self.file is not None:
+            try:
+                self.file.close()
+            finally:
+                self.file = None
+                self.file_date = None
+
+class ReplayClock:
+    def __init__(self, start: float, speed: float = 1.0):
+        if speed <= 0:
+            raise Exception(f"The replay speed must be positive. speed: {speed}")
+        self.start = start
+        self.speed = speed
+        self.wall_start = time.monotonic()
+
+    def time(self) -> float:
+        return self.start + (time.monotonic() - self.wall_start) * self.speed
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds / self.speed)
+
+class ReplaySession:
+    def __init__(self, log_dir: str, speed: float = 1.0, start: float|None = None):
+        self.paths = sorted(glob.glob(os.path.join(log_dir, "realtime-*.jsonl.gz")))
+        if len(self.paths) == 0:
+            raise Exception(f"There are no recorded logs in {log_dir}")
+
+        self.lock = threading.Lock()
+        self.records = self._read_records()
+        self.next_record = next(self.records, None)
+        if self.next_record is None:
+            raise Exception(f"There are no records in {log_dir}")
+
+        # Latest response of each endpoint at the replay clock
+        self.latest: dict[str, dict] = {}
+        self.finished = False
+        self.clock = ReplayClock(self.next_record["t"] if start is None else start, speed)
+        logger.info(f"Replay {len(self.paths)} logs from {datetime.fromtimestamp(self.clock.start)} at {speed}x speed")
+
+    def _read_records(self):
+        for path in self.paths:
+            try:
+                with gzip.open(path, "rb") as f:
+                    for line in f:
+                        yield json.loads(line)
+            except (EOFError, zlib.error, gzip.BadGzipFile, json.JSONDecodeError) as err:
+                # Records before the damage are replayed
+                logger.warning(f"{path} is damaged. Skip the rest of the file. {type(err).__name__}: {err}")
+
+    def _advance(self, now: float):
+        while self.next_record is not None and self.next_record["t"] <= now:
+            self.latest[self.next_record["endpoint"]] = self.next_record
+            self.next_record = next(self.records, None)
+        if self.next_record is None and not self.finished:
+            self.finished = True
+            logger.info("Replay reached the end of the logs.")
+
+    def get(self, url: str, timeout: float|None = None) -> requests.models.Response:
+        endpoint = get_endpoint(url)
+        with self.lock:
+            self._advance(self.clock.time())
+            record = self.latest.get(endpoint)
+
+        response = requests.models.Response()
+        response.url = url
+        if record is None:
+            # Not yet recorded at this time
+            response.status_code = 404
+            response._content = json.dumps({"status": 404, "code": "INFO-200", "message": "해당하는 데이터가 없습니다."}).encode("utf-8")
+        else:
+            response.status_code = record["status"]
+            response._content = record["body"].encode("utf-8")
+        return response
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def close(self):
+        pass
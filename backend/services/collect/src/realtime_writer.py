@@ -0,0 +1,165 @@
+import time
+import queue
+import logging
+import threading
+import traceback
+
+from repositories.realtimes_repository.realtime_repository import RealtimeRepository
+
+logger = logging.getLogger("realtime_writer")
+
+"""
+    RealtimeWriter Class
+
+    Write-behind persistence of realtime rows.
+    The collect loop puts rows of a cycle to a bounded queue and goes on.
+    A writer thread drains the queue and upserts them.
+
+    1. Coalescing: The writer takes up to max_batch cycles at once and upserts them in one transaction.
+       Rows with the same primary key (line_id, station_id, train_id, train_status) are reduced to the latest one.
+    2. Backpressure: If the queue is full, put() waits up to put_timeout seconds.
+       After that, the rows are dropped and counted. (dropped_rows)
+    3. Failure: A failed upsert is retried max_retries times. After that, the rows are dropped and counted. (failed_rows)
+    4. flush(): Wait until every queued row is written. e.g. before the end of day job reads the realtimes.
+"""
+
+PRIMARY_KEY = ("line_id", "station_id", "train_id", "train_status")
+
+class RealtimeWriter:
+    def __init__(self,
+                 realtime_repository: RealtimeRepository,
+                 max_queue: int = 60,
+                 max_batch: int = 20,
+                 put_timeout: float = 0.5,
+                 max_retries: int = 3,
+                 retry_interval: float = 1.0):
+        self.realtime_repository = realtime_repository
+        self.queue: queue.Queue[list[dict]|None] = queue.Queue(maxsize=max_queue)
+        self.max_batch = max_batch
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+
+        self.lock = threading.Lock()
+        self.stats_ = {"queued_rows": 0, "written_rows": 0, "batches": 0, "dropped_rows": 0, "failed_rows": 0}
+        self.t = None
+
+    def start(self):
+        self.t = threading.Thread(target=self.work, daemon=True)
+        self.t.start()
+
+    def check_is_alive(self) -> bool:
+        return self.t is not None and self.t.is_alive()
+
+    def put(self, data: list[dict]) -> bool:
+        """ Queue rows of a cycle
+
+        Args:
+            data (list[dict]): rows of realtimes
+
+        Returns:
+            bool: False if the rows are dropped because the queue is full.
+        """
+        if len(data) == 0:
+            return True
+        try:
+            self.queue.put(data, timeout=self.put_timeout)
+        except queue.Full:
+            with self.lock:
+                self.stats_["dropped_rows"] += len(data)
+                dropped_rows = self.stats_["dropped_rows"]
+            logger.warning(f"Write queue is full. Drop {len(data)} rows. Dropped rows: {dropped_rows}")
+            return False
+        with self.lock:
+            self.stats_["queued_rows"] += len(data)
+        return True
+
+    def _take_batch(self) -> tuple[list[list[dict]], bool]:
+        # Block until one cycle, then take the queued cycles without waiting
+        batch, stop = [], False
+        item = self.queue.get()
+        while True:
+            if item is None:
+                stop = True
+            else:
+                batch.append(item)
+            if stop or len(batch) >= self.max_batch:
+                break
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+        return batch, stop
+
+    def _coalesce(self, batch: list[list[dict]]) -> list[dict]:
+        rows: dict[tuple, dict] = {}
+        for data in batch:
+            for row in data:
+                # The later cycle wins
+                rows[tuple(row[k] for k in PRIMARY_KEY)] = row
+        return list(rows.values())
+
+    def _write(self, rows: list[dict]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.realtime_repository.upsert_realtimes(rows)
+                with self.lock:
+                    self.stats_["written_rows"] += len(rows)
+                    self.stats_["batches"] += 1
+                return
+            except Exception:
+                logger.error(traceback.format_exc())
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_interval)
+        with self.lock:
+            self.stats_["failed_rows"] += len(rows)
+        logger.error(f"Failed to write {len(rows)} rows after {self.max_retries} retries. Drop them.")
+
+    def work(self):
+        while True:
+            batch, stop = self._take_batch()
+            try:
+                if len(batch) > 0:
+                    start = time.time()
+                    rows = self._coalesce(batch)
+                    self._write(rows)
+                    logger.debug(f"Write {len(rows)} rows of {len(batch)} cycles. Take {time.time() - start:.5f}s")
+            except Exception:
+                # Keep the writer thread alive
+                logger.error(traceback.format_exc())
+                with self.lock:
+                    self.stats_["failed_rows"] += sum(len(data) for data in batch)
+            finally:
+                # task_done for every item including the stop signal
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self.queue.task_done()
+            if stop:
+                break
+
+    def flush(self, timeout: float|None = None) -> bool:
+        """ Wait until every queued row is written
+
+        Args:
+            timeout (float | None): seconds. None waits forever.
+
+        Returns:
+            bool: False if the timeout expired.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: float|None = None):
+        """ Write the queued rows and stop the writer thread """
+        self.queue.put(None)
+        if self.t is not None:
+            self.t.join(timeout)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.stats_, "queue_size": self.queue.qsize()}
@@ -0,0 +1,37 @@
+import argparse
+import logging
+
+from services.mock.src.mock_server import MockSubwayNetwork, MockSubwayServer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Seoul subway realtime API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--trains", type=int, default=40, help="Trains per line")
+    parser.add_argument("--stations", type=int, default=50, help="Stations per line")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplier of the train count")
+    parser.add_argument("--latency", type=float, default=0.05, help="Base latency seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Random extra latency seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Rate of ERROR-500")
+    parser.add_argument("--quota-error-rate", type=float, default=0.0, help="Rate of ERROR-337")
+    parser.add_argument("--http-error-rate", type=float, default=0.0, help="Rate of HTTP 503")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Rate of delayed responses")
+    parser.add_argument("--timeout-delay", type=float, default=5.0, help="Delay seconds of delayed responses")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format="{asctime} {levelname:<8}:{name:<25}:{message}", style="{")
+    
+    network = MockSubwayNetwork(args.trains, args.stations, args.scale)
+    server = MockSubwayServer(
+        (args.host, args.port),
+        network,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        quota_error_rate=args.quota_error_rate,
+        http_error_rate=args.http_error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_delay=args.timeout_delay
+    )
+    logging.info(f"Mock subway API on http://{args.host}:{args.port}/api/subway")
+    server.serve_forever()
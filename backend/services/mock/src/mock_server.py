@@ -0,0 +1,267 @@
+import json
+import time
+import random
+import logging
+import threading
+from datetime import datetime
+from urllib.parse import unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger("mock_server")
+
+"""
+    Mock Seoul subway realtime API
+
+    Stand-in HTTP server of swopenapi.seoul.go.kr for load and scale tests.
+    Set BASE_URL to http://{host}:{port}/api/subway to use it.
+
+    Endpoints (same json envelope as the real API)
+    1. /api/subway/{key}/json/realtimePosition/{start}/{end}/{line_name}
+    2. /api/subway/{key}/json/realtimeStationArrival/{start}/{end}/{station_name}
+    3. /api/subway/{key}/json/realtimeStationArrival/ALL
+    4. /stats: request counts of the server
+
+    Simulated trains
+        Every line has trains_per_line * scale trains running on stations_per_line stations.
+        A train moves to the next station every travel_time seconds: 진입(0) -> 도착(1) -> 출발(2).
+
+    Error injection
+        error_rate: ERROR-500 in the json envelope
+        quota_error_rate: ERROR-337 (daily traffic limit exceeded)
+        http_error_rate: HTTP 503
+        timeout_rate: The response is delayed by timeout_delay seconds.
+        key "INVALID": INFO-100
+"""
+
+LINE_NAME_IDS = {
+    "1호선": 1001, "2호선": 1002, "3호선": 1003, "4호선": 1004, "5호선": 1005,
+    "6호선": 1006, "7호선": 1007, "8호선": 1008, "9호선": 1009, "GTX-A": 1032,
+    "경의중앙선": 1063, "공항철도": 1065, "경춘선": 1067, "수인분당선": 1075, "신분당선": 1077,
+    "경강선": 1081, "우이신설선": 1092, "서해선": 1093, "신림선": 1094
+}
+
+TRAIN_STATUS = ("진입", "도착", "출발")
+
+class MockSubwayNetwork:
+    def __init__(self, trains_per_line: int = 40, stations_per_line: int = 50, scale: int = 1, travel_time: float = 90, seed: int = 0):
+        self.trains_per_line = trains_per_line * scale
+        self.stations_per_line = stations_per_line
+        self.travel_time = travel_time
+        # Fixed offset of each train
+        rnd = random.Random(seed)
+        self.offsets = [rnd.uniform(0, self.travel_time * self.stations_per_line) for _ in range(self.trains_per_line)]
+
+    def station_id(self, line_id: int, station_no: int) -> int:
+        return line_id * 1000000 + 100 + station_no
+
+    def station_name(self, line_id: int, station_no: int) -> str:
+        return f"{line_id % 100}-{station_no}역"
+
+    def trains(self, line_id: int, now: float) -> list[dict]:
+        """ State of every train of the line at now
+        """
+        trains = []
+        for i, offset in enumerate(self.offsets):
+            elapsed = now + offset
+            up_down = i % 2
+            progress = int(elapsed // self.travel_time) % self.stations_per_line
+            station_no = progress if up_down == 1 else self.stations_per_line - 1 - progress
+            phase = (elapsed % self.travel_time) / self.travel_time
+            status = 0 if phase < 0.2 else (1 if phase < 0.5 else 2)
+            # recptnDt moves only when the status changes
+            changed_at = elapsed - (elapsed % self.travel_time) + (0 if status == 0 else (0.2 if status == 1 else 0.5)) * self.travel_time - offset
+            last_station_no = self.stations_per_line - 1 if up_down == 1 else 0
+            trains.append({
+                "train_no": f"{i:04d}" if line_id != 1002 else f"2{i:03d}",
+                "station_no": station_no,
+                "status": status,
+                "up_down": up_down,
+                "last_station_no": last_station_no,
+                "express": 1 if i % 7 == 0 else 0,
+                "received_at": datetime.fromtimestamp(changed_at).strftime("%Y-%m-%d %H:%M:%S")
+            })
+        return trains
+
+    def position_rows(self, line_name: str, now: float) -> list[dict]:
+        line_id = LINE_NAME_IDS[line_name]
+        return [
+            {
+                "subwayId": str(line_id),
+                "subwayNm": line_name,
+                "statnId": str(self.station_id(line_id, t["station_no"])),
+                "statnNm": self.station_name(line_id, t["station_no"]),
+                "trainNo": t["train_no"],
+                "lastRecptnDt": t["received_at"][:10].replace("-", ""),
+                "recptnDt": t["received_at"],
+                "updnLine": str(t["up_down"]),
+                "statnTid": str(self.station_id(line_id, t["last_station_no"])),
+                "statnTnm": self.station_name(line_id, t["last_station_no"]),
+                "trainSttus": str(t["status"]),
+                "directAt": str(t["express"]),
+                "lstcarAt": "0"
+            }
+            for t in self.trains(line_id, now)
+        ]
+
+    def arrival_rows(self, now: float, station_name: str|None = None, max_stops: int = 3) -> list[dict]:
+        """ Arrival information of the next max_stops stations of every train
+        """
+        rows = []
+        for line_name, line_id in LINE_NAME_IDS.items():
+            for t in self.trains(line_id, now):
+                step = 1 if t["up_down"] == 1 else -1
+                for diff in range(max_stops):
+                    searched_no = t["station_no"] + step * diff
+                    if searched_no < 0 or searched_no >= self.stations_per_line:
+                        break
+                    searched_name = self.station_name(line_id, searched_no)
+                    if station_name is not None and searched_name != station_name:
+                        continue
+                    if diff == 0:
+                        message = f"당역 {TRAIN_STATUS[t['status']]}"
+                    elif diff == 1:
+                        message = f"전역 {TRAIN_STATUS[t['status']]}"
+                    else:
+                        message = f"[{diff}]번째 전역 ({self.station_name(line_id, t['station_no'])})"
+                    rows.append({
+                        "subwayId": str(line_id),
+                        "updnLine": "하행" if t["up_down"] == 1 else "상행",
+                        "statnId": str(self.station_id(line_id, searched_no)),
+                        "statnNm": searched_name,
+                        "btrainSttus": "급행" if t["express"] == 1 else "일반",
+                        "barvlDt": str(int(diff * self.travel_time)),
+                        "btrainNo": t["train_no"],
+                        "bstatnNm": self.station_name(line_id, t["last_station_no"]),
+                        "recptnDt": t["received_at"],
+                        "arvlMsg2": message,
+                        "arvlMsg3": self.station_name(line_id, t["station_no"]),
+                        "arvlCd": str(t["status"]) if diff == 0 else "99"
+                    })
+        return rows
+
+class MockSubwayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self,
+                 address: tuple[str, int],
+                 network: MockSubwayNetwork,
+                 latency: float = 0.05,
+                 jitter: float = 0.05,
+                 error_rate: float = 0.0,
+                 quota_error_rate: float = 0.0,
+                 http_error_rate: float = 0.0,
+                 timeout_rate: float = 0.0,
+                 timeout_delay: float = 5.0,
+                 seed: int|None = None):
+        super().__init__(address, MockSubwayHandler)
+        self.network = network
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quota_error_rate = quota_error_rate
+        self.http_error_rate = http_error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_delay = timeout_delay
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats: dict[str, int] = {}
+
+    def count(self, name: str):
+        with self.lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def draw(self) -> float:
+        with self.lock:
+            return self.random.random()
+
+class MockSubwayHandler(BaseHTTPRequestHandler):
+    server: MockSubwayServer
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, body: dict, status: int = 200):
+        content = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _send_error_code(self, code: str, message: str, status: int = 200):
+        self._send_json({"status": 500 if code.startswith("ERROR") else 200, "code": code, "message": message}, status)
+
+    def _send_list(self, list_name: str, rows: list[dict]):
+        if len(rows) == 0:
+            self._send_error_code("INFO-200", "해당하는 데이터가 없습니다.")
+            return
+        self._send_json({
+            "errorMessage": {
+                "status": 200,
+                "code": "INFO-000",
+                "message": "정상 처리되었습니다.",
+                "link": "",
+                "developerMessage": "",
+                "total": len(rows)
+            },
+            list_name: rows
+        })
+
+    def do_GET(self):
+        server = self.server
+        parts = [unquote(p) for p in self.path.strip("/").split("/")]
+
+        if parts == ["stats"]:
+            with server.lock:
+                self._send_json(dict(server.stats))
+            return
+
+        # api/subway/{key}/json/{api_name}/...
+        if len(parts) < 5 or parts[0:2] != ["api", "subway"] or parts[3] != "json":
+            server.count("not_found")
+            self._send_json({"status": 404, "code": "ERROR-404", "message": "Not found"}, 404)
+            return
+        key, api_name, params = parts[2], parts[4], parts[5:]
+
+        # Upstream slowness
+        delay = server.latency + server.jitter * server.draw()
+        if server.draw() < server.timeout_rate:
+            delay += server.timeout_delay
+            server.count("timeout")
+        time.sleep(delay)
+
+        # Error injection
+        if key == "INVALID":
+            server.count("INFO-100")
+            self._send_error_code("INFO-100", "인증키가 유효하지 않습니다.")
+            return
+        if server.draw() < server.http_error_rate:
+            server.count("HTTP-503")
+            self._send_json({"status": 503, "message": "Service Unavailable"}, 503)
+            return
+        if server.draw() < server.quota_error_rate:
+            server.count("ERROR-337")
+            self._send_error_code("ERROR-337", "일별 트래픽 제한을 넘은 호출입니다.")
+            return
+        if server.draw() < server.error_rate:
+            server.count("ERROR-500")
+            self._send_error_code("ERROR-500", "서버 오류입니다.")
+            return
+
+        now = time.time()
+        if api_name == "realtimePosition" and len(params) == 3:
+            server.count(api_name)
+            line_name = params[2]
+            if line_name not in LINE_NAME_IDS:
+                self._send_error_code("INFO-200", "해당하는 데이터가 없습니다.")
+                return
+            self._send_list("realtimePositionList", server.network.position_rows(line_name, now))
+        elif api_name == "realtimeStationArrival" and params == ["ALL"]:
+            server.count("realtimeStationArrival/ALL")
+            self._send_list("realtimeArrivalList", server.network.arrival_rows(now))
+        elif api_name == "realtimeStationArrival" and len(params) == 3:
+            server.count(api_name)
+            self._send_list("realtimeArrivalList", server.network.arrival_rows(now, params[2]))
+        else:
+            server.count("ERROR-300")
+            self._send_error_code("ERROR-300", "필수 값이 누락되어 있습니다.")
@@ -0,0 +1,99 @@
+import os
+import logging
+import logging.config
+
+from dotenv import load_dotenv
+
+from communication.ipc_listener import IPCListener
+from communication.ipc_client import IPCClient
+from communication.wire_format import decode_payload
+from communication.realtime_snapshot_file import RealtimeSnapshotWriter
+
+from services.transform.src.realtime_transform_worker import RealtimeTransformWorker
+from services.transform.src.timetable_snapshot import TimetableSnapshot
+from repositories.timetable_repository.postgresql_timetable_repository import PostgresqlTimetableRepository
+from repositories.delay_repository.postgresql_delay_repository import PostgresqlDelayRepository
+from repositories.realtimes_repository.sqlite_realtime_repository import SqliteRealtimeRepository
+from repositories.archive_repository.columnar_archive_repository import ColumnarArchiveRepository
+
+"""
+    Transform service
+
+    Runs the transform worker in its own process and publishes each snapshot to REALTIME_SNAPSHOT_PATH.
+    API workers (any number of processes) read the file. See communication/realtime_snapshot_file.py
+"""
+
+if __name__ == "__main__":
+    load_dotenv()
+    log_dir = os.getenv("TRANSFORM_LOG_DIR")
+
+    config = {
+        "version": 1,
+        "formatters": {
+            "default": {
+                "format": '{asctime}.{msecs:03.0f} {levelname:<8}:{name:<25}:{message}',
+                "datefmt": "%Y-%m-%d %H:%M:%S",
+                "style": "{"
+            }
+        },
+        "handlers":{
+            "file": {
+                "formatter": "default",
+                "class": logging.FileHandler,
+                "filename": f'{log_dir}/realtime-transform-process.log',
+            }
+        },
+        "loggers": {
+            "realtime_transform_worker": {
+                "level": "INFO",
+                "handlers": ["file"],
+                "propagate": False
+            },
+            "realtime_transform": {
+                "level": "INFO",
+                "handlers": ["file"],
+                "propagate": False
+            }
+        },
+        "root": {
+            "level": "INFO",
+            "handlers": ["file"],
+            "propagate": False
+        }
+    }
+    logging.config.dictConfig(config)
+
+    tc_address = os.getenv("TRANSFORM_CONTROLLER_ADDRESS")
+    ct_address = os.getenv("COLLECT_TRANSFORM_ADDRESS")
+    metro_db_url = os.getenv("POSTGRESQL_METRO_DB_URL")
+    realtime_db_url = os.getenv("SQLITE_REALTIME_DB_URL")
+    archive_dir = os.getenv("REALTIME_ARCHIVE_DIR")
+    timetable_snapshot_dir = os.getenv("TIMETABLE_SNAPSHOT_DIR")
+    snapshot_path = os.getenv("REALTIME_SNAPSHOT_PATH")
+    if not snapshot_path:
+        raise Exception("There isn't no REALTIME_SNAPSHOT_PATH. API workers read realtime data from this file.")
+
+    arrival_line = list(map(int, os.getenv("ARRIVAL_LINE").split(",")))
+
+    postgresql_timetable_repository = PostgresqlTimetableRepository()
+    postgresql_delay_repository = PostgresqlDelayRepository()
+    sqlite_realtime_repository = SqliteRealtimeRepository()
+    postgresql_timetable_repository.create_engine(metro_db_url)
+    postgresql_delay_repository.create_engine(metro_db_url)
+    sqlite_realtime_repository.create_engine(realtime_db_url)
+    # Move the table before partitioning and drop partitions older than the retention
+    retention_days = os.getenv("REALTIME_RETENTION_DAYS")
+    sqlite_realtime_repository.prepare_partitions(int(retention_days) if retention_days else None)
+
+    realtime_transform_worker = RealtimeTransformWorker(
+        IPCListener(tc_address), # Not started
+        IPCClient(ct_address, decode_payload),
+        postgresql_timetable_repository,
+        postgresql_delay_repository,
+        sqlite_realtime_repository,
+        arrival_line,
+        archive_repository = ColumnarArchiveRepository(archive_dir) if archive_dir else None,
+        timetable_snapshot = TimetableSnapshot(timetable_snapshot_dir) if timetable_snapshot_dir else None,
+        snapshot_writer = RealtimeSnapshotWriter(snapshot_path)
+    )
+    realtime_transform_worker.start()
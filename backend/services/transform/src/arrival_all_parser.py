@@ -0,0 +1,116 @@
+import re
+import logging
+from collections import deque
+from itertools import repeat, compress
+from functools import lru_cache
+from operator import itemgetter
+
+logger = logging.getLogger("arrival_all_parser")
+
+"""
+    Batch parser of realtimeStationArrival/ALL rows
+
+    Rows are decoded column by column, without a Python loop over rows.
+    1. Rows are filtered by the subwayId column. Each distinct subwayId is converted once.
+       The ALL feed has every line, but only arrival_line is used.
+    2. Other columns are built once from the rows of arrival_line.
+    3. Codes (arvlCd, btrainSttus, updnLine, barvlDt, statnId) are mapped by lookups of their distinct values.
+    4. Messages (arvlMsg2) are a small set of repeated strings.
+       Each distinct message is parsed once with a precompiled pattern and cached.
+"""
+
+NUMBER_PATTERN = re.compile(r"[0-9]+")
+UP_DOWN = {"상행": 0}
+EXPRESS = {"급행": 1}
+RAW_COLUMNS = (
+    "statnId", "statnNm", "btrainNo", "bstatnNm", "recptnDt",
+    "arvlCd", "arvlMsg2", "arvlMsg3", "btrainSttus", "updnLine", "barvlDt"
+)
+
+@lru_cache(maxsize=4096)
+def parse_information_message(message: str) -> tuple[int|None, str]:
+    """ Parse an information message
+
+        2 types of message
+        1. OO OO
+            The first type of message is composed to 2 words splited by space.
+            예: 당역 도착, 전역 출발
+            Spliting: ["당역", "도착"], ["전역", "출발"]
+        2. [n]OO OO (current_station_name)
+            The second type of message is composed to 3 words splited by space.
+            예: [2]번째 전역 (양재시민의 숲)
+            Spliting: ["[2]번쩨", "전역", "(양재시민의 숲)"]
+
+    Args:
+        message (str): arvlMsg2
+
+    Returns:
+        tuple[int|None, str]: stop_order_diff, information message. (None, message) if it can't be parsed.
+    """
+    partial_message = message.split(maxsplit = 2)
+    if len(partial_message) == 2:
+        stop_order_diff = 0 if partial_message[0] == "당역" else 1
+        return stop_order_diff, f"{stop_order_diff}전역 {partial_message[1]}"
+
+    match = NUMBER_PATTERN.search(partial_message[0]) if len(partial_message) > 0 else None
+    if match is None:
+        logger.error(f"Failed to parse the information message: {message}")
+        return None, message
+    stop_order_diff = int(match.group(0))
+    return stop_order_diff, f"{stop_order_diff}전역"
+
+def _lookup(values: list, decode) -> list:
+    """ Map a column with a lookup table of its distinct values
+
+    Args:
+        values (list): column of the rows
+        decode: distinct value -> decoded value
+
+    Returns:
+        list: decoded column
+    """
+    table = {value: decode(value) for value in set(values)}
+    return list(map(table.__getitem__, values))
+
+def parse_arrival_all(data: list[dict], arrival_line: list[int], train_status: dict[int, str]) -> dict[int, list[dict]]:
+    """ Transform arrival/all rows of arrival_line
+
+    Args:
+        data (list[dict]): raw rows of realtimeStationArrival/ALL
+        arrival_line (list[int]): line ids whose arrival information comes from this feed
+        train_status (dict[int, str]): train status code -> name
+
+    Returns:
+        dict[int, list[dict]]: station_id -> rows. Stations and rows are in the order of the feed.
+    """
+    # subwayId is a string in the API response. Each distinct subwayId is converted once.
+    lines = set(arrival_line)
+    selected = list(compress(data, _lookup(list(map(itemgetter("subwayId"), data)), lambda line_id: int(line_id) in lines)))
+    if len(selected) == 0:
+        return {}
+
+    # Columns of the rows of arrival_line are built once
+    columns = dict(zip(RAW_COLUMNS, map(list, zip(*map(itemgetter(*RAW_COLUMNS), selected)))))
+    messages = _lookup(columns["arvlMsg2"], parse_information_message)
+    transformed = {
+        "train_id": columns["btrainNo"],
+        "last_station_name": columns["bstatnNm"],
+        "searched_station_name": columns["statnNm"],
+        "cur_station_name": columns["arvlMsg3"],
+        "received_at": columns["recptnDt"],
+        "express": _lookup(columns["btrainSttus"], lambda value: EXPRESS.get(value, 0)),
+        "train_status": _lookup(columns["arvlCd"], lambda code: train_status[int(code)]),
+        "up_down": _lookup(columns["updnLine"], lambda value: UP_DOWN.get(value, 1)),
+        "expected_left_time": _lookup(columns["barvlDt"], int),
+        "stop_order_diff": list(map(itemgetter(0), messages)),
+        "information_message": list(map(itemgetter(1), messages)),
+    }
+    keys = list(transformed)
+    rows = list(map(dict, map(zip, repeat(keys), zip(*transformed.values()))))
+
+    # Group by station in the order of the first appearance
+    station_ids = _lookup(columns["statnId"], int)
+    data_hashmap: dict[int, list[dict]] = {station_id: [] for station_id in station_ids}
+    # Rows are appended without a Python loop (consumed by a deque of size 0)
+    deque(map(list.append, map(data_hashmap.__getitem__, station_ids), rows), maxlen=0)
+    return data_hashmap
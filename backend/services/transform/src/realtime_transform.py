@@ -1,20 +1,32 @@
 import logging
 import traceback
 import time
-import re
 from datetime import datetime, timedelta
 
+import numpy as np
 import pandas as pd
 
 from repositories.timetable_repository.timetable_repository import TimetableRepository
-from model.pydantic_model import RealtimeArrivalRow, RealtimeArrival, RealtimePositionRow, RealtimePosition
-from utils.utils import op_date, check_holiday, is_next_date
+from services.transform.src.timetable_snapshot import TimetableSnapshot
+from services.transform.src.arrival_all_parser import parse_arrival_all
+from model.pydantic_model import RealtimeArrivalRow, RealtimeArrival, RealtimePositionRow, RealtimePosition, RealtimeSnapshot
+from utils.utils import op_date, check_holiday, to_op_seconds, OP_DAY_START_SECONDS
 
 logger = logging.getLogger("realtime_transform")
 
+# A train is transformed again when one of these values is changed.
+# requested_at is excluded. It is changed every cycle.
+STATE_COLUMNS = ["station_id", "station_name", "last_station_id", "last_station_name", "received_at", "train_status", "express", "up_down"]
+
 class RealtimeTransform:
-    def __init__(self, timetable_repository: TimetableRepository, arrival_line: list):
+    def __init__(self, timetable_repository: TimetableRepository, arrival_line: list, timetable_snapshot: TimetableSnapshot|None = None):
+        """
+        Args:
+            timetable_snapshot (TimetableSnapshot, optional): Local snapshot of the timetable. 
+                The timetable is loaded from the snapshot if it is valid, and from the database otherwise.
+        """
         self.timetable_repository = timetable_repository
+        self.timetable_snapshot = timetable_snapshot
         
         # To convert train status code 
         self.train_status = {
@@ -23,6 +35,9 @@ class RealtimeTransform:
         # Arrival line - Environment variable
         self.arrival_line = arrival_line
         
+        # Realtime data published to readers
+        self.snapshot: RealtimeSnapshot|None = None
+        
         # Set data, op_date, timetable data
         self.init()
         
@@ -38,10 +53,38 @@ class RealtimeTransform:
         logger.info("Initialize realtime data, operational date, and timetable data")
     
     def init_data(self):
-        # Realtime Positon data
-        self.realtime_position: dict[int, RealtimePosition] = {}
-        # Realtime Arrival data
-        self.arrival_hashmap: dict[int, list[RealtimeArrivalRow]] = {}
+        # Realtime Positon data and Realtime Arrival data
+        self._publish({}, {})
+        
+        # State of the incremental transform
+        # (line_id, train_id) -> values of STATE_COLUMNS / order in the last position data
+        self.train_state: dict[tuple, tuple|None] = {}
+        self.train_order: dict[tuple, int] = {}
+        # (line_id, train_id) -> RealtimePositionRow
+        self.position_rows: dict[tuple, RealtimePositionRow] = {}
+        # (line_id, train_id) -> station_id -> arrival rows of the train
+        self.train_arrivals: dict[tuple, dict[int, list[RealtimeArrivalRow]]] = {}
+        # station_id -> (line_id, train_id) -> arrival rows of the train (the same lists as train_arrivals)
+        self.station_arrivals: dict[int, dict[tuple, list[RealtimeArrivalRow]]] = {}
+        # The last arrival/all list and its rows by station_id
+        self.arrival_all_data: list[dict]|None = None
+        self.arrival_all_rows: dict[int, list[RealtimeArrivalRow]] = {}
+        # Lines whose position is the last good frame of a failing collect
+        self.stale_lines: set[int] = set()
+    
+    def _publish(self, realtime_position: dict[int, RealtimePosition], arrival_hashmap: dict[int, list[RealtimeArrivalRow]]):
+        """ Replace the snapshot with one assignment. The dicts must not be changed after this. """
+        seq = 0 if self.snapshot is None else self.snapshot.seq + 1
+        # The rows are validated already
+        self.snapshot = RealtimeSnapshot.model_construct(seq=seq, built_at=datetime.now(), position=realtime_position, arrival=arrival_hashmap)
+    
+    @property
+    def realtime_position(self) -> dict[int, RealtimePosition]:
+        return self.snapshot.position
+    
+    @property
+    def arrival_hashmap(self) -> dict[int, list[RealtimeArrivalRow]]:
+        return self.snapshot.arrival
     
     def set_op_date(self):
         # Set operation date
@@ -56,105 +99,118 @@ class RealtimeTransform:
         
     def set_timetable_data(self):
         self.tb: pd.DataFrame = self._load_timetable_data() 
+        self._build_timetable_index()
+        # Arrival rows depend on the timetable. Every train is transformed again in the next cycle.
+        self.train_state = {key: None for key in self.train_state}
+    
+    def _build_timetable_index(self):
+        """ Index of the timetable for the join of _calculate_delay_time
+        
+            self.tb_index: (line_id, realtime_train_id, station_id) -> row positions of self.tb
+                A train can stop at a station twice. (e.g. circular line)
+            self.tb_with_sentinel: self.tb and one NaN row at the end for positions which aren't in the timetable.
+                Position -1 is the sentinel row.
+        """
+        self.tb_index: dict[tuple, np.ndarray] = self.tb.groupby(["line_id", "realtime_train_id", "station_id"], sort=False).indices
+        self.tb_with_sentinel: pd.DataFrame = self.tb.reindex(range(len(self.tb) + 1))
+        self._build_train_stops()
+    
+    def _build_train_stops(self):
+        """ Stops of each train as contiguous arrays for _calculate_arrival_data
+        
+            self.stop_arrays: The timetable sorted by (line_id, realtime_train_id, stop_no). column -> np.ndarray
+            self.train_stops: (line_id, realtime_train_id) -> (start, end) of the train in self.stop_arrays
+        """
+        tb = self.tb.sort_values(["line_id", "realtime_train_id", "stop_no"], kind="stable").reset_index(drop = True)
+        self.stop_arrays: dict[str, np.ndarray] = {
+            "stop_no": tb["stop_no"].to_numpy(dtype=float),
+            "station_id": tb["station_id"].to_numpy(),
+            "station_name": tb["station_name"].to_numpy(dtype=object),
+            "arrival_time": tb["arrival_time"].to_numpy(dtype=object),
+            "department_time": tb["department_time"].to_numpy(dtype=object),
+            "arrival_sec": tb["arrival_sec"].to_numpy(dtype=float, na_value=np.nan),
+            "express_non_stop": tb["express_non_stop"].to_numpy(),
+        }
+        self.train_stops: dict[tuple, tuple[int, int]] = {
+            key: (positions[0], positions[-1] + 1) 
+            for key, positions in tb.groupby(["line_id", "realtime_train_id"], sort=False).indices.items()
+        }
     
     def _load_timetable_data(self) -> pd.DataFrame:
+        if self.timetable_snapshot is None:
+            return self._query_timetable_data()
+        
+        try:
+            version = self.timetable_repository.find_timetable_version(self.op_d_str, self.day_code)
+        except Exception:
+            # Start without the database if there is a snapshot
+            logger.error(traceback.format_exc())
+            logger.warning("Failed to query the timetable version. Use the timetable snapshot without validation.")
+            version = None
+        
+        tb = self.timetable_snapshot.load(self.op_d_str, self.day_code, version)
+        if tb is None:
+            tb = self._query_timetable_data()
+            if version is not None:
+                self.timetable_snapshot.save(self.op_d_str, self.day_code, version, tb)
+        return tb
+    
+    def _query_timetable_data(self) -> pd.DataFrame:
         # load timetable data
         data = self.timetable_repository.find_timetable_for_calculation_delay(self.op_d_str, self.day_code)
         tb = pd.DataFrame(data)
         
-        # Convert time to datetime
-        tb["arrival_datetime"] = tb["arrival_time"]
-        tb.loc[~tb["arrival_time"].isna(), "arrival_datetime"] = tb.loc[~tb["arrival_time"].isna(),"arrival_time"].astype("string").apply(lambda x : self.next_d_str + " " + x if is_next_date(x) else self.op_d_str + " " + x)
-        tb["department_datetime"] = tb["department_time"]
-        tb.loc[~tb["department_time"].isna(), "department_datetime"] = tb.loc[~tb["department_time"].isna(), "department_time"].astype("string").apply(lambda x : self.next_d_str + " " + x if is_next_date(x) else self.op_d_str + " " + x)
+        # Convert time to seconds since the start of the operational day (Int32)
+        # Times after midnight are later than 23:59:59 of the operational day. e.g. 00:10:00 -> 69000
+        tb["arrival_sec"] = to_op_seconds(tb["arrival_time"])
+        tb["department_sec"] = to_op_seconds(tb["department_time"])
         
         return tb
     
     def _process_arrival_all_data(self, data: list[dict]) -> dict[int, list]:
-        """Transform arrival data"""
-        # New data hashmap
-        data_hashmap: dict[int, list] = {}
-        for row in data:
-            # Filtering necessary data
-            # Necessary Line data: self.arrival_line
-            if int(row["subwayId"]) not in self.arrival_line: continue
-            
-            station_id = int(row["statnId"])
-            
-            # Extract necessary attributes
-            train_status = self.train_status[int(row["arvlCd"])]
-            information_message = row["arvlMsg2"]
-            """
-                2 types of message 
-                1. OO OO 
-                    The first type of message is composed to 2 words splited by space.
-                    예: 당역 도착, 전역 출발
-                    Spliting: ["당역", "도착"], ["전역", "출발"]
-                2. [n]OO OO (current_station_name)
-                    The second type of message is composed to 3 words splited by space.
-                    예: [2]번째 전역 (양재시민의 숲)
-                    Spliting: ["[2]번쩨", "전역", "(양재시민의 숲)"]
-            """
-            partial_message = information_message.split(maxsplit = 2)
-            try:
-                if len(partial_message) == 2:
-                    if partial_message[0] == "당역":
-                        stop_order_diff = 0
-                    else:
-                        stop_order_diff = 1
-                    information_message = f"{stop_order_diff}전역 {partial_message[1]}"
-                else:
-                    stop_order_diff = int(re.search(r'[0-9]+', partial_message[0]).group(0))
-                    information_message = f"{stop_order_diff}전역"
-            except:
-                logger.error(traceback.format_exc())
-                stop_order_diff = None
-            
-            new_row = {
-                "train_id": row["btrainNo"],
-                "last_station_name": row["bstatnNm"],
-                "searched_station_name": row["statnNm"],
-                "cur_station_name": row["arvlMsg3"],
-                "received_at": row["recptnDt"],
-                "express": 1 if row["btrainSttus"] == "급행" else 0,
-                "train_status": train_status,
-                "up_down": 0 if row["updnLine"] == "상행" else 1,
-                "expected_left_time": int(row["barvlDt"]),
-                "stop_order_diff": stop_order_diff,
-                "information_message": information_message
-            }
-            
-            if station_id not in data_hashmap:
-                data_hashmap[station_id] = [new_row]
-            else:
-                data_hashmap[station_id].append(new_row)
-        return data_hashmap
+        """Transform arrival data. See arrival_all_parser."""
+        return parse_arrival_all(data, self.arrival_line, self.train_status)
     
     def _calculate_delay_time(self, realtime_position: pd.DataFrame) -> pd.DataFrame:
         """Calculate delay time"""
         
-        # Data join
-        data_join = pd.merge(
-            realtime_position[["line_id", "station_id", "train_id", "received_at", "train_status", "requested_at"]],
-            self.tb,
-            left_on = ["line_id", "train_id", "station_id"],
-            right_on = ["line_id", "realtime_train_id", "station_id"],
-            how = "left" # 정보 파싱 가능한 데이터만
-        )
+        # Data join: Left join to the timetable by the index.
+        # The cost depends on the number of positions, not on the size of the timetable.
+        realtime_position = realtime_position[["line_id", "station_id", "train_id", "received_at", "train_status", "requested_at"]].reset_index(drop = True)
+        left, right = [], []
+        keys = zip(realtime_position["line_id"].tolist(), realtime_position["train_id"].tolist(), realtime_position["station_id"].tolist())
+        for i, key in enumerate(keys):
+            positions = self.tb_index.get(key)
+            if positions is None:
+                left.append(i)
+                right.append(-1) # Not in the timetable
+            else:
+                left.extend([i] * len(positions))
+                right.extend(positions)
         
-        # Modify date value
-        data_join["received_at"] = data_join["received_at"].str.split(" ", expand=True)[1].apply(lambda x : self.next_d_str + " " + x if is_next_date(x) else self.op_d_str + " " + x)
-
-        # Calculate delayed time
-        # Datetime foramt is %Y-%m-%d %H:%M:%S or %Y-%m-%d %H:%M
-        datetime_format = "ISO8601"
+        # Use the sentinel row only if it is needed. Otherwise, the dtypes of the timetable are kept like pd.merge.
+        tb = self.tb_with_sentinel if -1 in right else self.tb
+        data_join = pd.concat(
+            [
+                realtime_position.take(left).reset_index(drop = True),
+                tb.take(right).drop(columns = ["line_id", "station_id"]).reset_index(drop = True)
+            ],
+            axis = 1
+        )
         
-        data_join["received_at_dt"] = pd.to_datetime(data_join["received_at"].str.strip(), format=datetime_format)
-        data_join["arrival_datetime_dt"] = pd.to_datetime(data_join["arrival_datetime"].str.strip(), format=datetime_format)
-        data_join["department_datetime_dt"] = pd.to_datetime(data_join["department_datetime"].str.strip(), format=datetime_format) 
+        # received_at (YYYY-MM-DD HH:MM:SS) -> seconds since the start of the operational day
+        received_time = data_join["received_at"].astype("string").str.slice(11)
+        data_join["received_sec"] = to_op_seconds(received_time)
         
-        data_join.loc[data_join["train_status"]<=1, "delayed_time"] = data_join["received_at_dt"] - data_join["arrival_datetime_dt"]
-        data_join.loc[data_join["train_status"]==2, "delayed_time"] = data_join["received_at_dt"] - data_join["department_datetime_dt"]
+        # Modify date value: Times after midnight belong to the next date
+        is_next_date = data_join["received_sec"].to_numpy(dtype=float, na_value=np.nan) >= 86400 - OP_DAY_START_SECONDS
+        data_join["received_at"] = np.where(is_next_date, self.next_d_str + " ", self.op_d_str + " ") + received_time.to_numpy(dtype=object)
+
+        # Calculate delayed time (seconds)
+        # Both sides are seconds since the start of the operational day, so midnight needs no special case.
+        delayed_time = (data_join["received_sec"] - data_join["arrival_sec"]).where(data_join["train_status"] <= 1, data_join["received_sec"] - data_join["department_sec"])
+        delayed_time = delayed_time.where(data_join["train_status"] <= 2)
+        data_join["delayed_time"] = delayed_time.to_numpy(dtype=float, na_value=np.nan)
         
         """
             Adjust to delayed_time of coming train time.
@@ -166,7 +222,7 @@ class RealtimeTransform:
                 = received_at - arrival_datetime + 30s
                 = delayed_time of arrival + 30s
         """
-        data_join.loc[data_join["train_status"]==0, "delayed_time"] += pd.to_timedelta(30, unit = 's')
+        data_join.loc[data_join["train_status"]==0, "delayed_time"] += 30
         return data_join
     
     def get_delay_data(self, realtime_position: pd.DataFrame) -> pd.DataFrame:
@@ -179,115 +235,176 @@ class RealtimeTransform:
             Calculate arrival information after calculating delay time 
         """
         
-        # Join next timetable data
-        # Next suffix means searched station.
-        arrival = pd.merge(
-            realtime_position,
-            self.tb,
-            left_on = ["line_id", "train_id"],
-            right_on = ["line_id", "realtime_train_id"],
-            how = "inner",
-            suffixes=("","_next")
-        )
-
         """
-            Masking valid data
-            1. Stations that isn't yet passed (stop_no <= stop_no_next)
+            Project the next stations of each train by slicing its stops (self.stop_arrays)
+            1. Stations that isn't yet passed (stop_no <= stop_no_next): from the current stop to the end of the train
             2. Stations where the express train isn't stopped. (express_non_stop_next == 0)
         """
-        mask = (arrival["stop_no"] <= arrival["stop_no_next"]) & (arrival["express_non_stop_next"] == 0)
-        arrival = arrival[mask].reset_index(drop = True)
+        realtime_position = realtime_position.reset_index(drop = True)
+        stop_arrays = self.stop_arrays
+        left, right = [], []
+        keys = zip(realtime_position["line_id"].tolist(), realtime_position["train_id"].tolist())
+        for i, (key, stop_no) in enumerate(zip(keys, realtime_position["stop_no"].to_numpy(dtype=float))):
+            span = self.train_stops.get(key)
+            # Not in the timetable
+            if span is None or np.isnan(stop_no):
+                continue
+            start, end = span
+            start += np.searchsorted(stop_arrays["stop_no"][start:end], stop_no, side="left")
+            next_stops = np.arange(start, end)
+            next_stops = next_stops[stop_arrays["express_non_stop"][start:end] == 0]
+            left.append(np.full(len(next_stops), i))
+            right.append(next_stops)
+        left = np.concatenate(left) if len(left) > 0 else np.empty(0, dtype=int)
+        right = np.concatenate(right) if len(right) > 0 else np.empty(0, dtype=int)
+        
+        usecols = ["line_id", "train_id", "first_station_name", "last_station_name", "station_name", "received_at", "train_status", "express", "express_non_stop", "up_down", "stop_no", "delayed_time"]
+        arrival = realtime_position[usecols].take(left).reset_index(drop = True).rename(columns={"station_name": "cur_station_name"})
+        arrival["searched_station_id"] = stop_arrays["station_id"][right]
+        arrival["searched_station_name"] = stop_arrays["station_name"][right]
+        arrival["searched_station_arrival_time"] = pd.Series(stop_arrays["arrival_time"][right], dtype=object).astype("string")
+        arrival["searched_station_department_time"] = pd.Series(stop_arrays["department_time"][right], dtype=object).astype("string")
         
         """
             Calculate arrival information
-            1. "diff" is the difference between a current station order and a searched station order
+            1. "stop_order_diff" is the difference between a current station order and a searched station order
             2. "expected_arrival_time"  = searched_arrival_datetime + expected_delayed_time
                 Currently, expectd_delayed_time can't be able to calculate "expected_delayed_time"
                 So, use delayed_time instead of this attribute. Delayed time means a delayed time in current train status.
         """
-        arrival["diff"] = arrival["stop_no_next"] - arrival["stop_no"]
-        arrival["expected_arrival_time"] = pd.to_datetime(arrival["arrival_datetime_next"]) + arrival['delayed_time']
-        arrival["expected_arrival_time"] = arrival["expected_arrival_time"].astype("string")
-        
-        """
-            Convert delayed_time to seconds unit.
-            Before converting, dtype of delayed_time is timedelta[64].
-        """
-        arrival["delayed_time"] = (arrival["delayed_time"].dt.total_seconds()).round(decimals=0)
-        
-        # Change column names
-        change_cols = {
-            "diff": "stop_order_diff",
-            "delayed_time": "current_delayed_time",
-            "station_name": "cur_station_name",
-            "station_id_next": "searched_station_id",
-            "station_name_next": "searched_station_name",
-            "arrival_time_next": "searched_station_arrival_time" ,
-            "department_time_next": "searched_station_department_time",
-            "express_non_stop_next": "searched_express_non_stop"
-        }
+        arrival["stop_order_diff"] = stop_arrays["stop_no"][right] - arrival["stop_no"]
+        op_day_start = pd.Timestamp(self.op_d_str) + pd.Timedelta(OP_DAY_START_SECONDS, unit="s")
+        arrival["expected_arrival_time"] = (op_day_start + pd.to_timedelta(stop_arrays["arrival_sec"][right] + arrival["delayed_time"], unit="s")).astype("string")
         
-        change_types = {
-            "searched_station_department_time": "string",
-            "searched_station_arrival_time": "string",
-        }
+        # delayed_time is seconds
+        arrival["current_delayed_time"] = arrival["delayed_time"].round(decimals=0)
         
         # Sort values bt stop_order_diff
-        arrival = arrival.rename(columns=change_cols).astype(change_types).sort_values("stop_order_diff")
-        
-        return arrival
+        return arrival.drop(columns=["delayed_time"]).sort_values("stop_order_diff", kind="stable")
     
-    def process_realtime_data(self, position_data: pd.DataFrame|None, arrival_data: list[dict]|None):
+    def process_realtime_data(self, position_data: pd.DataFrame|None, arrival_data: list[dict]|None, stale_lines: set[int]|None = None):
         """ Union arrival data and arrival/all data. 
+            
+            Incremental: Only trains whose state (STATE_COLUMNS) is changed are transformed.
+            The rows of the other trains are reused, and only the affected lines and stations are rebuilt.
+            New dicts are published as a new snapshot (copy on write),
+            so the previous snapshot which may be being read or sent isn't changed.
 
         Args:
-            position_data (pd.DataFrame | None): _description_
-            arrival_data (list[dict] | None): _description_
+            position_data (pd.DataFrame | None): The whole realtime position. None keeps the previous position.
+            arrival_data (list[dict] | None): The arrival/all list. None keeps the previous list.
+            stale_lines (set[int] | None): Lines served from the last good frame. None keeps the previous lines.
         """
+        affected_lines: set[int] = set()
+        affected_stations: set[int] = set()
+        
+        if stale_lines is not None and stale_lines != self.stale_lines:
+            affected_lines.update(stale_lines ^ self.stale_lines)
+            self.stale_lines = set(stale_lines)
         
         if position_data is not None:
             # Convert Type
             position_data["received_at"] = position_data["received_at"].astype("string")
+            changed, removed = self._diff_trains(position_data)
             
-            # Realtime Position Data
-            realtime_position_by_line_id = {}
-            for d in position_data.to_dict(orient="records"):
-                line_id = d["line_id"]
-                if line_id not in realtime_position_by_line_id:
-                    realtime_position_by_line_id[line_id] = [d]
-                else:
-                    realtime_position_by_line_id[line_id].append(d)
-            
-            # Update position data
-            self.realtime_position = {
-                k:RealtimePosition(place = [RealtimePositionRow(**v) for v in values]) for k, values in realtime_position_by_line_id.items()
-            }
-            
-            # Calculate delay time    
-            delay: pd.DataFrame = self._calculate_delay_time(position_data)
-            # Create arrival information
-            arrival: pd.DataFrame = self._calculate_arrival_data(delay)
-            
-        if arrival_data is not None:
-            # Create arrival hashmap 
-            arrival_hashmap: dict[int, list] = self._process_arrival_all_data(arrival_data)
+            for key in removed:
+                self.position_rows.pop(key, None)
+                affected_lines.add(key[0])
+                affected_stations.update(self._remove_train_arrival(key))
             
-        # Add arrival data
-        for d in arrival.to_dict(orient="records"):
-            if not d["line_id"] in self.arrival_line:
-                station_id = d["searched_station_id"]
-                d["train_status"] = self.train_status[d["train_status"]]
-                if pd.isna(d["current_delayed_time"]): d["current_delayed_time"] = None
-                d["information_message"] = str(int(d["stop_order_diff"])) + "전역 " + d["train_status"] if d["stop_order_diff"] >= 1 else "당역 " + d["train_status"]
+            if len(changed) > 0:
+                for d in changed.to_dict(orient="records"):
+                    key = (d["line_id"], d["train_id"])
+                    self.position_rows[key] = RealtimePositionRow(**d)
+                    affected_lines.add(key[0])
+                    affected_stations.update(self._remove_train_arrival(key))
                 
-                if station_id not in arrival_hashmap:
-                    arrival_hashmap[station_id] = [d]
-                else:
-                    arrival_hashmap[station_id].append(d)
+                # Calculate delay time of changed trains
+                delay: pd.DataFrame = self._calculate_delay_time(changed)
+                # Create arrival information of changed trains
+                arrival: pd.DataFrame = self._calculate_arrival_data(delay)
+                affected_stations.update(self._add_train_arrival(arrival))
+            
+        if arrival_data is not None and arrival_data is not self.arrival_all_data:
+            # Create arrival hashmap of arrival/all data
+            affected_stations.update(self.arrival_all_rows)
+            self.arrival_all_data = arrival_data
+            self.arrival_all_rows = {
+                k:[RealtimeArrivalRow(**v) for v in values] for k, values in self._process_arrival_all_data(arrival_data).items()
+            }
+            affected_stations.update(self.arrival_all_rows)
         
-        self.arrival_hashmap = {
-            k:[RealtimeArrivalRow(**v) for v in values] for k, values in arrival_hashmap.items()
-        }
+        # Patch affected lines
+        realtime_position = dict(self.realtime_position)
+        place_by_line: dict[int, list[RealtimePositionRow]] = {line_id: [] for line_id in affected_lines}
+        for key in self.train_state:
+            if key[0] in place_by_line:
+                place_by_line[key[0]].append(self.position_rows[key])
+        for line_id, place in place_by_line.items():
+            if len(place) > 0:
+                realtime_position[line_id] = RealtimePosition(place = place, stale = line_id in self.stale_lines)
+            else:
+                realtime_position.pop(line_id, None)
+        
+        # Patch affected stations
+        # Arrival/all rows come first, then trains sorted by stop_order_diff. (ties: order of trains)
+        arrival_hashmap = dict(self.arrival_hashmap)
+        for station_id in affected_stations:
+            rows = [
+                (row.stop_order_diff, self.train_order[key], i, row)
+                for key, train_rows in self.station_arrivals.get(station_id, {}).items()
+                for i, row in enumerate(train_rows)
+            ]
+            rows.sort(key=lambda x: x[:3])
+            bucket = self.arrival_all_rows.get(station_id, []) + [x[3] for x in rows]
+            if len(bucket) > 0:
+                arrival_hashmap[station_id] = bucket
+            else:
+                arrival_hashmap.pop(station_id, None)
+        self._publish(realtime_position, arrival_hashmap)
+    
+    def _diff_trains(self, position_data: pd.DataFrame) -> tuple[pd.DataFrame, list[tuple]]:
+        """ Compare the state of each train with the previous cycle
+
+        Returns:
+            tuple[pd.DataFrame, list[tuple]]: rows of new or changed trains, keys of removed trains
+        """
+        keys = list(zip(position_data["line_id"].tolist(), position_data["train_id"].tolist()))
+        states = list(zip(*(position_data[c].tolist() for c in STATE_COLUMNS)))
+        changed = [i for i, (key, state) in enumerate(zip(keys, states)) if self.train_state.get(key) != state]
+        train_state = dict(zip(keys, states))
+        removed = [key for key in self.train_state if key not in train_state]
+        self.train_state = train_state
+        self.train_order = {key: i for i, key in enumerate(train_state)}
+        return position_data.iloc[changed], removed
+    
+    def _remove_train_arrival(self, key: tuple) -> list[int]:
+        # Remove arrival rows of a train and return their stations
+        stations = list(self.train_arrivals.pop(key, ()))
+        for station_id in stations:
+            station = self.station_arrivals[station_id]
+            station.pop(key, None)
+            if len(station) == 0:
+                del self.station_arrivals[station_id]
+        return stations
+    
+    def _add_train_arrival(self, arrival: pd.DataFrame) -> set[int]:
+        # Add arrival rows of trains and return their stations
+        stations = set()
+        for d in arrival.to_dict(orient="records"):
+            if d["line_id"] in self.arrival_line:
+                continue
+            key = (d["line_id"], d["train_id"])
+            station_id = d["searched_station_id"]
+            d["train_status"] = self.train_status[d["train_status"]]
+            if pd.isna(d["current_delayed_time"]): d["current_delayed_time"] = None
+            d["information_message"] = str(int(d["stop_order_diff"])) + "전역 " + d["train_status"] if d["stop_order_diff"] >= 1 else "당역 " + d["train_status"]
+            
+            row = RealtimeArrivalRow(**d)
+            self.train_arrivals.setdefault(key, {}).setdefault(station_id, []).append(row)
+            self.station_arrivals.setdefault(station_id, {})[key] = self.train_arrivals[key][station_id]
+            stations.add(station_id)
+        return stations
         
     def get_data_by_station_id(self, station_id: int, up: str, down: str) -> RealtimeArrival:
         """Get arrival data by station_id 
@@ -304,7 +421,7 @@ class RealtimeTransform:
         # Create arrival data
         data = {"left": [], "right": []}
         # Get data by id
-        realtime_arrival = self.arrival_hashmap[station_id]
+        realtime_arrival = self.snapshot.arrival[station_id]
         
         # up: "left_direction", down: "right_direction"
         for row in realtime_arrival:
@@ -10,9 +10,13 @@ import pandas as pd
 from repositories.timetable_repository.timetable_repository import TimetableRepository
 from repositories.delay_repository.delay_repository import DelayRepository
 from repositories.realtimes_repository.realtime_repository import RealtimeRepository
+from repositories.archive_repository.archive_repository import ArchiveRepository
 
 # Transform Module
 from services.transform.src.realtime_transform import RealtimeTransform
+from services.transform.src.timetable_snapshot import TimetableSnapshot
+from communication.position_delta import PositionDeltaDecoder
+from communication.realtime_snapshot_file import RealtimeSnapshotWriter
 
 logger = logging.getLogger('realtime_transform_worker')
 
@@ -23,18 +27,46 @@ class RealtimeTransformWorker:
                  timetable_repoitory: TimetableRepository,
                  delay_repository: DelayRepository, 
                  realtime_repository: RealtimeRepository,
-                 arrival_line: list):
+                 arrival_line: list,
+                 chunk_size: int = 50000,
+                 archive_repository: ArchiveRepository|None = None,
+                 timetable_snapshot: TimetableSnapshot|None = None,
+                 snapshot_writer: RealtimeSnapshotWriter|None = None):
+        """
+        Args:
+            chunk_size (int, optional): The number of realtime rows processed at once by the end of day job.
+            archive_repository (ArchiveRepository, optional): Archive realtime data of the day before removing it.
+            timetable_snapshot (TimetableSnapshot, optional): Local snapshot of the timetable for a start without the database.
+            snapshot_writer (RealtimeSnapshotWriter, optional): Publish each snapshot to a file for API workers in other processes.
+        """
         
         self.delay_repository = delay_repository
         self.realtime_repository = realtime_repository
+        self.chunk_size = chunk_size
+        self.archive_repository = archive_repository
         
         self.listener = listener
         self.client = client
         
-        self.realtime_transform = RealtimeTransform(timetable_repoitory, arrival_line)
+        self.realtime_transform = RealtimeTransform(timetable_repoitory, arrival_line, timetable_snapshot)
+        self.snapshot_writer = snapshot_writer
+        # Position deltas from collect are applied to the decoder's snapshot
+        self.position_decoder = PositionDeltaDecoder()
+        # The last arrival list. Collect sends None when it isn't changed.
+        self.arrival_all: list[dict]|None = None
         self.t = None
         
+    def publish_snapshot(self):
+        # Write the current snapshot for API workers. A failure doesn't stop the transform.
+        if self.snapshot_writer is None:
+            return
+        try:
+            self.snapshot_writer.write(self.realtime_transform.snapshot)
+        except Exception:
+            logger.error(traceback.format_exc())
+    
     def interval_work(self):
+        self.publish_snapshot()
         # Connect to listener
         self.client.connect()
         while True:
@@ -48,27 +80,7 @@ class RealtimeTransformWorker:
                     # position_data == 0 means that the collect loop is stalled. 
                     if isinstance(position_data, int) and position_data == 0:
                         logger.info("Loop is terminated")
-                        # Get all realtime data
-                        data = self.realtime_repository.find_realtimes(self.realtime_transform.op_d_str)
-                        df = pd.DataFrame(data)
-
-                        # Caculate delay time
-                        delay_data = self.realtime_transform.get_delay_data(df)
-                        delay_data["op_date"] = self.realtime_transform.op_d_str
-                        delay_data["day_code"] = self.realtime_transform.day_code
-                        delay_data = delay_data.astype({"first_last": "Int16", "stop_no": "Int16"})
-                        delay_data["stop_no"] = delay_data["stop_no"].fillna(-1)
-                        delay_data["delayed_time"] = delay_data["delayed_time"].dt.total_seconds()
-                        
-                        logger.info("Start to insert delay data")
-                        # Insert delay data
-                        usecols = ["line_id", "station_id", "train_id", "received_at", "train_status", "requested_at", "day_code", "first_last", "stop_no", "delayed_time", "op_date"]
-                        delay_data = delay_data[usecols].to_dict(orient="records")
-                        self.delay_repository.insert_delay_many(delay_data, 10000)
-                        logger.info("Success to insert delay data")
-                        
-                        # Delete realtimes
-                        self.realtime_repository.remove_realtimes(self.realtime_transform.op_d_str)
+                        self.end_of_day()
                         
                         # Start to manage delay data
                         
@@ -83,28 +95,45 @@ class RealtimeTransformWorker:
                     elif isinstance(position_data, int) and position_data == 1:
                         logger.info("Loop is started")
                         self.realtime_transform.init()
+                        self.position_decoder.reset()
+                        self.arrival_all = None
+                        self.publish_snapshot()
                     
                     else:
-                        logger.debug(f"Before transform: position: {len(position_data)}, arrival_all: {len(realtime_arrival_all)}")
                         start = time.time()
+                        # Apply the delta
+                        delta = position_data
+                        position_data = self.position_decoder.apply(delta)
+                        if realtime_arrival_all is not None:
+                            self.arrival_all = realtime_arrival_all
+                        if position_data is None or self.arrival_all is None:
+                            logger.info("Wait for a full snapshot from collect")
+                            continue
+                        logger.debug(f"Before transform: position: {len(position_data)} (added {len(delta['added'])}, moved {len(delta['moved'])}, removed {len(delta['removed'])}), arrival_all: {len(self.arrival_all)}")
                     
                         # Process data
-                        self.realtime_transform.process_realtime_data(position_data, realtime_arrival_all)
-                        # Set data
+                        self.realtime_transform.process_realtime_data(position_data, self.arrival_all, data.get("stale_lines", set()))
+                        # Set data of one snapshot
+                        snapshot = self.realtime_transform.snapshot
                         self.listener.set_data(
                             {
-                                "position": self.realtime_transform.realtime_position,
-                                "arrival": self.realtime_transform.arrival_hashmap
+                                "seq": snapshot.seq,
+                                "position": snapshot.position,
+                                "arrival": snapshot.arrival
                             }
                         )
+                        self.publish_snapshot()
                         logger.debug(f"Data transform takes {time.time() - start:.05f}s until receiving dataset from collect. \n \
-                                    Dataset size : Postiion: {len(self.realtime_transform.realtime_position)}  / Arrival: {len(self.realtime_transform.arrival_hashmap)} {sum([len(v) for k, v in self.realtime_transform.arrival_hashmap.items()])}")
+                                    Dataset size : Snapshot: {snapshot.seq} / Postiion: {len(snapshot.position)}  / Arrival: {len(snapshot.arrival)} {sum([len(v) for k, v in snapshot.arrival.items()])}")
                         
                 except Exception:
                     logger.info("Client is not connected. Try to connect to listener...")
                     logger.error(traceback.format_exc())
                     self.client.connect()
                     
+                    # Collect sends a full snapshot after reconnecting
+                    self.position_decoder.reset()
+                    
                     # IF client isn't connected, initialize data
                     if self.client is None:
                         logger.info("Failed to connect. Reset data.")
@@ -114,9 +143,56 @@ class RealtimeTransformWorker:
             except Exception:
                 logger.error(traceback.format_exc())
                 logger.error("Position")
-                logger.error(data["position"].to_dict(orient="records"))
+                logger.error(position_data)
                 logger.error("Arrival")
-                logger.error(data["arrival_all"].to_dict(orient="records"))
+                logger.error(self.arrival_all)
+    
+    def end_of_day(self):
+        """ Save delay data, archive realtimes and remove realtimes of the operational date.
+            Realtimes are removed only after every row is archived.
+            A failure of the archive isn't a connection error. It is logged and realtimes are kept.
+        """
+        # Caculate and insert delay data chunk by chunk
+        self.save_delay_data()
+        
+        # Archive realtimes. If it fails, realtimes aren't deleted.
+        if self.archive_repository is not None:
+            try:
+                rows = self.archive_repository.save_realtimes(
+                    self.realtime_transform.op_d_str,
+                    self.realtime_repository.iter_realtimes(self.realtime_transform.op_d_str, self.chunk_size)
+                )
+            except Exception:
+                logger.error(traceback.format_exc())
+                logger.error(f"Failed to archive realtimes of {self.realtime_transform.op_d_str}. Realtimes are kept.")
+                return
+            logger.info(f"Success to archive realtimes. The rows of data is {rows}")
+        
+        # Delete realtimes
+        self.realtime_repository.remove_realtimes(self.realtime_transform.op_d_str)
+    
+    def save_delay_data(self):
+        """ Calculate delay data of the operational date and insert it.
+            Realtime data is streamed in chunks, so memory is bounded by chunk_size, not by a day of data.
+            Delay time of a row depends only on the row and the timetable.
+        """
+        logger.info("Start to insert delay data")
+        usecols = ["line_id", "station_id", "train_id", "received_at", "train_status", "requested_at", "day_code", "first_last", "stop_no", "delayed_time", "op_date"]
+        rows = 0
+        for df in self.realtime_repository.iter_realtimes(self.realtime_transform.op_d_str, self.chunk_size):
+            # Caculate delay time
+            delay_data = self.realtime_transform.get_delay_data(df)
+            delay_data["op_date"] = self.realtime_transform.op_d_str
+            delay_data["day_code"] = self.realtime_transform.day_code
+            delay_data = delay_data.astype({"first_last": "Int16", "stop_no": "Int16"})
+            delay_data["stop_no"] = delay_data["stop_no"].fillna(-1)
+            
+            # Insert delay data
+            delay_data = delay_data[usecols].to_dict(orient="records")
+            self.delay_repository.insert_delay_many(delay_data, 10000)
+            rows += len(delay_data)
+            logger.debug(f"Insert {len(delay_data)} rows of delay data")
+        logger.info(f"Success to insert delay data. The rows of data is {rows}")
     
     def check_is_alive(self):
         return self.t is not None and self.t.is_alive()
@@ -0,0 +1,127 @@
+import os
+import shutil
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.columnar import DictionaryEncoder, smallest_uint_dtype, save_columns, load_meta, load_column
+
+logger = logging.getLogger("timetable_snapshot")
+
+"""
+    Local snapshot of the timetable for calculation delay
+
+    {snapshot_dir}/timetable_YYYYMMDD_{day_code}/
+        meta.json: version, op_date, day_code, timetable_version, rows, columns
+        {column}.npy: one file for each column of the loaded timetable (after converting times)
+
+    The snapshot is written after the timetable is loaded from the database,
+    and it is memory mapped on the next start of the same (op_date, day_code).
+    It is valid while timetable_version is the same as TimetableRepository.find_timetable_version.
+
+    Column kinds
+        numeric: numpy array as it is
+        masked: nullable extension array (e.g. Int32). data and {column}__mask.npy
+        object: dictionary encoded. codes in the npy file and values in meta.json
+                Values which aren't JSON types (e.g. datetime.time) are saved as strings. e.g. "09:02:00"
+"""
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_PREFIX = "timetable_"
+
+def _json_value(value):
+    # Missing values are factorized to NaN
+    if pd.isna(value):
+        return None
+    if isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, (np.integer, np.floating, np.bool_)):
+        return value.item()
+    return str(value)
+
+class TimetableSnapshot:
+    def __init__(self, snapshot_dir: str):
+        self.snapshot_dir = snapshot_dir
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+    def _path(self, op_date: str, day_code: int) -> str:
+        return os.path.join(self.snapshot_dir, f"{SNAPSHOT_PREFIX}{datetime.strptime(op_date, "%Y-%m-%d").strftime("%Y%m%d")}_{day_code}")
+
+    def save(self, op_date: str, day_code: int, timetable_version: str, tb: pd.DataFrame):
+        """ Save the timetable of (op_date, day_code) and remove the snapshots of previous dates
+
+        Args:
+            timetable_version (str): version stamp from TimetableRepository.find_timetable_version
+            tb (pd.DataFrame): timetable
+        """
+        columns: dict[str, np.ndarray] = {}
+        meta_columns: dict[str, dict] = {}
+        for name in tb.columns:
+            series = tb[name]
+            if isinstance(series.dtype, pd.api.extensions.ExtensionDtype) and series.dtype.kind in "iufb":
+                columns[name] = series.to_numpy(dtype=series.dtype.numpy_dtype, na_value=0)
+                columns[f"{name}__mask"] = series.isna().to_numpy()
+                meta_columns[name] = {"kind": "masked", "dtype": str(series.dtype)}
+            elif series.dtype.kind in "iufb":
+                columns[name] = series.to_numpy()
+                meta_columns[name] = {"kind": "numeric"}
+            else:
+                encoder = DictionaryEncoder()
+                codes = encoder.encode(series.to_numpy(dtype=object))
+                columns[name] = codes.astype(smallest_uint_dtype(max(len(encoder.values) - 1, 0)))
+                meta_columns[name] = {"kind": "object", "values": [_json_value(v) for v in encoder.values]}
+
+        save_columns(
+            self._path(op_date, day_code),
+            columns,
+            {
+                "version": SNAPSHOT_VERSION, "op_date": op_date, "day_code": day_code,
+                "timetable_version": timetable_version, "rows": len(tb), "columns": meta_columns
+            }
+        )
+        self._remove_previous(op_date)
+        logger.info(f"Save the timetable snapshot of {op_date} ({day_code}). rows: {len(tb)}")
+
+    def _remove_previous(self, op_date: str):
+        current = SNAPSHOT_PREFIX + datetime.strptime(op_date, "%Y-%m-%d").strftime("%Y%m%d")
+        for name in os.listdir(self.snapshot_dir):
+            # timetable_YYYYMMDD_{day_code}: the date part is compared as a string
+            if name.startswith(SNAPSHOT_PREFIX) and name[:len(current)] < current:
+                shutil.rmtree(os.path.join(self.snapshot_dir, name), ignore_errors=True)
+
+    def load(self, op_date: str, day_code: int, timetable_version: str|None) -> pd.DataFrame|None:
+        """ Load the timetable of (op_date, day_code)
+
+        Args:
+            timetable_version (str | None): The snapshot is used only if its version is the same.
+                None skips the validation. e.g. the database isn't available.
+
+        Returns:
+            pd.DataFrame|None: None if there isn't a valid snapshot
+        """
+        path = self._path(op_date, day_code)
+        try:
+            meta = load_meta(path)
+        except FileNotFoundError:
+            return None
+        if meta.get("version") != SNAPSHOT_VERSION:
+            return None
+        if timetable_version is not None and meta["timetable_version"] != timetable_version:
+            logger.info(f"The timetable snapshot of {op_date} ({day_code}) is outdated. {meta['timetable_version']} -> {timetable_version}")
+            return None
+
+        data = {}
+        for name, column in meta["columns"].items():
+            values = load_column(path, name)
+            if column["kind"] == "masked":
+                array = pd.array(np.asarray(values), dtype=column["dtype"])
+                array[np.asarray(load_column(path, f"{name}__mask"))] = pd.NA
+                data[name] = array
+            elif column["kind"] == "numeric":
+                data[name] = values
+            else:
+                data[name] = np.array(column["values"], dtype=object)[values]
+        logger.info(f"Load the timetable snapshot of {op_date} ({day_code}). rows: {meta['rows']}")
+        return pd.DataFrame(data, columns=list(meta["columns"]))
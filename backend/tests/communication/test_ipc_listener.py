@@ -0,0 +1,74 @@
+import os
+import time
+import tempfile
+import unittest
+import threading
+
+from multiprocessing.connection import Client
+
+from communication.ipc_listener import IPCListener
+from communication.ipc_client import IPCClient
+from communication.wire_format import encode_payload, decode_payload
+
+class TestIPCListener(unittest.TestCase):
+
+    def setUp(self):
+        self.address = os.path.join(tempfile.mkdtemp(), "ipc.sock")
+        self.listener = IPCListener(self.address)
+        self.thread = threading.Thread(target=self.listener.listen, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.listener.close()
+
+    def test_send_at_once(self):
+        client = Client(self.address)
+        start = time.monotonic()
+        self.listener.set_data({"seq": 1})
+        self.assertTrue(client.poll(1))
+        self.assertEqual(client.recv(), {"seq": 1})
+        # Without polling interval
+        self.assertLess(time.monotonic() - start, 0.2)
+        client.close()
+
+    def test_latest_wins(self):
+        # Not connected yet: data is kept and the older one is overwritten
+        self.listener.set_data({"seq": 1})
+        self.listener.set_data({"seq": 2})
+        client = Client(self.address)
+        self.assertEqual(client.recv(), {"seq": 2})
+        self.assertTrue(self.listener.consume_resync())
+        # sent is counted after send() returns
+        deadline = time.monotonic() + 1
+        while self.listener.stats()["sent"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stats = self.listener.stats()
+        self.assertEqual((stats["set"], stats["sent"], stats["overwritten"]), (2, 1, 1))
+        client.close()
+
+    def test_reconnect(self):
+        client = Client(self.address)
+        self.listener.set_data({"seq": 1})
+        self.assertEqual(client.recv(), {"seq": 1})
+        self.listener.consume_resync()
+        client.close()
+
+        # The send fails on the broken pipe. The data is sent to the next client.
+        client = Client(self.address)
+        self.listener.set_data({"seq": 2})
+        self.assertTrue(client.poll(2))
+        self.assertEqual(client.recv(), {"seq": 2})
+        self.assertTrue(self.listener.consume_resync())
+        self.assertEqual(self.listener.stats()["failed"], 1)
+        client.close()
+
+    def test_encode(self):
+        self.listener.encode = encode_payload
+        client = IPCClient(self.address, decode_payload)
+        client.connect()
+        self.listener.set_data({"position": 0, "arrival_all": 0})
+        self.assertEqual(client.recv(), {"position": 0, "arrival_all": 0})
+        client.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+
+import pandas as pd
+
+from communication.position_delta import PositionDeltaEncoder, PositionDeltaDecoder, merge_payloads
+
+def create_frame(trains: dict[str, tuple[int, int]]) -> pd.DataFrame:
+    # train_id -> (station_id, train_status)
+    return pd.DataFrame([
+        {
+            "line_id": 1002, "line_name": "2호선", "station_id": station_id, "station_name": "강남",
+            "train_id": train_id, "received_at": "2025-05-01 10:00:00", "up_down": 0,
+            "last_station_id": 1002000201, "last_station_name": "시청", "train_status": train_status,
+            "express": 0, "is_last_train": 0, "requested_at": "2025-05-01 10:00:05"
+        }
+        for train_id, (station_id, train_status) in trains.items()
+    ])
+
+def state(frame: pd.DataFrame) -> dict:
+    return {row.train_id: (row.station_id, row.train_status) for row in frame.itertuples()}
+
+class TestPositionDelta(unittest.TestCase):
+
+    def setUp(self):
+        self.encoder = PositionDeltaEncoder(full_every=2)
+        self.decoder = PositionDeltaDecoder()
+
+    def test_delta(self):
+        full = self.encoder.encode(create_frame({"2201": (222, 1), "2202": (223, 0)}))
+        self.assertTrue(full["full"])
+        self.assertEqual(len(full["snapshot"]), 2)
+        # Every train is added
+        self.assertIs(full["added"], full["snapshot"])
+
+        delta = self.encoder.encode(create_frame({"2201": (222, 2), "2202": (223, 0), "2203": (224, 1)}))
+        self.assertFalse(delta["full"])
+        self.assertEqual(delta["added"]["train_id"].tolist(), ["2203"])
+        self.assertEqual(delta["moved"]["train_id"].tolist(), ["2201"])
+        self.assertEqual(len(delta["removed"]), 0)
+
+        delta = self.encoder.encode(create_frame({"2201": (222, 2), "2203": (224, 1)}))
+        self.assertTrue(delta["full"]) # every 2 cycles
+        self.assertEqual(delta["removed"]["train_id"].tolist(), ["2202"])
+        self.assertEqual(len(delta["added"]), 0)
+
+    def test_requested_at_is_not_movement(self):
+        frame = create_frame({"2201": (222, 1)})
+        self.encoder.encode(frame)
+        delta = self.encoder.encode(frame.assign(requested_at="2025-05-01 10:00:15"))
+        self.assertEqual(len(delta["added"]) + len(delta["moved"]) + len(delta["removed"]), 0)
+
+    def test_decoder(self):
+        frames = [
+            create_frame({"2201": (222, 1), "2202": (223, 0)}),
+            create_frame({"2201": (222, 2), "2203": (224, 1)}),
+        ]
+        for frame in frames:
+            self.assertEqual(state(self.decoder.apply(self.encoder.encode(frame))), state(frame))
+
+    def test_decoder_waits_for_full_snapshot_after_gap(self):
+        encoder = PositionDeltaEncoder(full_every=100)
+        self.decoder.apply(encoder.encode(create_frame({"2201": (222, 1)})))
+        encoder.encode(create_frame({"2201": (222, 2)})) # lost
+        self.assertIsNone(self.decoder.apply(encoder.encode(create_frame({"2201": (223, 0)}))))
+        self.assertIsNone(self.decoder.apply(encoder.encode(create_frame({"2201": (223, 1)}))))
+
+        encoder.reset()
+        frame = create_frame({"2201": (223, 2)})
+        self.assertEqual(state(self.decoder.apply(encoder.encode(frame))), state(frame))
+
+    def test_skipped_empty_delta(self):
+        encoder = PositionDeltaEncoder(full_every=100)
+        self.decoder.apply(encoder.encode(create_frame({"2201": (222, 1)})))
+        # Nothing moved. The sender skips the delta.
+        empty = encoder.encode(create_frame({"2201": (222, 1)}))
+        self.assertEqual(empty["seq"], empty["base_seq"])
+
+        frame = create_frame({"2201": (223, 0)})
+        self.assertEqual(state(self.decoder.apply(encoder.encode(frame))), state(frame))
+
+    def test_merge_payloads(self):
+        encoder = PositionDeltaEncoder(full_every=100)
+        self.decoder.apply(encoder.encode(create_frame({"2201": (222, 1), "2202": (223, 0)})))
+
+        frames = [
+            create_frame({"2201": (222, 2), "2203": (224, 1)}), # 2202 removed, 2203 added
+            create_frame({"2201": (223, 0), "2202": (225, 1)}), # 2203 removed, 2202 added again
+        ]
+        older, newer = ({"position": encoder.encode(frame), "arrival_all": arrival_all, "changed_lines": {1002}, "stale_lines": stale_lines} for frame, arrival_all, stale_lines in zip(frames, [[{"statnId": "1"}], None], [{1003}, {1004}]))
+        merged = merge_payloads(older, newer)
+        self.assertEqual(merged["stale_lines"], {1003, 1004})
+
+        self.assertEqual(merged["arrival_all"], [{"statnId": "1"}])
+        self.assertEqual(len(merged["position"]["removed"]), 0)
+        self.assertEqual(sorted(merged["position"]["moved"]["train_id"]), ["2201", "2202"])
+        self.assertEqual(state(self.decoder.apply(merged["position"])), state(frames[1]))
+
+        # Signals replace the unsent payload
+        self.assertEqual(merge_payloads(merged, {"position": 0, "arrival_all": 0})["position"], 0)
@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from communication.realtime_snapshot_file import RealtimeSnapshotWriter, RealtimeSnapshotReader
+from model.pydantic_model import RealtimeSnapshot, RealtimePosition, RealtimePositionRow, RealtimeArrivalRow
+
+def create_snapshot(seq: int, station_name: str) -> RealtimeSnapshot:
+    position = RealtimePosition(place=[RealtimePositionRow(
+        line_id=1002, train_id="2001", station_id=1002000222, station_name=station_name, last_station_id=1002000201,
+        last_station_name="시청", received_at="2025-05-01 09:00:00", train_status=1, express=0, up_down=0
+    )])
+    arrival = [RealtimeArrivalRow(
+        train_id="2001", last_station_name="시청", cur_station_name=station_name, received_at="2025-05-01 09:00:00",
+        train_status="도착", express=0, up_down=0, stop_order_diff=0, information_message="당역 도착"
+    )]
+    return RealtimeSnapshot.model_construct(seq=seq, built_at=datetime(2025, 5, 1, 9), position={1002: position}, arrival={1002000222: arrival})
+
+class TestRealtimeSnapshotFile(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "realtime.snapshot")
+        self.writer = RealtimeSnapshotWriter(self.path)
+        self.reader = RealtimeSnapshotReader(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_no_snapshot(self):
+        view = self.reader.read()
+        self.assertEqual(view.seq, -1)
+        self.assertNotIn(1002, view.position)
+
+    def test_write_and_read(self):
+        snapshot = create_snapshot(1, "강남")
+        self.writer.write(snapshot)
+        view = self.reader.read()
+
+        self.assertEqual(view.seq, 1)
+        self.assertEqual(view.built_at, snapshot.built_at)
+        self.assertEqual(view.position[1002], snapshot.position[1002])
+        self.assertEqual(view.arrival[1002000222], snapshot.arrival[1002000222])
+        self.assertNotIn(1003, view.position)
+        self.assertEqual(list(view.arrival), [1002000222])
+
+    def test_replace(self):
+        self.writer.write(create_snapshot(1, "강남"))
+        old = self.reader.read()
+        self.writer.write(create_snapshot(2, "역삼"))
+        new = self.reader.read()
+
+        # A view which is in use isn't changed
+        self.assertEqual(old.position[1002].place[0].station_name, "강남")
+        self.assertEqual(new.seq, 2)
+        self.assertEqual(new.position[1002].place[0].station_name, "역삼")
+
+if __name__ == "__main__":
+    unittest.main()
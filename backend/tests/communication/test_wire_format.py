@@ -0,0 +1,82 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from communication.wire_format import encode_payload, decode_payload, MAGIC
+from communication.position_delta import PositionDeltaEncoder
+
+def create_frame() -> pd.DataFrame:
+    frame = pd.DataFrame([
+        {
+            "line_id": 1002, "line_name": "2호선", "station_id": station_id, "station_name": station_name,
+            "train_id": train_id, "received_at": "2025-05-01 10:00:00", "up_down": 0,
+            "last_station_id": 1002000201, "last_station_name": "시청", "train_status": 1,
+            "express": 0, "is_last_train": 0, "requested_at": "2025-05-01 10:00:05"
+        }
+        for train_id, station_id, station_name in [("2201", 1002000222, "강남"), ("2202", 1002000223, None)]
+    ])
+    return frame.astype({c: "string" for c in ["line_name", "station_name", "train_id", "received_at", "last_station_name", "requested_at"]})
+
+class TestWireFormat(unittest.TestCase):
+
+    def test_position_delta(self):
+        delta = PositionDeltaEncoder().encode(create_frame())
+        payload = {"position": delta, "arrival_all": None, "changed_lines": {1002, 1003}}
+        data = encode_payload(payload)
+        self.assertEqual(data[:4], MAGIC)
+        result = decode_payload(data)
+
+        self.assertEqual(result["changed_lines"], {1002, 1003})
+        self.assertIsNone(result["arrival_all"])
+        self.assertEqual((result["position"]["seq"], result["position"]["full"]), (delta["seq"], delta["full"]))
+        for key in ("added", "moved", "removed", "snapshot"):
+            pd.testing.assert_frame_equal(result["position"][key], delta[key])
+
+    def test_numeric_columns_are_not_copied(self):
+        data = encode_payload({"position": create_frame()})
+        line_id = decode_payload(data)["position"]["line_id"].to_numpy()
+        # A view of the received bytes
+        self.assertTrue(np.shares_memory(line_id, np.frombuffer(data, dtype=np.uint8)))
+
+    def test_arrival_records(self):
+        rows = [
+            {"subwayId": "1077", "statnNm": "강남", "barvlDt": "120"},
+            {"subwayId": "1077", "statnNm": None, "barvlDt": "0", "ordkey": 1},
+        ]
+        result = decode_payload(encode_payload({"arrival_all": rows}))
+        # A missing key is None
+        self.assertEqual(result["arrival_all"], [
+            {"subwayId": "1077", "statnNm": "강남", "barvlDt": "120", "ordkey": None},
+            {"subwayId": "1077", "statnNm": None, "barvlDt": "0", "ordkey": 1},
+        ])
+
+        # Rows with the same keys in another order
+        rows = [{"subwayId": "1077", "barvlDt": str(i), "ordkey": i} for i in range(3)] + [{"ordkey": 3, "barvlDt": None, "subwayId": "1002"}]
+        self.assertEqual(decode_payload(encode_payload({"arrival_all": rows}))["arrival_all"], rows)
+
+    def test_datetime_columns(self):
+        frame = pd.DataFrame({
+            "received_at": pd.to_datetime(["2025-05-01 10:00:00", None]),
+            "requested_at": pd.to_datetime(["2025-05-01 10:00:05", "2025-05-01 23:59:59"]).tz_localize("Asia/Seoul"),
+            "train_id": ["2201", "2202"],
+        })
+        result = decode_payload(encode_payload({"position": frame}))
+        pd.testing.assert_frame_equal(result["position"], frame)
+        self.assertTrue(pd.isna(result["position"]["received_at"][1]))
+
+    def test_mixed_object_column(self):
+        frame = pd.DataFrame({"station_name": ["강남", None], "extra": [{"a": 1}, [1, 2]]})
+        pd.testing.assert_frame_equal(decode_payload(encode_payload({"position": frame}))["position"], frame)
+
+    def test_signal(self):
+        self.assertEqual(decode_payload(encode_payload({"position": 0, "arrival_all": 0})), {"position": 0, "arrival_all": 0})
+
+    def test_version(self):
+        data = bytearray(encode_payload({"position": create_frame()}))
+        data[4] = 99
+        with self.assertRaises(Exception):
+            decode_payload(bytes(data))
+
+if __name__ == "__main__":
+    unittest.main()
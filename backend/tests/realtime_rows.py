@@ -0,0 +1,16 @@
+"""
+    Rows of the realtimes store shared by tests of the repository and the writer
+"""
+
+def create_row(**kwargs) -> dict:
+    """ A realtime row of train 2201 at 강남 (2호선). kwargs replace the values. """
+    row = {
+        "line_id": 1002,
+        "station_id": 1002000222,
+        "train_id": "2201",
+        "received_at": "2025-05-01 10:00:00",
+        "train_status": 1,
+        "requested_at": "2025-05-01 10:00:05"
+    }
+    row.update(kwargs)
+    return row
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from repositories.archive_repository.columnar_archive_repository import ColumnarArchiveRepository
+from utils.columnar import save_columns, load_meta
+
+def create_chunk(train_ids: list[str], start: int) -> pd.DataFrame:
+    n = len(train_ids)
+    return pd.DataFrame({
+        "line_id": np.full(n, 1002, dtype=np.int64),
+        "station_id": np.array([1002000222 + i % 3 for i in range(n)], dtype=np.int64),
+        "train_id": pd.array(train_ids, dtype="string"),
+        "received_at": pd.array([f"2025-05-01 10:{start + i:02d}:00.000000" for i in range(n)], dtype="string"),
+        "train_status": np.array([i % 3 for i in range(n)], dtype=np.int64),
+        "requested_at": pd.array([f"2025-05-01 10:{start + i:02d}:05.000000" for i in range(n)], dtype="string"),
+    })
+
+class TestColumnarArchiveRepository(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.repository = ColumnarArchiveRepository(self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        # The second chunk is older. Rows are sorted by received_at.
+        chunks = [create_chunk(["2201", "2202", "2201"], 10), create_chunk(["2203", "2201"], 0)]
+        self.assertEqual(self.repository.save_realtimes("2025-05-01", iter(chunks)), 5)
+        self.assertEqual(self.repository.find_archived_dates(), ["2025-05-01"])
+
+        # A closed day is compressed
+        path = os.path.join(self.tmp_dir, "realtimes_20250501")
+        self.assertEqual(sorted(os.listdir(path)), ["columns.npz", "meta.json"])
+        columns = self.repository.open_realtimes("2025-05-01")
+        self.assertEqual(columns["train_code"].dtype, np.uint8)
+        self.assertEqual(sorted(columns["train_ids"].tolist()), ["2201", "2202", "2203"])
+
+        df = self.repository.load_realtimes("2025-05-01")
+        self.assertEqual(df["train_id"].tolist(), ["2203", "2201", "2201", "2202", "2201"])
+        self.assertEqual(df["received_at"].iloc[0], pd.Timestamp("2025-05-01 10:00:00"))
+        self.assertEqual(df["requested_at"].iloc[-1], pd.Timestamp("2025-05-01 10:12:05"))
+        self.assertEqual(df["station_id"].tolist(), [1002000222, 1002000223, 1002000222, 1002000223, 1002000224])
+
+    def test_version_1(self):
+        # Version 1 archive: plain .npy files are memory mapped
+        self.repository.save_realtimes("2025-05-01", [create_chunk(["2201", "2202"], 0)])
+        path = os.path.join(self.tmp_dir, "realtimes_20250501")
+        columns = self.repository.open_realtimes("2025-05-01")
+        received_at_start = int(columns.pop("received_at_start"))
+        save_columns(path, {name: np.asarray(values) for name, values in columns.items()}, {**load_meta(path), "version": 1})
+
+        self.assertIsInstance(self.repository.open_realtimes("2025-05-01")["train_code"], np.memmap)
+        df = self.repository.load_realtimes("2025-05-01")
+        self.assertEqual(df["train_id"].tolist(), ["2201", "2202"])
+        self.assertEqual(df["received_at"].iloc[0], pd.Timestamp(received_at_start, unit="s"))
+
+    def test_empty_day(self):
+        self.assertEqual(self.repository.save_realtimes("2025-05-02", []), 0)
+        self.assertEqual(len(self.repository.load_realtimes("2025-05-02")), 0)
+
+    def test_missing_day(self):
+        with self.assertRaises(Exception):
+            self.repository.open_realtimes("2025-05-03")
@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from sqlalchemy import inspect
+
+from repositories.realtimes_repository.sqlite_realtime_repository import SqliteRealtimeRepository
+from model.sqlalchemy_model import Realtime
+from tests.realtime_rows import create_row
+
+class TestSqliteRealtimeRepository(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.repository = SqliteRealtimeRepository()
+        self.repository.create_engine(f"sqlite:///{os.path.join(self.tmp_dir, 'realtimes.db')}")
+
+    def tearDown(self):
+        self.repository.dispose()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_wal_mode(self):
+        with self.repository.engine.connect() as conn:
+            self.assertEqual(conn.exec_driver_sql("PRAGMA journal_mode").scalar(), "wal")
+            self.assertEqual(conn.exec_driver_sql("PRAGMA synchronous").scalar(), 1) # NORMAL
+
+    def test_upsert_realtimes(self):
+        self.repository.upsert_realtimes([create_row(), create_row(train_id="2202")])
+        # Conflict: update received_at and requested_at
+        self.repository.upsert_realtimes([create_row(received_at=datetime(2025, 5, 1, 10, 0, 10), requested_at="2025-05-01 10:00:15")])
+        self.repository.upsert_realtimes([])
+
+        data = sorted(self.repository.find_realtimes("2025-05-01"), key=lambda d: d["train_id"])
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data[0]["received_at"], "2025-05-01 10:00:10.000000")
+        self.assertEqual(data[0]["requested_at"], "2025-05-01 10:00:15.000000")
+        self.assertEqual(data[1]["received_at"], "2025-05-01 10:00:00.000000")
+
+    def test_partition_by_op_date(self):
+        self.repository.upsert_realtimes([
+            create_row(received_at="2025-05-01 23:59:50", requested_at="2025-05-01 23:59:55"),
+            create_row(train_id="2202", received_at="2025-05-02 01:00:00", requested_at="2025-05-02 01:00:05"), # 2025-05-01 until 04:50
+            # Received before 04:50: the previous date, as find_realtimes filtered on received_at before partitioning
+            create_row(train_id="2203", received_at="2025-05-02 04:49:58", requested_at="2025-05-02 04:50:05"),
+            create_row(train_id="2204", received_at="2025-05-02 04:50:00", requested_at="2025-05-02 04:50:05"),
+        ])
+        # Only partitions are created
+        self.assertEqual(inspect(self.repository.engine).get_table_names(), ["realtimes_20250501", "realtimes_20250502"])
+        self.assertEqual(len(self.repository.find_realtimes("2025-05-01")), 3)
+        self.assertEqual(len(self.repository.find_realtimes("2025-05-02")), 1)
+        self.assertEqual(self.repository.find_realtimes("2025-05-03"), [])
+
+        # Drop only the partition of the date
+        self.repository.remove_realtimes("2025-05-01")
+        self.assertFalse(self.repository.has_partition("2025-05-01"))
+        self.assertEqual(len(self.repository.find_realtimes("2025-05-02")), 1)
+
+        # The partition is created again
+        self.repository.upsert_realtimes([create_row()])
+        self.assertEqual(len(self.repository.find_realtimes("2025-05-01")), 1)
+
+    def test_iter_realtimes(self):
+        self.repository.upsert_realtimes([create_row(train_id=f"22{i:02d}") for i in range(5)])
+
+        chunks = list(self.repository.iter_realtimes("2025-05-01", chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(chunks[0]["line_id"].dtype, "int64")
+        self.assertEqual(chunks[0]["train_id"].dtype, "string")
+        self.assertEqual(chunks[0]["received_at"][0], "2025-05-01 10:00:00.000000")
+        self.assertEqual(list(self.repository.iter_realtimes("2025-05-02")), [])
+
+    def test_migrate_legacy_table(self):
+        # The single table before partitioning
+        Realtime.__table__.create(self.repository.engine)
+        with self.repository.engine.begin() as conn:
+            conn.execute(Realtime.__table__.insert(), [
+                create_row(received_at=datetime(2025, 5, 1, 10, 0), requested_at=datetime(2025, 5, 1, 10, 0, 5)),
+                create_row(train_id="2202", received_at=datetime(2025, 5, 2, 4, 49, 58), requested_at=datetime(2025, 5, 2, 4, 50, 5)),
+                create_row(train_id="2203", received_at=datetime(2025, 5, 2, 4, 50), requested_at=datetime(2025, 5, 2, 4, 50, 5)),
+            ])
+        # A newer row in the partition is kept
+        self.repository.upsert_realtimes([create_row(received_at="2025-05-01 10:00:30", requested_at="2025-05-01 10:00:35")])
+
+        self.repository.prepare_partitions()
+        self.assertEqual(inspect(self.repository.engine).get_table_names(), ["realtimes_20250501", "realtimes_20250502"])
+        data = sorted(self.repository.find_realtimes("2025-05-01"), key=lambda d: d["train_id"])
+        self.assertEqual([(d["train_id"], d["received_at"]) for d in data], [("2201", "2025-05-01 10:00:30.000000"), ("2202", "2025-05-02 04:49:58.000000")])
+        self.assertEqual([d["train_id"] for d in self.repository.find_realtimes("2025-05-02")], ["2203"])
+
+        # Only once
+        self.assertEqual(self.repository.migrate_legacy_table(), 0)
+
+    def test_drop_old_partitions(self):
+        self.repository.upsert_realtimes([
+            create_row(received_at=f"2025-05-{day:02d} 10:00:00", requested_at=f"2025-05-{day:02d} 10:00:05") for day in (1, 2, 9)
+        ])
+        # Operational date of 2025-05-10 03:00 is 2025-05-09. Partitions from 2025-05-02 are kept.
+        self.assertEqual(self.repository.drop_old_partitions(7, now=datetime(2025, 5, 10, 3, 0)), ["2025-05-01"])
+        self.assertEqual(self.repository.find_partitions(), ["2025-05-02", "2025-05-09"])
+        # The dropped partition is created again on the next upsert
+        self.repository.upsert_realtimes([create_row()])
+        self.assertEqual(len(self.repository.find_realtimes("2025-05-01")), 1)
@@ -0,0 +1,95 @@
+import unittest
+from datetime import datetime
+
+from services.collect.src.adaptive_polling import AdaptivePollingPlanner
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+def create_rows(n: int, station_id: str = "1002000222") -> list[dict]:
+    return [{"trainNo": str(i), "statnId": station_id, "trainSttus": "1"} for i in range(n)]
+
+class TestAdaptivePollingPlanner(unittest.TestCase):
+
+    def setUp(self):
+        # 12:00. 13.5 hours until 01:30 (48600 seconds)
+        self.clock = FakeClock(datetime(2025, 5, 1, 12, 0, 0).timestamp())
+        self.quota = None
+
+    def create_planner(self, **kwargs) -> AdaptivePollingPlanner:
+        return AdaptivePollingPlanner([1002, 1003, 1004], 10, 5, 60, "01:30:00", clock=self.clock, **kwargs)
+
+    def test_same_activity_keeps_base_interval(self):
+        planner = self.create_planner()
+        self.assertEqual(planner.plan(), {1002: 10, 1003: 10, 1004: 10})
+
+    def test_clamp_to_min_and_max(self):
+        planner = self.create_planner()
+        planner.observe(1002, create_rows(20))
+        planner.observe(1003, [])
+        planner.observe(1004, [])
+        intervals = planner.plan()
+
+        # 22 / (0.3 * 20) = 3.7s and 22 / (0.3 * 1) = 73s
+        self.assertEqual((intervals[1002], intervals[1003], intervals[1004]), (5, 60, 60))
+
+    def test_back_off_and_recover_by_quota(self):
+        planner = self.create_planner(quota_source=lambda: self.quota)
+        self.quota = 48600 * 0.1 # 0.1 requests per second
+        self.assertAlmostEqual(planner.plan()[1002], 30)
+
+        self.quota = 0
+        self.assertEqual(planner.plan()[1002], 60)
+
+        # Quota is reset
+        self.quota = 100000
+        self.assertEqual(planner.plan()[1002], 10)
+
+    def test_back_off_and_recover_by_activity(self):
+        planner = self.create_planner(smoothing=0.5)
+        for line_id in (1003, 1004):
+            planner.observe(line_id, create_rows(4))
+        planner.observe(1002, create_rows(4))
+
+        # Every train of 1002 moves every 10 seconds
+        for i in range(3):
+            self.clock.now += 10
+            planner.observe(1002, create_rows(4, station_id=f"100200022{i}"))
+        busy = planner.plan()[1002]
+        self.assertLess(busy, 10)
+
+        # Trains stop moving. The change rate decays and the interval grows back.
+        for _ in range(10):
+            self.clock.now += 10
+            planner.observe(1002, create_rows(4, station_id="1002000222"))
+        self.assertGreater(planner.plan()[1002], busy)
+        self.assertAlmostEqual(planner.plan()[1002], 10, delta=0.5)
+
+    def test_due_lines(self):
+        planner = self.create_planner()
+        self.assertEqual(planner.due_lines(), [1002, 1003, 1004])
+        for line_id in (1002, 1003, 1004):
+            planner.observe(line_id, create_rows(1))
+
+        self.clock.now += 5
+        self.assertEqual(planner.due_lines(), [])
+        self.clock.now += 5
+        self.assertEqual(planner.due_lines(), [1002, 1003, 1004])
+
+    def test_daily_quota(self):
+        planner = self.create_planner(daily_quota=2)
+        planner.record_request("ALL")
+        planner.record_request("ALL")
+        self.assertEqual(planner.remaining_quota(), 0)
+
+        # The next day
+        self.clock.now += 86400
+        planner.due_lines()
+        self.assertEqual(planner.remaining_quota(), 2)
+
+if __name__ == "__main__":
+    unittest.main()
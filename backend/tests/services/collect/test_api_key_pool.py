@@ -0,0 +1,47 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from services.collect.src.api_key_pool import ApiKeyPool
+
+class TestApiKeyPool(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "api_keys.db")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE api_keys (key TEXT)")
+        conn.executemany("INSERT INTO api_keys VALUES (?)", [("key-a",), ("key-b",), ("key-c",)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_acquire_spreads_requests(self):
+        pool = ApiKeyPool(self.db_path)
+        keys = [pool.acquire() for _ in range(6)]
+        self.assertEqual(sorted(keys), ["key-a", "key-a", "key-b", "key-b", "key-c", "key-c"])
+
+    def test_quota_exceeded_key_is_rotated(self):
+        pool = ApiKeyPool(self.db_path)
+        pool.report("key-a", "ERROR-337")
+        pool.report("key-b", "INFO-100")
+        keys = {pool.acquire() for _ in range(3)}
+        self.assertEqual(keys, {"key-c"})
+        self.assertEqual(pool.keys["key-a"]["errors"], {"ERROR-337": 1})
+
+    def test_remaining_quota(self):
+        pool = ApiKeyPool(self.db_path, daily_quota=2)
+        self.assertEqual(pool.remaining_quota(), 6)
+        for _ in range(5):
+            pool.acquire()
+        self.assertEqual(pool.remaining_quota(), 1)
+
+    def test_unlimited_quota(self):
+        pool = ApiKeyPool(self.db_path)
+        self.assertIsNone(pool.remaining_quota())
+
+if __name__ == "__main__":
+    unittest.main()
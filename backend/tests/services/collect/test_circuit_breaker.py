@@ -0,0 +1,74 @@
+import unittest
+
+from services.collect.src.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker("realtimePosition/2호선", failure_threshold=3, recovery_timeout=60, clock=self.clock)
+
+    def test_open_after_failures(self):
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_success_resets_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_probe(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+        self.clock.now = 60
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        # Only one probe at once
+        self.assertFalse(self.breaker.allow_request())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_opens_again(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+        self.clock.now = 60
+        self.breaker.allow_request()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+
+        self.clock.now = 100
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_ignored_probe(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+        self.clock.now = 60
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_ignored()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+        self.clock.now = 120
+        self.assertTrue(self.breaker.allow_request())
+
+if __name__ == "__main__":
+    unittest.main()
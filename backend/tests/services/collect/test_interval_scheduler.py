@@ -0,0 +1,96 @@
+import unittest
+from datetime import datetime
+
+from services.collect.src.interval_scheduler import IntervalScheduler
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+class TestIntervalScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock(datetime(2025, 5, 1, 12, 0, 3).timestamp())
+
+    def create_scheduler(self, overrun_policy: str = "skip") -> IntervalScheduler:
+        return IntervalScheduler(10, "04:50:00", "01:30:00", overrun_policy, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_ticks_are_on_fixed_grid(self):
+        scheduler = self.create_scheduler()
+
+        tick, lateness = scheduler.wait_next_tick()
+        self.assertEqual(tick, datetime(2025, 5, 1, 12, 0, 10).timestamp())
+        self.assertEqual(lateness, 0)
+
+        # The cycle takes 4 seconds. The next tick doesn't drift.
+        self.clock.now += 4
+        tick, _ = scheduler.wait_next_tick()
+        self.assertEqual(tick, datetime(2025, 5, 1, 12, 0, 20).timestamp())
+
+    def test_overrun_skip(self):
+        scheduler = self.create_scheduler("skip")
+        scheduler.wait_next_tick()
+
+        # The cycle takes 12 seconds. The tick at 12:00:20 is skipped.
+        self.clock.now += 12
+        tick, lateness = scheduler.wait_next_tick()
+        self.assertEqual(tick, datetime(2025, 5, 1, 12, 0, 30).timestamp())
+        self.assertEqual(lateness, 0)
+        self.assertEqual(scheduler.skipped_ticks, 1)
+
+    def test_overrun_immediate(self):
+        scheduler = self.create_scheduler("immediate")
+        scheduler.wait_next_tick()
+
+        # The cycle takes 12 seconds. The next cycle runs at once.
+        self.clock.now += 12
+        tick, lateness = scheduler.wait_next_tick()
+        self.assertEqual(tick, datetime(2025, 5, 1, 12, 0, 20).timestamp())
+        self.assertAlmostEqual(lateness, 2)
+        self.assertEqual(scheduler.skipped_ticks, 0)
+
+    def test_operating_hours(self):
+        scheduler = self.create_scheduler()
+        self.assertTrue(scheduler.is_operating(datetime(2025, 5, 1, 12, 0, 0).timestamp()))
+        self.assertTrue(scheduler.is_operating(datetime(2025, 5, 2, 1, 0, 0).timestamp()))
+        self.assertFalse(scheduler.is_operating(datetime(2025, 5, 2, 2, 0, 0).timestamp()))
+
+    def test_next_start(self):
+        scheduler = self.create_scheduler()
+        self.assertEqual(
+            scheduler.next_start(datetime(2025, 5, 2, 1, 30, 1).timestamp()),
+            datetime(2025, 5, 2, 4, 50, 0).timestamp()
+        )
+        self.assertEqual(
+            scheduler.next_start(datetime(2025, 5, 1, 23, 0, 0).timestamp()),
+            datetime(2025, 5, 2, 4, 50, 0).timestamp()
+        )
+
+    def test_restart_resets_grid(self):
+        scheduler = self.create_scheduler()
+        scheduler.wait_next_tick()
+        self.clock.now = datetime(2025, 5, 2, 1, 30, 1).timestamp()
+        start = scheduler.wait_next_start()
+        self.assertEqual(self.clock.now, start)
+
+        tick, _ = scheduler.wait_next_tick()
+        self.assertEqual(tick, datetime(2025, 5, 2, 4, 50, 0).timestamp())
+
+    def test_start_time_before_op_day(self):
+        # START_TIME of .env_template. Rows before 04:50 belong to the previous operational date.
+        scheduler = IntervalScheduler(10, "04:30:00", "01:30:00", clock=self.clock, sleep=self.clock.sleep)
+        self.assertEqual(
+            scheduler.next_start(datetime(2025, 5, 2, 1, 30, 1).timestamp()),
+            datetime(2025, 5, 2, 4, 50, 0).timestamp()
+        )
+        self.assertFalse(scheduler.is_operating(datetime(2025, 5, 2, 4, 40, 0).timestamp()))
+        self.assertTrue(scheduler.is_operating(datetime(2025, 5, 2, 4, 50, 0).timestamp()))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+from services.collect.src.position_preprocessor import preprocess_realtime_position
+
+def create_row(**kwargs) -> dict:
+    row = {
+        "subwayId": "1002",
+        "subwayNm": "2호선",
+        "statnId": "1002000222",
+        "statnNm": "강남",
+        "trainNo": "2201",
+        "recptnDt": "2025-05-01 10:00:00",
+        "updnLine": "0",
+        "statnTid": "1002000201",
+        "statnTnm": "시청",
+        "trainSttus": "1",
+        "directAt": "0",
+        "lstcarAt": "0"
+    }
+    row.update(kwargs)
+    return row
+
+class TestPositionPreprocessor(unittest.TestCase):
+
+    def test_types(self):
+        rt = preprocess_realtime_position([create_row()])
+
+        self.assertEqual(len(rt), 1)
+        self.assertEqual(rt["line_id"].dtype, "int64")
+        self.assertEqual(rt["train_id"].dtype, "string")
+        self.assertEqual(rt.loc[0, "station_id"], 1002000222)
+        self.assertEqual(rt.loc[0, "last_station_name"], "시청")
+
+    def test_station_id_correction(self):
+        rt = preprocess_realtime_position([
+            create_row(subwayId="1067", statnId=None, statnNm="광운대", statnTid="", statnTnm="광운대"),
+            create_row(subwayId="1067", trainNo="6001", statnId=None, statnNm="용산"),
+        ])
+
+        self.assertEqual(rt["station_id"].tolist(), [1067080119, 1063075110])
+        self.assertEqual(rt.loc[0, "last_station_id"], 1067080119)
+
+        # Only 광운대 is corrected for the last station
+        rt = preprocess_realtime_position([create_row(subwayId="1067", statnTid=None, statnTnm="용산")])
+        self.assertEqual(len(rt), 0)
+
+    def test_drop_error_rows(self):
+        rt = preprocess_realtime_position([
+            create_row(trainNo="2201"),
+            create_row(trainNo="2202", statnId=None),
+            create_row(trainNo="2203", trainSttus="가"),
+        ])
+
+        self.assertEqual(rt["train_id"].tolist(), ["2201"])
+
+    def test_line2_train_id(self):
+        rt = preprocess_realtime_position([create_row(trainNo="3201"), create_row(subwayId="1003", trainNo="3201")])
+
+        self.assertEqual(rt["train_id"].tolist(), ["2201", "3201"])
+
+    def test_drop_prev_information(self):
+        rt = preprocess_realtime_position([create_row(trainSttus="3"), create_row(trainNo="2202", trainSttus="2")])
+
+        self.assertEqual(rt["train_id"].tolist(), ["2202"])
+
+    def test_drop_duplicates_keep_latest(self):
+        rt = preprocess_realtime_position([
+            create_row(statnId="1002000223", recptnDt="2025-05-01 10:00:30"),
+            create_row(statnId="1002000222", recptnDt="2025-05-01 10:00:00"),
+            create_row(trainNo="2202"),
+        ])
+
+        self.assertEqual(len(rt), 2)
+        self.assertEqual(rt.loc[0, "station_id"], 1002000223)
+
+    def test_sorted_by_line_and_train(self):
+        rt = preprocess_realtime_position([
+            create_row(subwayId="1003", trainNo="3001"),
+            create_row(trainNo="2203"),
+            create_row(trainNo="2201", recptnDt="2025-05-01 09:59:00"),
+            create_row(trainNo="2201"),
+        ])
+
+        self.assertEqual(list(zip(rt["line_id"], rt["train_id"])), [(1002, "2201"), (1002, "2203"), (1003, "3001")])
+        self.assertEqual(rt.loc[0, "received_at"], "2025-05-01 10:00:00")
+
+    def test_empty(self):
+        rt = preprocess_realtime_position([])
+
+        self.assertEqual(len(rt), 0)
+        self.assertIn("train_status", rt.columns)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+import json
+import threading
+import unittest
+
+from services.collect.src.realtime_collect import RealtimeCollect
+from services.collect.src.circuit_breaker import CLOSED, OPEN
+
+def create_row(line_id: int, line_name: str, train_id: str, station_id: int) -> dict:
+    return {
+        "subwayId": str(line_id), "subwayNm": line_name, "statnId": str(station_id), "statnNm": "강남",
+        "trainNo": train_id, "recptnDt": "2025-05-01 10:00:00", "updnLine": "0", "statnTid": str(station_id + 1),
+        "statnTnm": "시청", "trainSttus": "1", "directAt": "0", "lstcarAt": "0"
+    }
+
+class FakeResponse:
+    def __init__(self, body: dict, status_code: int = 200):
+        self.status_code = status_code
+        self.content = json.dumps(body, ensure_ascii=False).encode()
+
+    def json(self):
+        return json.loads(self.content)
+
+def list_body(list_name: str, rows: list[dict]) -> dict:
+    return {"errorMessage": {"status": 200, "code": "INFO-000", "message": "정상 처리되었습니다.", "total": len(rows)}, list_name: rows}
+
+def error_body(code: str, message: str) -> dict:
+    return {"status": 500 if code.startswith("ERROR") else 200, "code": code, "message": message}
+
+class FakeSession:
+    """ requests.Session compatible. url (api_name/name) -> response or exception """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.responses: dict[str, FakeResponse|Exception] = {}
+        self.requested: list[str] = []
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def get(self, url, timeout = None):
+        with self.lock:
+            self.requested.append(url)
+        response = self.responses[url]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def close(self):
+        pass
+
+LINES = {1002: "2호선", 1003: "3호선", 1004: "4호선"}
+
+class TestRealtimeCollect(unittest.TestCase):
+
+    def setUp(self):
+        self.session = FakeSession()
+        self.collect = RealtimeCollect(fetch_mode="concurrent", max_workers=4, adaptive_polling=False, session=self.session, api_keys=["test"])
+        self.collect.line_id_names = dict(LINES)
+        self.collect.realtime_api.get_url = lambda api_name, name = None, api_key = None: api_name if name is None else f"{api_name}/{name}"
+        self.session.responses["realtimeStationArrival/ALL"] = FakeResponse(list_body("realtimeArrivalList", [{"subwayId": "1002"}]))
+        for line_id, line_name in LINES.items():
+            self.set_position(line_id, [create_row(line_id, line_name, f"{line_id}1", line_id * 1000000 + 100)])
+
+    def set_position(self, line_id: int, rows: list[dict]):
+        self.session.responses[f"realtimePosition/{LINES[line_id]}"] = FakeResponse(list_body("realtimePositionList", rows))
+
+    def test_fan_out(self):
+        self.collect.collect_realtime_data()
+
+        self.assertEqual(sorted(self.session.requested), sorted(["realtimeStationArrival/ALL"] + [f"realtimePosition/{name}" for name in LINES.values()]))
+        self.assertEqual(self.collect.realtime_position["line_id"].tolist(), [1002, 1003, 1004])
+        self.assertEqual(len(self.collect.realtime_arrival_all), 1)
+
+    def test_failed_line_does_not_drop_others(self):
+        self.session.responses["realtimePosition/3호선"] = TimeoutError("timed out")
+        self.set_position(1004, [create_row(1004, "4호선", "41", 1004000100), create_row(1004, "4호선", "42", 1004000102)])
+        self.collect.collect_realtime_data()
+
+        self.assertEqual(self.collect.realtime_position["line_id"].tolist(), [1002, 1004, 1004])
+        stats = self.collect.fetch_stats
+        self.assertEqual(sorted(stats, key=str), sorted(["ALL", 1002, 1003, 1004], key=str))
+        self.assertEqual(stats[1003]["error"], "TimeoutError: timed out")
+        self.assertEqual((stats[1003]["rows"], stats[1002]["rows"], stats[1004]["rows"], stats["ALL"]["rows"]), (0, 1, 2, 1))
+        self.assertTrue(all(stats[key]["error"] is None for key in ("ALL", 1002, 1004)))
+        self.assertTrue(all(stat["latency"] >= 0 and not stat["skipped"] for stat in stats.values()))
+
+    def test_sequential_mode(self):
+        collect = RealtimeCollect(fetch_mode="sequential", adaptive_polling=False, session=self.session, api_keys=["test"])
+        collect.line_id_names = dict(LINES)
+        collect.realtime_api.get_url = self.collect.realtime_api.get_url
+        collect.collect_realtime_data()
+
+        self.assertEqual(self.session.requested[0], "realtimeStationArrival/ALL")
+        self.assertEqual(len(collect.fetch_stats), 4)
+
+    def test_unknown_fetch_mode(self):
+        with self.assertRaisesRegex(Exception, "There is no fetch mode named parallel"):
+            RealtimeCollect(fetch_mode="parallel", adaptive_polling=False, session=self.session, api_keys=["test"])
+
+    def test_same_payload_is_skipped(self):
+        self.collect.collect_realtime_data()
+        self.assertTrue(self.collect.has_changes())
+        frame = self.collect.realtime_position
+
+        self.collect.collect_realtime_data()
+        self.assertFalse(self.collect.has_changes())
+        self.assertEqual(self.collect.changed_lines, set())
+        self.assertTrue(all(not stat["changed"] and stat["error"] is None for stat in self.collect.fetch_stats.values()))
+        # The frame isn't rebuilt
+        self.assertIs(self.collect.realtime_position, frame)
+
+    def test_changed_payload_is_processed(self):
+        self.collect.collect_realtime_data()
+        self.set_position(1003, [create_row(1003, "3호선", "31", 1003000102)])
+        self.collect.collect_realtime_data()
+
+        self.assertTrue(self.collect.has_changes())
+        self.assertEqual(self.collect.changed_lines, {1003})
+        self.assertFalse(self.collect.arrival_all_changed)
+        self.assertEqual(self.collect.changed_position["station_id"].tolist(), [1003000102])
+
+    def test_failed_or_empty_response_is_never_unchanged(self):
+        responses = {
+            "HTTP error": FakeResponse({"status": 503, "message": "Service Unavailable"}, 503),
+            "error code": FakeResponse(error_body("ERROR-500", "서버 오류입니다.")),
+            "empty": FakeResponse(error_body("INFO-200", "해당하는 데이터가 없습니다.")),
+            "exception": ConnectionError("reset"),
+        }
+        for case, response in responses.items():
+            with self.subTest(case):
+                self.collect.fingerprints.clear()
+                self.collect.breakers.clear()
+                self.session.responses["realtimePosition/3호선"] = response
+                for _ in range(2):
+                    self.collect.collect_realtime_data()
+                    self.assertTrue(self.collect.fetch_stats[1003]["changed"])
+                self.assertNotIn(1003, self.collect.fingerprints)
+
+    def test_no_data_is_not_a_failure(self):
+        self.collect.collect_realtime_data()
+        # No trains on the line (e.g. at night)
+        self.session.responses["realtimePosition/3호선"] = FakeResponse(error_body("INFO-200", "해당하는 데이터가 없습니다."))
+        for _ in range(5):
+            self.collect.collect_realtime_data()
+
+        self.assertEqual(self.collect.breakers[1003].state, CLOSED)
+        self.assertEqual((self.collect.fetch_stats[1003]["error"], self.collect.fetch_stats[1003]["rows"]), (None, 0))
+        # The last frame isn't served as stale
+        self.assertEqual(self.collect.stale_lines, set())
+        self.assertEqual(self.collect.realtime_position["line_id"].tolist(), [1002, 1004])
+
+    def test_failed_line_is_stale(self):
+        self.collect.collect_realtime_data()
+        self.session.responses["realtimePosition/3호선"] = TimeoutError("timed out")
+        self.collect.collect_realtime_data()
+        # The last good frame is kept and marked stale
+        self.assertEqual(self.collect.stale_lines, {1003})
+        self.assertTrue(self.collect.stale_lines_changed and self.collect.has_changes())
+        self.assertEqual(self.collect.realtime_position["line_id"].tolist(), [1002, 1003, 1004])
+
+        self.collect.collect_realtime_data()
+        self.assertEqual(self.collect.stale_lines, {1003})
+        self.assertFalse(self.collect.has_changes())
+
+        # Recovered
+        self.set_position(1003, [create_row(1003, "3호선", "31", 1003000100)])
+        self.collect.collect_realtime_data()
+        self.assertEqual(self.collect.stale_lines, set())
+        self.assertTrue(self.collect.stale_lines_changed)
+
+    def test_failures_of_the_endpoint(self):
+        self.session.responses["realtimePosition/3호선"] = FakeResponse(error_body("ERROR-500", "서버 오류입니다."), 500)
+        # An error of the api key isn't a failure of the endpoint
+        self.session.responses["realtimePosition/4호선"] = FakeResponse(error_body("ERROR-337", "일별 트래픽 제한을 넘은 호출입니다."))
+        for _ in range(3):
+            self.collect.collect_realtime_data()
+
+        self.assertEqual(self.collect.breakers[1003].state, OPEN)
+        self.assertEqual(self.collect.breakers[1004].state, CLOSED)
+        self.assertEqual(self.collect.fetch_stats[1004]["error"], "Invalid response ERROR-337")
+
+if __name__ == "__main__":
+    unittest.main()
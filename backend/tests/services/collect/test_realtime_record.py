@@ -0,0 +1,118 @@
+import os
+import glob
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from services.collect.src.realtime_record import RealtimeRecorder, ReplaySession
+
+BASE_URL = "http://swopenapi.seoul.go.kr/api/subway/SECRET-KEY/json"
+
+class FakeResponse:
+    def __init__(self, body: dict, status_code: int = 200):
+        self.status_code = status_code
+        self.content = json.dumps(body, ensure_ascii=False).encode()
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+def position_url(line_name: str) -> str:
+    return f"{BASE_URL}/realtimePosition/0/1000/{line_name}"
+
+class TestRealtimeRecord(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.clock = FakeClock(datetime(2025, 5, 1, 9, 0, 0).timestamp())
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def record_cycles(self, recorder: RealtimeRecorder, n: int, start: int = 0):
+        for i in range(start, start + n):
+            self.clock.now += 10
+            recorder.record(position_url("2호선"), FakeResponse({"seq": i}))
+            # The same response isn't written again
+            recorder.record(position_url("3호선"), FakeResponse({"seq": 0}))
+
+    def test_round_trip(self):
+        recorder = RealtimeRecorder(self.dir, clock=self.clock)
+        self.record_cycles(recorder, 3)
+        recorder.close()
+
+        session = ReplaySession(self.dir)
+        records = list(session._read_records())
+        self.assertEqual([r["endpoint"] for r in records], ["realtimePosition/2호선", "realtimePosition/3호선", "realtimePosition/2호선", "realtimePosition/2호선"])
+        self.assertFalse(any("SECRET-KEY" in json.dumps(r) for r in records))
+
+        response = session.get(position_url("2호선"))
+        self.assertEqual((response.status_code, response.json()), (200, {"seq": 0}))
+        session._advance(self.clock.now)
+        self.assertEqual(json.loads(session.latest["realtimePosition/2호선"]["body"]), {"seq": 2})
+
+    def test_concurrent_fetches_are_replayed_in_order(self):
+        recorder = RealtimeRecorder(self.dir, clock=self.clock)
+        start = self.clock.now
+        # Responses of concurrent fetches are written out of the order of their requests
+        for seq, requested_at in enumerate([start + 3, start + 1, start + 2]):
+            self.clock.now = start + 4 + seq
+            recorder.record(position_url("2호선"), FakeResponse({"seq": seq}), requested_at)
+        # The clock steps back
+        self.clock.now = start
+        recorder.record(position_url("2호선"), FakeResponse({"seq": 3}), start)
+        recorder.close()
+
+        session = ReplaySession(self.dir)
+        records = list(session._read_records())
+        self.assertEqual([r["t"] for r in records], [start + 4, start + 5, start + 6, start + 6])
+        self.assertEqual([r["requested_at"] for r in records], [start + 3, start + 1, start + 2, start])
+        # The last written response is replayed
+        session._advance(start + 6)
+        self.assertEqual(json.loads(session.latest["realtimePosition/2호선"]["body"]), {"seq": 3})
+
+    def test_new_file_per_run(self):
+        first = RealtimeRecorder(self.dir, clock=self.clock)
+        self.record_cycles(first, 2)
+        first.flush() # Not closed. (e.g. crash)
+
+        self.clock.now += 60
+        second = RealtimeRecorder(self.dir, clock=self.clock)
+        self.record_cycles(second, 2, start=2)
+        second.close()
+
+        self.assertEqual(len(glob.glob(os.path.join(self.dir, "realtime-20250501-*.jsonl.gz"))), 2)
+        records = list(ReplaySession(self.dir)._read_records())
+        self.assertEqual([json.loads(r["body"])["seq"] for r in records if r["endpoint"] == "realtimePosition/2호선"], [0, 1, 2, 3])
+
+    def test_truncated_tail(self):
+        recorder = RealtimeRecorder(self.dir, clock=self.clock)
+        self.record_cycles(recorder, 2)
+        recorder.flush()
+        path = recorder.file.name
+        with open(path, "rb") as f:
+            data = f.read()
+        # Records after the flush are cut off in the middle
+        self.record_cycles(recorder, 50, start=2)
+        recorder.close()
+        with open(path, "r+b") as f:
+            f.truncate(len(data) + 5)
+
+        # The next day
+        self.clock.now += 86400
+        next_recorder = RealtimeRecorder(self.dir, clock=self.clock)
+        self.record_cycles(next_recorder, 1, start=100)
+        next_recorder.close()
+
+        records = list(ReplaySession(self.dir)._read_records())
+        seqs = [json.loads(r["body"])["seq"] for r in records if r["endpoint"] == "realtimePosition/2호선"]
+        # Records before the damage and every later file are replayed
+        self.assertEqual(seqs, [0, 1, 100])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import threading
+import unittest
+
+from services.collect.src.realtime_writer import RealtimeWriter
+from tests.realtime_rows import create_row
+
+class FakeRepository:
+    def __init__(self, failures: int = 0):
+        self.calls: list[list[dict]] = []
+        self.failures = failures
+        self.blocked = threading.Event()
+        self.blocked.set()
+
+    def upsert_realtimes(self, data: list[dict]):
+        self.blocked.wait()
+        if self.failures > 0:
+            self.failures -= 1
+            raise Exception("disk I/O error")
+        self.calls.append(data)
+
+class TestRealtimeWriter(unittest.TestCase):
+
+    def test_coalesce_cycles_into_one_transaction(self):
+        repository = FakeRepository()
+        writer = RealtimeWriter(repository, max_queue=10, max_batch=10)
+        # Queue before the writer thread starts
+        writer.put([create_row()])
+        writer.put([create_row(received_at="2025-05-01 10:00:10"), create_row(train_id="2202")])
+        writer.start()
+
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(len(repository.calls), 1)
+        rows = sorted(repository.calls[0], key=lambda r: r["train_id"])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["received_at"], "2025-05-01 10:00:10") # The later cycle wins
+        writer.close(timeout=5)
+        self.assertFalse(writer.check_is_alive())
+
+    def test_drop_when_full(self):
+        repository = FakeRepository()
+        writer = RealtimeWriter(repository, max_queue=1, put_timeout=0.01)
+        self.assertTrue(writer.put([create_row()]))
+        self.assertFalse(writer.put([create_row(train_id="2202")]))
+        self.assertEqual(writer.stats()["dropped_rows"], 1)
+
+    def test_retry_and_fail(self):
+        repository = FakeRepository(failures=1)
+        writer = RealtimeWriter(repository, max_retries=1, retry_interval=0)
+        writer.start()
+        writer.put([create_row()])
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(writer.stats()["written_rows"], 1)
+
+        repository.failures = 2
+        writer.put([create_row(train_id="2202")])
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(writer.stats()["failed_rows"], 1)
+        writer.close(timeout=5)
+
+    def test_flush_timeout(self):
+        repository = FakeRepository()
+        repository.blocked.clear()
+        writer = RealtimeWriter(repository)
+        writer.start()
+        writer.put([create_row()])
+        self.assertFalse(writer.flush(timeout=0.05))
+        repository.blocked.set()
+        self.assertTrue(writer.flush(timeout=5))
+        writer.close(timeout=5)
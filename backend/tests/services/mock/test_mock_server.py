@@ -0,0 +1,52 @@
+import threading
+import unittest
+
+import requests
+
+from services.collect.src.realtime_api import RealtimeAPI
+from services.mock.src.mock_server import MockSubwayNetwork, MockSubwayServer
+
+class TestMockSubwayServer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockSubwayServer(("127.0.0.1", 0), MockSubwayNetwork(trains_per_line=4, stations_per_line=10), latency=0, jitter=0)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/api/subway"
+        self.realtime_api = RealtimeAPI(api_keys=["test"])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_realtime_position(self):
+        response = requests.get(f"{self.base_url}/test/json/realtimePosition/0/1000/2호선", timeout=2)
+        data = self.realtime_api.parse_response(response)
+
+        self.assertEqual(len(data), 4)
+        self.assertEqual(data[0]["subwayId"], "1002")
+        self.assertIn(data[0]["trainSttus"], ("0", "1", "2"))
+
+    def test_realtime_arrival_all(self):
+        response = requests.get(f"{self.base_url}/test/json/realtimeStationArrival/ALL", timeout=2)
+        data = self.realtime_api.parse_response(response)
+
+        self.assertGreater(len(data), 0)
+        self.assertIn("arvlMsg2", data[0])
+
+    def test_unknown_line(self):
+        response = requests.get(f"{self.base_url}/test/json/realtimePosition/0/1000/없는선", timeout=2)
+        self.assertIsNone(self.realtime_api.parse_response(response))
+
+    def test_error_injection(self):
+        self.server.error_rate = 1.0
+        response = requests.get(f"{self.base_url}/test/json/realtimePosition/0/1000/2호선", timeout=2)
+        self.assertIsNone(self.realtime_api.parse_response(response))
+        self.assertEqual(self.server.stats["ERROR-500"], 1)
+
+    def test_invalid_key(self):
+        response = requests.get(f"{self.base_url}/INVALID/json/realtimePosition/0/1000/2호선", timeout=2)
+        self.assertIsNone(self.realtime_api.parse_response(response, "INVALID"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import re
+import json
+import unittest
+
+from services.transform.src.arrival_all_parser import parse_arrival_all, parse_information_message
+
+TRAIN_STATUS = {0: "진입", 1: "도착", 2: "출발", 3: "전역출발", 4: "전역진입", 5: "전역도착", 99: "운행중"}
+
+def create_row(line_id: str, station_id: str, code: str, message: str) -> dict:
+    return {
+        "subwayId": line_id, "statnId": station_id, "arvlCd": code, "arvlMsg2": message, "arvlMsg3": "양재",
+        "btrainNo": "1234", "bstatnNm": "광교", "statnNm": "강남", "recptnDt": "2025-05-01 09:00:00",
+        "btrainSttus": "급행", "updnLine": "상행", "barvlDt": "120"
+    }
+
+def baseline_parse_arrival_all(data: list[dict], arrival_line: list[int], train_status: dict[int, str]) -> dict[int, list]:
+    """ RealtimeTransform._process_arrival_all_data before the batch parser """
+    data_hashmap: dict[int, list] = {}
+    for row in data:
+        if int(row["subwayId"]) not in arrival_line: continue
+        station_id = int(row["statnId"])
+        information_message = row["arvlMsg2"]
+        partial_message = information_message.split(maxsplit = 2)
+        try:
+            if len(partial_message) == 2:
+                stop_order_diff = 0 if partial_message[0] == "당역" else 1
+                information_message = f"{stop_order_diff}전역 {partial_message[1]}"
+            else:
+                stop_order_diff = int(re.search(r'[0-9]+', partial_message[0]).group(0))
+                information_message = f"{stop_order_diff}전역"
+        except:
+            stop_order_diff = None
+        new_row = {
+            "train_id": row["btrainNo"],
+            "last_station_name": row["bstatnNm"],
+            "searched_station_name": row["statnNm"],
+            "cur_station_name": row["arvlMsg3"],
+            "received_at": row["recptnDt"],
+            "express": 1 if row["btrainSttus"] == "급행" else 0,
+            "train_status": train_status[int(row["arvlCd"])],
+            "up_down": 0 if row["updnLine"] == "상행" else 1,
+            "expected_left_time": int(row["barvlDt"]),
+            "stop_order_diff": stop_order_diff,
+            "information_message": information_message
+        }
+        data_hashmap.setdefault(station_id, []).append(new_row)
+    return data_hashmap
+
+class TestArrivalAllParser(unittest.TestCase):
+
+    def test_parse_information_message(self):
+        self.assertEqual(parse_information_message("당역 도착"), (0, "0전역 도착"))
+        self.assertEqual(parse_information_message("전역 출발"), (1, "1전역 출발"))
+        self.assertEqual(parse_information_message("[12]번째 전역 (양재시민의숲)"), (12, "12전역"))
+        self.assertEqual(parse_information_message("운행중"), (None, "운행중"))
+
+    def test_parse_arrival_all(self):
+        data = [
+            create_row("1077", "1077000687", "1", "당역 도착"),
+            create_row("1002", "1002000222", "1", "당역 도착"), # not in arrival_line
+            create_row("1077", "1077000687", "99", "[3]번째 전역 (판교)"),
+        ]
+        result = parse_arrival_all(data, [1077], TRAIN_STATUS)
+
+        self.assertEqual(list(result), [1077000687])
+        first, second = result[1077000687]
+        self.assertEqual((first["train_status"], first["stop_order_diff"], first["information_message"]), ("도착", 0, "0전역 도착"))
+        self.assertEqual((second["train_status"], second["stop_order_diff"], second["information_message"]), ("운행중", 3, "3전역"))
+        self.assertEqual((first["express"], first["up_down"], first["expected_left_time"]), (1, 0, 120))
+
+    def test_recorded_arrival_all(self):
+        # Recorded realtimeStationArrival/ALL response (mock server and messages of the real feed)
+        with open(os.path.join(os.path.dirname(__file__), "data", "arrival_all.json"), encoding="utf-8") as f:
+            data = json.load(f)["realtimeArrivalList"]
+
+        for arrival_line in ([1077], [1077, 1002, 1063], [], [9999]):
+            result = parse_arrival_all(data, arrival_line, TRAIN_STATUS)
+            expected = baseline_parse_arrival_all(data, arrival_line, TRAIN_STATUS)
+            self.assertEqual(result, expected)
+            # Same order of stations
+            self.assertEqual(list(result), list(expected))
+        self.assertEqual(parse_arrival_all([], [1077], TRAIN_STATUS), {})
+
+if __name__ == "__main__":
+    unittest.main()
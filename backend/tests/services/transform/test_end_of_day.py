@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import time
+
+os.environ.setdefault("START_TIME", "04:50:00")
+
+from services.transform.src.realtime_transform_worker import RealtimeTransformWorker
+from repositories.realtimes_repository.sqlite_realtime_repository import SqliteRealtimeRepository
+from repositories.archive_repository.columnar_archive_repository import ColumnarArchiveRepository
+from tests.realtime_rows import create_row
+
+class StopWorker(BaseException):
+    """ Stops interval_work. It isn't caught by the handlers of Exception. """
+
+class FakeClient:
+    def __init__(self, messages: list[dict]):
+        self.messages = messages
+        self.connects = 0
+
+    def connect(self):
+        self.connects += 1
+
+    def recv(self) -> dict:
+        if len(self.messages) == 0:
+            raise StopWorker()
+        return self.messages.pop(0)
+
+class FakeTimetableRepository:
+    def find_timetable_for_calculation_delay(self, op_date: str, day_code: int) -> list[dict]:
+        return [{
+            "line_id": 1002, "first_station_name": "강남", "last_station_name": "시청", "first_last": None,
+            "station_public_code": "0222", "day_code": 8, "up_down": 1, "express": 0,
+            "arrival_time": time(10, 0), "department_time": time(10, 0, 30), "realtime_train_id": "2200", "stop_no": 1,
+            "express_non_stop": 0, "station_id": 1002000222, "station_name": "강남"
+        }]
+
+class FakeDelayRepository:
+    def __init__(self):
+        self.rows = 0
+
+    def insert_delay_many(self, data: list[dict], chunk_size: int):
+        self.rows += len(data)
+
+class FailingArchiveRepository(ColumnarArchiveRepository):
+    def save_realtimes(self, op_date, chunks):
+        next(iter(chunks))
+        raise OSError("No space left on device")
+
+class TestEndOfDay(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.realtime_repository = SqliteRealtimeRepository()
+        self.realtime_repository.create_engine(f"sqlite:///{os.path.join(self.tmp_dir, 'realtimes.db')}")
+        # 5 rows in 3 chunks of 2 rows
+        self.realtime_repository.upsert_realtimes([
+            create_row(train_id=f"22{i:02d}", received_at=f"2025-05-01 10:0{i}:00", requested_at=f"2025-05-01 10:0{i}:05") for i in range(5)
+        ])
+        self.delay_repository = FakeDelayRepository()
+
+        # The partition is dropped only when the day is archived
+        self.archived_rows_at_remove = []
+        remove_realtimes = self.realtime_repository.remove_realtimes
+        def remove(op_date: str):
+            self.archived_rows_at_remove.append(len(ColumnarArchiveRepository(os.path.join(self.tmp_dir, "archive")).load_realtimes(op_date)))
+            remove_realtimes(op_date)
+        self.realtime_repository.remove_realtimes = remove
+
+    def tearDown(self):
+        self.realtime_repository.dispose()
+        shutil.rmtree(self.tmp_dir)
+
+    def run_worker(self, archive_repository: ColumnarArchiveRepository) -> FakeClient:
+        client = FakeClient([{"position": 0, "arrival_all": 0}])
+        worker = RealtimeTransformWorker(
+            None, client, FakeTimetableRepository(), self.delay_repository, self.realtime_repository, [1077],
+            chunk_size = 2, archive_repository = archive_repository
+        )
+        worker.realtime_transform.op_d_str = "2025-05-01"
+        with self.assertRaises(StopWorker):
+            worker.interval_work()
+        return client
+
+    def test_archive_before_remove(self):
+        archive_repository = ColumnarArchiveRepository(os.path.join(self.tmp_dir, "archive"))
+        client = self.run_worker(archive_repository)
+
+        self.assertEqual(self.delay_repository.rows, 5)
+        self.assertEqual(self.archived_rows_at_remove, [5])
+        self.assertEqual(sorted(archive_repository.load_realtimes("2025-05-01")["train_id"]), [f"22{i:02d}" for i in range(5)])
+        self.assertFalse(self.realtime_repository.has_partition("2025-05-01"))
+        self.assertEqual(client.connects, 1)
+
+    def test_archive_failure_keeps_realtimes(self):
+        client = self.run_worker(FailingArchiveRepository(os.path.join(self.tmp_dir, "archive")))
+
+        self.assertEqual(self.archived_rows_at_remove, [])
+        self.assertEqual(len(self.realtime_repository.find_realtimes("2025-05-01")), 5)
+        # Not handled as a connection error
+        self.assertEqual(client.connects, 1)
+
+if __name__ == "__main__":
+    unittest.main()
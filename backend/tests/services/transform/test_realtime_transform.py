@@ -0,0 +1,166 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date, time, timedelta
+
+import pandas as pd
+from pydantic import ValidationError
+
+os.environ.setdefault("START_TIME", "04:50:00")
+
+from services.transform.src.realtime_transform import RealtimeTransform
+from communication.realtime_snapshot_file import RealtimeSnapshotWriter, RealtimeSnapshotReader
+
+def create_timetable() -> list[dict]:
+    """ Two trains of line 1002 on stations 0 - 4. Train 0002 visits station 0 twice. (circular line) """
+    rows = []
+    for train_id, stations, start in (("0001", [0, 1, 2, 3, 4], 9 * 3600), ("0002", [4, 3, 2, 1, 0, 4], 23 * 3600 + 55 * 60)):
+        for k, station in enumerate(stations):
+            arrival = (start + k * 120) % 86400
+            department = (arrival + 30) % 86400
+            rows.append({
+                "line_id": 1002, "first_station_name": f"{stations[0]}역", "last_station_name": f"{stations[-1]}역",
+                "first_last": None, "station_public_code": f"{station:04d}", "day_code": 8, "up_down": 1, "express": 0,
+                "arrival_time": None if k == 0 else time(arrival // 3600, arrival % 3600 // 60, arrival % 60),
+                "department_time": None if k == len(stations) - 1 else time(department // 3600, department % 3600 // 60, department % 60),
+                "realtime_train_id": train_id, "stop_no": k + 1, "express_non_stop": 0,
+                "station_id": 1002000100 + station, "station_name": f"{station}역"
+            })
+    return rows
+
+class FakeTimetableRepository:
+    def find_timetable_for_calculation_delay(self, op_date: str, day_code: int) -> list[dict]:
+        return create_timetable()
+
+def create_position(train_id: str, station: int, received_at: str, train_status: int = 1) -> dict:
+    return {
+        "line_id": 1002, "line_name": "2호선", "station_id": 1002000100 + station, "station_name": f"{station}역",
+        "train_id": train_id, "received_at": received_at, "up_down": 1, "last_station_id": 1002000104,
+        "last_station_name": "4역", "train_status": train_status, "express": 0, "is_last_train": 0,
+        "requested_at": received_at
+    }
+
+class TestRealtimeTransform(unittest.TestCase):
+
+    def setUp(self):
+        self.transform = RealtimeTransform(FakeTimetableRepository(), [1077])
+        # Fix the operational date
+        self.transform.op_d = date(2025, 5, 1)
+        self.transform.next_d = self.transform.op_d + timedelta(days=1)
+        self.transform.op_d_str = "2025-05-01"
+        self.transform.next_d_str = "2025-05-02"
+        self.transform.set_timetable_data()
+
+    def test_delay_time(self):
+        positions = pd.DataFrame([
+            create_position("0001", 1, "2025-05-01 09:03:00", 1), # arrival 09:02:00
+            create_position("0001", 2, "2025-05-01 09:04:10", 2), # department 09:04:30
+            create_position("0002", 3, "2025-05-02 00:00:00", 0), # arrival 23:57:00, coming
+            create_position("9999", 1, "2025-05-01 09:03:00", 1), # not in the timetable
+        ])
+        delay = self.transform.get_delay_data(positions)
+
+        self.assertEqual(len(delay), 4)
+        delayed_time = delay["delayed_time"].tolist()
+        self.assertEqual(delayed_time[0:3], [60, -20, 210])
+        self.assertTrue(pd.isna(delayed_time[3]))
+        self.assertEqual(delay["stop_no"].tolist()[0:3], [2, 3, 2])
+
+    def test_delay_time_of_received_at_without_seconds(self):
+        # received_at can be %Y-%m-%d %H:%M
+        positions = pd.DataFrame([
+            create_position("0001", 1, "2025-05-01 09:03", 1),
+            create_position("0002", 3, "2025-05-02 00:00", 0),
+        ])
+        delay = self.transform.get_delay_data(positions)
+        self.assertEqual(delay["delayed_time"].tolist(), [60, 210])
+        self.assertEqual(delay["received_at"].tolist(), ["2025-05-01 09:03", "2025-05-02 00:00"])
+
+    def test_delay_time_of_station_visited_twice(self):
+        positions = pd.DataFrame([create_position("0002", 4, "2025-05-02 00:05:00", 1)])
+        delay = self.transform.get_delay_data(positions)
+        # Both visits are joined like pd.merge
+        self.assertEqual(sorted(delay["stop_no"].tolist()), [1, 6])
+
+    def test_arrival_projection(self):
+        positions = pd.DataFrame([create_position("0001", 1, "2025-05-01 09:03:00", 1)])
+        self.transform.process_realtime_data(positions, [])
+
+        # Stations 1 - 4 from the current stop
+        arrival = self.transform.arrival_hashmap
+        self.assertEqual(sorted(arrival), [1002000101, 1002000102, 1002000103, 1002000104])
+        row = arrival[1002000103][0]
+        self.assertEqual(row.stop_order_diff, 2)
+        self.assertEqual(row.cur_station_name, "1역")
+        self.assertEqual(row.current_delayed_time, 60)
+        self.assertEqual(row.expected_arrival_time, "2025-05-01 09:07:00") # 09:06:00 + 60s
+        self.assertEqual(arrival[1002000101][0].information_message, "당역 도착")
+
+    def test_incremental_transform(self):
+        first = pd.DataFrame([
+            create_position("0001", 1, "2025-05-01 09:03:00", 1),
+            create_position("0002", 3, "2025-05-02 00:00:00", 0),
+        ])
+        self.transform.process_realtime_data(first, [])
+        unchanged_rows = self.transform.arrival_hashmap[1002000101]
+        position_2002 = self.transform.realtime_position[1002]
+
+        # Train 0001 moves to station 2 and train 0002 isn't changed
+        second = pd.DataFrame([
+            create_position("0001", 2, "2025-05-01 09:04:40", 2),
+            create_position("0002", 3, "2025-05-02 00:00:00", 0),
+        ])
+        self.transform.process_realtime_data(second, [])
+        arrival = self.transform.arrival_hashmap
+        # Station 1 is passed by train 0001. Only the row of train 0002 is kept without recreating it.
+        self.assertEqual([row.train_id for row in arrival[1002000101]], ["0002"])
+        self.assertIs(arrival[1002000101][0], [row for row in unchanged_rows if row.train_id == "0002"][0])
+        # Copy on write: the previous position isn't changed
+        self.assertEqual(position_2002.place[0].station_id, 1002000101)
+        self.assertEqual(self.transform.realtime_position[1002].place[0].station_id, 1002000102)
+
+        # Same as transforming the second position from scratch
+        full = RealtimeTransform(FakeTimetableRepository(), [1077])
+        full.op_d, full.next_d, full.op_d_str, full.next_d_str = self.transform.op_d, self.transform.next_d, "2025-05-01", "2025-05-02"
+        full.set_timetable_data()
+        full.process_realtime_data(second.copy(), [])
+        self.assertEqual(
+            {k: [row.model_dump() for row in v] for k, v in arrival.items()},
+            {k: [row.model_dump() for row in v] for k, v in full.arrival_hashmap.items()}
+        )
+
+        # Removed trains are removed from the stations
+        self.transform.process_realtime_data(pd.DataFrame([create_position("0002", 3, "2025-05-02 00:00:00", 0)]), [])
+        self.assertEqual({row.train_id for v in self.transform.arrival_hashmap.values() for row in v}, {"0002"})
+        self.assertEqual([row.train_id for row in self.transform.realtime_position[1002].place], ["0002"])
+
+    def test_stale_lines(self):
+        path = os.path.join(tempfile.mkdtemp(), "realtime.snapshot")
+        writer, reader = RealtimeSnapshotWriter(path), RealtimeSnapshotReader(path)
+        positions = pd.DataFrame([create_position("0001", 1, "2025-05-01 09:03:00", 1)])
+
+        self.transform.process_realtime_data(positions, [], {1002})
+        writer.write(self.transform.snapshot)
+        # API workers read the flag from the snapshot file
+        self.assertTrue(reader.read().position[1002].stale)
+
+        # Not stale anymore. Trains aren't changed but the line is rebuilt.
+        self.transform.process_realtime_data(positions, [], set())
+        writer.write(self.transform.snapshot)
+        self.assertFalse(reader.read().position[1002].stale)
+        shutil.rmtree(os.path.dirname(path))
+
+    def test_snapshot(self):
+        before = self.transform.snapshot
+        self.transform.process_realtime_data(pd.DataFrame([create_position("0001", 1, "2025-05-01 09:03:00", 1)]), [])
+        snapshot = self.transform.snapshot
+
+        # Published as a new object with the next sequence number
+        self.assertEqual(snapshot.seq, before.seq + 1)
+        self.assertGreaterEqual(snapshot.built_at, before.built_at)
+        self.assertEqual(before.arrival, {})
+        self.assertIs(self.transform.arrival_hashmap, snapshot.arrival)
+        self.assertIs(self.transform.realtime_position, snapshot.position)
+        with self.assertRaises(ValidationError):
+            snapshot.seq = 0
@@ -1,5 +1,6 @@
 from communication.ipc_listener import IPCListener
 from communication.ipc_client import IPCClient
+from communication.wire_format import decode_payload
 
 from services.transform.src.realtime_transform_worker import RealtimeTransformWorker
 from repositories.timetable_repository.postgresql_timetable_repository import PostgresqlTimetableRepository
@@ -19,7 +20,7 @@ if __name__ == "__main__":
     realtime_db_url = os.getenv("SQLITE_REALTIME_DB_URL")
     
     ipc_listener = IPCListener(tc_address)
-    ipc_client = IPCClient(ct_address)
+    ipc_client = IPCClient(ct_address, decode_payload)
     
     postgresql_timetable_repository = PostgresqlTimetableRepository()
     postgresql_delay_repository = PostgresqlDelayRepository()
@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import time
+
+import numpy as np
+import pandas as pd
+
+from services.transform.src.timetable_snapshot import TimetableSnapshot
+
+def create_timetable() -> pd.DataFrame:
+    return pd.DataFrame({
+        "line_id": [1002, 1002, 1002],
+        "first_last": [1, None, None],
+        "arrival_time": [None, time(9, 2), time(0, 10)],
+        "realtime_train_id": ["0001", "0001", "0001"],
+        "stop_no": [1, 2, 3],
+        "station_id": [1002000100, 1002000101, 1002000102],
+        "station_name": ["0역", "1역", None],
+        "arrival_sec": pd.array([None, 15120, 69000], dtype="Int32"),
+    })
+
+class TestTimetableSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshot_dir = tempfile.mkdtemp()
+        self.snapshot = TimetableSnapshot(self.snapshot_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.snapshot_dir)
+
+    def test_save_and_load(self):
+        tb = create_timetable()
+        self.snapshot.save("2025-05-01", 8, "v1", tb)
+        loaded = self.snapshot.load("2025-05-01", 8, "v1")
+
+        self.assertEqual(list(loaded.columns), list(tb.columns))
+        self.assertEqual(list(loaded.dtypes), list(tb.dtypes))
+        self.assertEqual(loaded["realtime_train_id"].tolist(), ["0001"] * 3)
+        self.assertEqual(loaded["station_name"].tolist(), ["0역", "1역", None])
+        self.assertTrue(np.isnan(loaded["first_last"][1]))
+        self.assertTrue(loaded["arrival_sec"].equals(tb["arrival_sec"]))
+        # Times are loaded as strings
+        self.assertEqual(loaded["arrival_time"].tolist(), [None, "09:02:00", "00:10:00"])
+
+    def test_validation(self):
+        self.snapshot.save("2025-05-01", 8, "v1", create_timetable())
+        # Outdated or missing snapshot
+        self.assertIsNone(self.snapshot.load("2025-05-01", 8, "v2"))
+        self.assertIsNone(self.snapshot.load("2025-05-01", 9, "v1"))
+        # Without validation
+        self.assertIsNotNone(self.snapshot.load("2025-05-01", 8, None))
+
+    def test_remove_previous_snapshots(self):
+        self.snapshot.save("2025-05-01", 8, "v1", create_timetable())
+        self.snapshot.save("2025-05-02", 8, "v1", create_timetable())
+        self.assertEqual(os.listdir(self.snapshot_dir), ["timetable_20250502_8"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import json
+import shutil
+
+import numpy as np
+import pandas as pd
+
+"""
+    Columnar file helpers
+
+    A table is a directory of .npy files (one for each column) and meta.json.
+    .npy files are loaded with memory mapping, so only the pages read are loaded.
+    A compressed table has columns.npz (np.savez_compressed) instead of .npy files. e.g. an archive of a closed day
+    It is smaller, but columns are decompressed into memory when they are loaded.
+    save_columns writes to a temporary directory and renames it, so readers never see a half written table.
+"""
+
+def smallest_uint_dtype(max_value: int) -> np.dtype:
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+def smallest_int_dtype(min_value: int, max_value: int) -> np.dtype:
+    for dtype in (np.int8, np.int16, np.int32):
+        if np.iinfo(dtype).min <= min_value and max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+class DictionaryEncoder:
+    """ Incremental dictionary encoding. Codes are given in the order of first appearance. """
+
+    def __init__(self):
+        self.index: dict = {}
+        self.values: list = []
+
+    def encode(self, values) -> np.ndarray:
+        inverse, uniques = pd.factorize(np.asarray(values), use_na_sentinel=False)
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, value in enumerate(uniques):
+            code = self.index.get(value)
+            if code is None:
+                code = self.index[value] = len(self.values)
+                self.values.append(value)
+            mapping[i] = code
+        return mapping[inverse]
+
+def delta_encode(values: np.ndarray) -> tuple[int, np.ndarray]:
+    """ values -> (first value, differences with the previous value) in the smallest int dtype """
+    if len(values) == 0:
+        return 0, np.empty(0, dtype=np.int8)
+    deltas = np.diff(values, prepend=values[0])
+    return int(values[0]), deltas.astype(smallest_int_dtype(int(deltas.min()), int(deltas.max())))
+
+def delta_decode(first: int, deltas: np.ndarray) -> np.ndarray:
+    return first + np.cumsum(deltas, dtype=np.int64)
+
+COMPRESSED_FILE = "columns.npz"
+
+def save_columns(path: str, columns: dict[str, np.ndarray], meta: dict, compressed: bool = False):
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+    if compressed:
+        np.savez_compressed(os.path.join(tmp_path, COMPRESSED_FILE), **columns)
+    else:
+        for name, values in columns.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), values)
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+def load_meta(path: str) -> dict:
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f)
+
+def load_column(path: str, name: str, mmap: bool = True) -> np.ndarray:
+    return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+
+def load_columns(path: str, names: list[str]) -> dict[str, np.ndarray]:
+    """ Columns of a table. Memory mapped unless the table is compressed. """
+    compressed_path = os.path.join(path, COMPRESSED_FILE)
+    if not os.path.exists(compressed_path):
+        return {name: load_column(path, name) for name in names}
+    with np.load(compressed_path) as npz:
+        return {name: npz[name] for name in names}
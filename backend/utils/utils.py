@@ -2,16 +2,19 @@ import os
 from dotenv import load_dotenv
 
 import holidays
+import pandas as pd
 from datetime import date, datetime, timedelta
 
 load_dotenv()
 
+# Operational day starts at 04:50 (HH:MM:SS)
+# Every op date boundary is derived from it: collect restart, transform and realtimes partitions.
+OP_DAY_START = "04:50:00"
+OP_DAY_START_SECONDS = int(OP_DAY_START[0:2]) * 3600 + int(OP_DAY_START[3:5]) * 60
+
 def op_date(datetime_: datetime = datetime.now()) -> date:
-    # Metro operational hours: START_TIME - tomorrow END_TIME
-    start_time = os.getenv("START_TIME")
-    start_hour = int(start_time[0:2])
-    start_minute = int(start_time[3:5])
-    return (datetime_ - timedelta(hours = start_hour, minutes = start_minute)).date()
+    # Metro operational date: OP_DAY_START - tomorrow OP_DAY_START
+    return (datetime_ - timedelta(seconds = OP_DAY_START_SECONDS)).date()
     
 def check_holiday(date_: date | str) -> bool:
     if isinstance(date_, str):
@@ -24,4 +27,21 @@ def check_holiday(date_: date | str) -> bool:
 def is_next_date(time: str) -> bool:
     # time: HH:MM:SS
     # 00시부터 4시 50분 사이인 경우, next_date 정보
-    return (time[0:2] == "04" and time[3:5] < "50") or time[0:2] <= "03"
\ No newline at end of file
+    return time[0:5] < OP_DAY_START[0:5]
+
+def to_op_seconds(times: pd.Series) -> pd.Series:
+    """ Convert times of a day to seconds since the start of the operational day (04:50)
+        Times before 04:50 belong to the next date, so they are wrapped to 86400 - ...
+
+    Args:
+        times (pd.Series): HH:MM:SS or HH:MM strings or datetime.time. Missing values are kept as <NA>.
+
+    Returns:
+        pd.Series: Int32 seconds in [0, 86400)
+    """
+    # Fractional seconds are dropped. HH:MM (e.g. received_at of %Y-%m-%d %H:%M) is HH:MM:00.
+    times = times.astype("string").str.strip().str.slice(0, 8)
+    times = times.where(times.str.len() != 5, times + ":00")
+    times = pd.to_datetime(times, format="%H:%M:%S")
+    seconds = times.dt.hour * 3600 + times.dt.minute * 60 + times.dt.second
+    return ((seconds - OP_DAY_START_SECONDS) % 86400).astype("Int32")